@@ -11,6 +11,17 @@ class Config:
     london_bbox = [-0.5, 51.3, 0.3, 51.7]  # [minLon, minLat, maxLon, maxLat]
     defra_station_url ="https://uk-air.defra.gov.uk/sos-ukair/api/v1/stations"
 
+    # Adaptive rate limiter per API, requests/second (src/getData/rate_limiter.py).
+    # rate is only the starting point, the limiter moves between min_rate and max_rate on its own.
+    rate_limits = {
+        "laqn": {"rate": 5.0, "min_rate": 0.5, "max_rate": 40.0},
+        "defra": {"rate": 5.0, "min_rate": 0.5, "max_rate": 20.0},
+        "meteo": {"rate": 2.0, "min_rate": 0.2, "max_rate": 10.0},
+    }
+
+    # Incremental fetching, last stored timestamp per series (src/getData/watermark.py).
+    watermark_dir = "data/watermarks"
+
 
 class MeteoConfig:
     """Configuration class for MeteoGet settings."""
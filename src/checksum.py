@@ -0,0 +1,12 @@
+"""File checksums shared by the fetch manifest, the data inventory cache and the model registry."""
+
+import hashlib
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
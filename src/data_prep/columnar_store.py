@@ -0,0 +1,314 @@
+"""Consolidated partitioned Parquet stores for the LAQN and DEFRA monthly CSV folders.
+
+data/laqn/monthly_data (and processed/, optimised/) hold one small CSV per site/species/month:
+    <yyyy_mon>/<SiteCode>_<SpeciesCode>_<StartDate>_<EndDate>.csv
+Every consumer re-parses thousands of them with pd.read_csv. LaqnColumnarStore compacts a folder tree into
+one Parquet dataset partitioned by year/month with typed columns:
+    @MeasurementDateGMT  timestamp
+    @Value               float64
+    SiteCode/SpeciesCode dictionary encoded (also any other text column, e.g. SiteName, SiteType)
+    year=YYYY/month=M    hive partitions
+and reads it back with predicate pushdown on site, species and time range, so only the matching
+partitions/row groups are touched.
+
+DefraColumnarStore does the same for each DEFRA stage (raw_data, processed, optimised):
+    <year>measurements/<station>/<pollutant>__YYYY_MM.csv
+    timestamp                    timestamp
+    value                        float32
+    station_name/pollutant_name  dictionary encoded (also pollutant_std, source_file)
+    source_file                  lineage, the CSV a row came from relative to the stage folder
+
+Build from the project root:
+    python -m src.data_prep.columnar_store laqn --source data/laqn/optimised --dest data/laqn/store/optimised
+    python -m src.data_prep.columnar_store defra --source data/defra/optimised --dest data/defra/store/optimised
+"""
+
+import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+LAQN_TIME_COL = '@MeasurementDateGMT'
+LAQN_VALUE_COL = '@Value'
+DEFRA_TIME_COL = 'timestamp'
+DEFRA_VALUE_COL = 'value'
+
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive')
+
+
+class PartitionedStore:
+    """Shared year/month partitioned Parquet dataset logic, subclasses say how to turn source files into rows.
+
+    Args:
+        store_dir (str/Path): root folder of the dataset.
+    """
+
+    time_col = None
+    site_col = None
+    species_col = None
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+
+    def exists(self):
+        return self.store_dir.exists() and any(self.store_dir.rglob('*.parquet'))
+
+    def _write_table(self, df, basename):
+        """Append one batch of rows (e.g. one month folder) to the dataset."""
+        if df.empty:
+            return 0
+        df = df[df[self.time_col].notna()]
+        df = df.assign(year=df[self.time_col].dt.year.astype('int16'),
+                       month=df[self.time_col].dt.month.astype('int8'))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = _dictionary_encode_strings(table)
+        ds.write_dataset(table, self.store_dir, format='parquet', partitioning=PARTITIONING,
+                         basename_template=f"{basename.replace('/', '-')}-{{i}}.parquet",
+                         existing_data_behavior='overwrite_or_ignore')
+        return table.num_rows
+
+    def _compact(self, batches, read_file, max_workers=8, overwrite=True):
+        """Parse each batch of CSVs on a thread pool and write it as one set of Parquet files.
+
+        Args:
+            batches (list): (name, [csv files]) pairs, name is used for the file basenames and the report.
+            read_file (callable): csv file -> typed DataFrame, or None to skip the file.
+        Returns:
+            dict: {batch name: rows written}.
+        """
+        if overwrite and self.store_dir.exists():
+            shutil.rmtree(self.store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        written = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for name, files in batches:
+                frames = list(executor.map(read_file, files))
+                frames = [frame for frame in frames if frame is not None and not frame.empty]
+                if not frames:
+                    continue
+                written[name] = self._write_table(pd.concat(frames, ignore_index=True), name)
+                print(f"  {name}: {len(frames)} files, {written[name]:,} rows")
+        print(f"Store {self.store_dir}: {sum(written.values()):,} rows from {len(written)} folders.")
+        return written
+
+    def _filter(self, sites=None, species=None, start=None, end=None):
+        """Arrow filter expression, the year/month terms let the dataset skip whole partitions."""
+        expr = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if sites is not None:
+            expr = both(expr, ds.field(self.site_col).isin(list(sites)))
+        if species is not None:
+            expr = both(expr, ds.field(self.species_col).isin(list(species)))
+        if start is not None:
+            start = pd.Timestamp(start)
+            expr = both(expr, (ds.field('year') > start.year) |
+                        ((ds.field('year') == start.year) & (ds.field('month') >= start.month)))
+            expr = both(expr, ds.field(self.time_col) >= pa.scalar(start.as_unit('ns').to_datetime64()))
+        if end is not None:
+            end = pd.Timestamp(end)
+            expr = both(expr, (ds.field('year') < end.year) |
+                        ((ds.field('year') == end.year) & (ds.field('month') <= end.month)))
+            expr = both(expr, ds.field(self.time_col) <= pa.scalar(end.as_unit('ns').to_datetime64()))
+        return expr
+
+    def read(self, sites=None, species=None, start=None, end=None, columns=None, categorical=False):
+        """Read the rows matching the filters into one DataFrame.
+
+        Args:
+            sites (list, optional): only these site codes / station names.
+            species (list, optional): only these species / pollutants.
+            start, end (str/Timestamp, optional): inclusive time range.
+            columns (list, optional): columns to load, default all but the year/month partition keys.
+            categorical (bool): keep dictionary columns as pandas categoricals (less memory),
+                False gives plain strings like pd.read_csv did.
+        Returns:
+            pd.DataFrame: sorted by the partition layout (year, month), not by time.
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"No Parquet store at {self.store_dir}, build it first.")
+        dataset = ds.dataset(self.store_dir, format='parquet', partitioning=PARTITIONING)
+        if columns is None:
+            columns = [name for name in dataset.schema.names if name not in ('year', 'month')]
+        table = dataset.to_table(columns=columns, filter=self._filter(sites, species, start, end))
+        df = table.to_pandas()
+        if not categorical:
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype(object)
+        if self.time_col in df.columns:
+            df[self.time_col] = df[self.time_col].astype('datetime64[ns]')
+        return df
+
+    def remove_batches(self, names):
+        """Delete the Parquet files written for these batches, e.g. before writing them again with overwrite=False.
+
+        Args:
+            names (list): batch names as given to _compact, e.g. '2024measurements/Camden_Kerbside'.
+        Returns:
+            int: files deleted.
+        """
+        prefixes = {name.replace('/', '-') for name in names}
+        removed = 0
+        for path in list(self.store_dir.rglob('*.parquet')):
+            #basenames are '<batch>-<i>.parquet', see _write_table.
+            prefix, _, index = path.stem.rpartition('-')
+            if prefix in prefixes and index.isdigit():
+                path.unlink()
+                removed += 1
+        #partition folders left empty (e.g. the months of a station that is gone).
+        for folder in sorted((d for d in self.store_dir.rglob('*') if d.is_dir()), key=lambda d: len(d.parts),
+                             reverse=True):
+            if not any(folder.iterdir()):
+                folder.rmdir()
+        return removed
+
+    def months(self):
+        """(year, month) of every partition in the store, sorted, from the folder layout without reading rows."""
+        if not self.exists():
+            raise FileNotFoundError(f"No Parquet store at {self.store_dir}, build it first.")
+        dataset = ds.dataset(self.store_dir, format='parquet', partitioning=PARTITIONING)
+        keys = (ds.get_partition_keys(fragment.partition_expression) for fragment in dataset.get_fragments())
+        return sorted({(int(key['year']), int(key['month'])) for key in keys})
+
+
+class LaqnColumnarStore(PartitionedStore):
+    """Parquet store for the LAQN <yyyy_mon>/<site>_<species>_<start>_<end>.csv folders."""
+
+    time_col = LAQN_TIME_COL
+    site_col = 'SiteCode'
+    species_col = 'SpeciesCode'
+
+    def write_from_csv(self, source_dir, max_workers=8, overwrite=True):
+        """Compact every month folder of source_dir into the store.
+
+        Args:
+            source_dir (str/Path): e.g. data/laqn/monthly_data or data/laqn/optimised.
+            max_workers (int): threads parsing the CSVs of one month folder.
+            overwrite (bool): drop an existing store first, otherwise months are appended.
+        Returns:
+            dict: {month folder: rows written}.
+        """
+        source_dir = Path(source_dir)
+        month_dirs = sorted(d for d in source_dir.iterdir() if d.is_dir() and any(d.glob('*.csv')))
+        batches = [(month_dir.name, sorted(month_dir.glob('*.csv'))) for month_dir in month_dirs]
+        return self._compact(batches, self._read_csv, max_workers=max_workers, overwrite=overwrite)
+
+    def _read_csv(self, csv_file):
+        """One site/species/month CSV as typed rows, site/species come from the file name when not in the file."""
+        try:
+            df = pd.read_csv(csv_file)
+        except Exception as e:
+            print(f"Error reading {csv_file}: {e}")
+            return None
+        if LAQN_TIME_COL not in df.columns:
+            return None
+
+        parts = csv_file.stem.split('_')
+        if self.site_col not in df.columns and len(parts) >= 2:
+            df[self.site_col] = parts[0]
+        if self.species_col not in df.columns and len(parts) >= 2:
+            df[self.species_col] = parts[1]
+        df[LAQN_TIME_COL] = pd.to_datetime(df[LAQN_TIME_COL], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        df[LAQN_VALUE_COL] = pd.to_numeric(df[LAQN_VALUE_COL], errors='coerce').astype('float64')
+        return df
+
+
+class DefraColumnarStore(PartitionedStore):
+    """Parquet store for one DEFRA stage, <year>measurements/<station>/<pollutant>__YYYY_MM.csv folders."""
+
+    time_col = DEFRA_TIME_COL
+    site_col = 'station_name'
+    species_col = 'pollutant_name'
+    lineage_col = 'source_file'
+
+    def write_from_csv(self, source_dir, max_workers=8, overwrite=True, std_names=None, batch_names=None):
+        """Compact every station folder of source_dir into the store, one batch per station and year.
+
+        Args:
+            source_dir (str/Path): a stage folder, e.g. data/defra/raw_data or data/defra/optimised.
+            max_workers (int): threads parsing the CSVs of one station folder.
+            overwrite (bool): drop an existing store first, otherwise stations are appended.
+            std_names (callable, optional): pollutant_name column -> standard names column (e.g.
+                PollutantMapper.std_column), stored as a dictionary encoded pollutant_std column (one dictionary
+                entry per row group, not a string per row).
+            batch_names (list, optional): only these '<year>measurements/<station>' folders, default all.
+        Returns:
+            dict: {'<year>measurements/<station>': rows written}.
+        """
+        source_dir = Path(source_dir)
+        batches = []
+        for year_dir in sorted(d for d in source_dir.glob('*measurements') if d.is_dir()):
+            for station_dir in sorted(d for d in year_dir.iterdir() if d.is_dir()):
+                files = sorted(station_dir.glob('*.csv'))
+                name = f"{year_dir.name}/{station_dir.name}"
+                if files and (batch_names is None or name in batch_names):
+                    batches.append((name, files))
+        return self._compact(batches, lambda csv_file: self._read_csv(csv_file, source_dir, std_names),
+                             max_workers=max_workers, overwrite=overwrite)
+
+    def _read_csv(self, csv_file, source_dir, std_names=None):
+        """One station/pollutant/month CSV as typed rows plus its lineage.
+
+        The station comes from the folder and the pollutant from the file name when they are not in the file
+        (e.g. CSVs saved before the metadata columns were added).
+        """
+        try:
+            df = pd.read_csv(csv_file)
+        except Exception as e:
+            print(f"Error reading {csv_file}: {e}")
+            return None
+        if DEFRA_TIME_COL not in df.columns or DEFRA_VALUE_COL not in df.columns:
+            return None
+
+        if self.site_col not in df.columns:
+            df[self.site_col] = csv_file.parent.name
+        if self.species_col not in df.columns:
+            df[self.species_col] = csv_file.stem.split('__')[0]
+        df[self.lineage_col] = csv_file.relative_to(source_dir).as_posix()
+        df[DEFRA_TIME_COL] = pd.to_datetime(df[DEFRA_TIME_COL], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        df[DEFRA_VALUE_COL] = pd.to_numeric(df[DEFRA_VALUE_COL], errors='coerce').astype('float32')
+        for col in (self.site_col, self.species_col):
+            df[col] = df[col].astype(str)
+        if std_names is not None:
+            df['pollutant_std'] = std_names(df[self.species_col])
+        return df
+
+
+def _dictionary_encode_strings(table):
+    """Dictionary encode every string column, site/species names repeat on every row.
+
+    Categorical columns already arrive dictionary encoded, their indices are cast to the int32 dictionary_encode
+    gives so every file of the dataset has the same schema.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+        elif pa.types.is_dictionary(field.type) and pa.types.is_string(field.type.value_type) and \
+                field.type.index_type != pa.int32():
+            table = table.set_column(i, field.name, table.column(i).cast(pa.dictionary(pa.int32(), pa.string())))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact CSV folder trees into partitioned Parquet stores.")
+    parser.add_argument('dataset', choices=['laqn', 'defra'], help="which folder layout the source uses")
+    parser.add_argument('--source', required=True, help="e.g. data/laqn/optimised or data/defra/optimised")
+    parser.add_argument('--dest', required=True, help="store folder, e.g. data/laqn/store/optimised")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    store_class = LaqnColumnarStore if args.dataset == 'laqn' else DefraColumnarStore
+    store_class(args.dest).write_from_csv(args.source, max_workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,152 @@
 """Detailed inventory of data files used in the project.
-generates a structured dictionary containing metadata about each data file."""
+generates a structured dictionary containing metadata about each data file.
+
+By default files are scanned metadata-only: the record count and the header come from the raw bytes
+(csv_metadata) instead of a full pd.read_csv, and the files are read on a thread pool.
+DataInventory(metadata_only=False) keeps the old pd.read_csv scan, both give the same tables.
+With stats=True the same single read of each file also gives its data quality stats (csv_stats: time range,
+NaN/negative counts, DEFRA -99/-1 flags, hourly coverage of its month), added as columns of the tables so the
+cleaning analyses can query the inventory instead of re-reading every file.
+With a cache_path the results are kept in an InventoryCache and a rerun only reads new or changed files."""
 
 #starting with imports.
+import csv
+import io
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
 from datetime import datetime
 
+from src.data_prep.inventory_cache import InventoryCache
+from src.checksum import file_checksum
+
+METEO_COLS = ['date', 'temperature_2m', 'wind_speed_10m', 'surface_pressure', 'precipitation', 'relative_humidity_2m']
+
+#time column, value columns and whether negatives and the DEFRA -99/-1 flags are counted, per source.
+STATS_COLUMNS = {
+    'laqn': ('@MeasurementDateGMT', ['@Value'], True),
+    'defra': ('timestamp', ['value'], True),
+    'meteo': ('date', METEO_COLS[1:], False),
+}
+STATS_FIELDS = ['min_time', 'max_time', 'nan_count', 'negative_count', 'flag_99', 'flag_1', 'valid_hours', 'coverage']
+
+
+def csv_metadata(csv_file):
+    """Record count and column names of a CSV without building a DataFrame.
+
+    Counts the non-blank lines after the header, what len(pd.read_csv(csv_file)) gives. Files with quoted
+    fields (which may hold line breaks) are counted with the csv module instead.
+
+    Args:
+        csv_file (str/Path): the file.
+    Returns:
+        tuple: (records, list of column names)
+    """
+    return _count_rows(Path(csv_file).read_bytes())
+
+
+def csv_stats(csv_file, time_col, value_cols, month=None, flags=False):
+    """Record count, header and data quality stats of a CSV, all from one read of the file.
+
+    Args:
+        csv_file (str/Path): the file.
+        time_col (str): timestamp column.
+        value_cols (list): measurement columns, the NaN count is over all of them.
+        month (pd.Timestamp, optional): first day of the month the file covers, for the hourly coverage.
+        flags (bool): count negatives and the DEFRA -99/-1 flags of the first value column.
+    Returns:
+        tuple: (records, list of column names, stats dict with min_time, max_time, nan_count, valid_hours
+            (distinct hours with a value), coverage (valid_hours / hours of the month) and with flags
+            negative_count, flag_99, flag_1). stats is empty when the file lacks the columns.
+    """
+    data = Path(csv_file).read_bytes()
+    records, columns = _count_rows(data)
+    value_cols = [col for col in value_cols if col in columns]
+    if time_col not in columns or not value_cols:
+        return records, columns, {}
+
+    df = pd.read_csv(io.BytesIO(data), usecols=[time_col] + value_cols)
+    return records, columns, _frame_stats(df, time_col, value_cols, month, flags)
+
+
+def _frame_stats(df, time_col, value_cols, month=None, flags=False):
+    """The csv_stats dict of the rows of df, on numpy arrays (one timestamp parse, no per-stat Series)."""
+    value_cols = [col for col in value_cols if col in df.columns]
+    if time_col not in df.columns or not value_cols:
+        return {}
+    times = pd.to_datetime(df[time_col].to_numpy(), format='ISO8601', errors='coerce', utc=True)
+    times = times.tz_convert(None).to_numpy()
+    dated = times[~np.isnat(times)]
+    values = [df[col].to_numpy() for col in value_cols]
+    missing = np.column_stack([pd.isna(column) for column in values])
+    stats = {'min_time': _time_text(dated.min()) if len(dated) else None,
+             'max_time': _time_text(dated.max()) if len(dated) else None,
+             'nan_count': int(missing.sum())}
+    if flags:
+        numeric = values[0] if values[0].dtype.kind in 'fi' else \
+            pd.to_numeric(values[0], errors='coerce').astype(np.float64)
+        stats.update(negative_count=int((numeric < 0).sum()), flag_99=int((numeric == -99).sum()),
+                     flag_1=int((numeric == -1).sum()))
+
+    hours = times[~np.isnat(times) & ~missing.all(axis=1)].astype('datetime64[h]')
+    if month is not None:
+        hours = hours[(hours >= month.to_datetime64()) & (hours < (month + pd.offsets.MonthBegin(1)).to_datetime64())]
+    stats['valid_hours'] = len(np.unique(hours))
+    stats['coverage'] = round(stats['valid_hours'] / (month.days_in_month * 24), 4) if month is not None else None
+    return stats
+
+
+def _count_rows(data):
+    """(records, columns) of CSV bytes, see csv_metadata."""
+    #blank and whitespace-only lines are skipped, as pd.read_csv does.
+    if b'"' in data:
+        rows = [row for row in csv.reader(io.StringIO(data.decode('utf-8-sig', errors='replace')))
+                if row and not (len(row) == 1 and not row[0].strip())]
+        if not rows:
+            raise pd.errors.EmptyDataError("No columns to parse from file")
+        return len(rows) - 1, rows[0]
+
+    lines = [line for line in data.splitlines() if line.strip()]
+    if not lines:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+    return len(lines) - 1, lines[0].decode('utf-8-sig', errors='replace').split(',')
+
+
+def _time_text(value):
+    return None if pd.isna(value) else pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _month_start(text):
+    """First day of the month of '2023-04-01', '2023_04' or '2023-04', None if it is not a date."""
+    try:
+        return pd.Timestamp(text.replace('_', '-')[:7] + '-01')
+    except ValueError:
+        return None
+
+
 class DataInventory:
-    """Class to create and manage a data inventory for the project."""
+    """Class to create and manage a data inventory for the project.
+
+    Args:
+        metadata_only (bool): count rows/read headers from the raw bytes (default) instead of pd.read_csv.
+        max_workers (int, optional): threads reading files, 1 scans on the calling thread.
+        cache_path (str/Path, optional): SQLite InventoryCache, files with the same size and mtime as in the
+            cache are not read again.
+        use_checksum (bool): with a cache, also store sha256 of the files, a file whose size/mtime changed but
+            whose content did not (copied, touched) is then not read again.
+        stats (bool): add the csv_stats columns (STATS_FIELDS) to the tables, from the same read of each file.
+    """
 
-    def __init__(self):
+    def __init__(self, metadata_only=True, max_workers=None, cache_path=None, use_checksum=False, stats=False):
         self.base_path = Path(__file__).parent.parent
+        self.metadata_only = metadata_only
+        self.max_workers = max_workers
+        self.cache = InventoryCache(cache_path) if cache_path is not None else None
+        self.use_checksum = use_checksum
+        self.stats = stats
+        self.scan_counts = {} #per source, files read / taken from the cache / dropped from the cache.
         self.inventory = {
             'laqn':{},
             'defra':{},
@@ -23,7 +158,7 @@ class DataInventory:
         """ scanning function to see laqn monthly data structure."""
         laqn_path = self.base_path / 'data' / 'laqn'/ 'monthly_data'
 
-        results = [] #list to hold each record as a dict.
+        files = [] #(csv file, record without the count) for each file to read.
 
         for year_month_dir in laqn_path.glob('*'):
             if not year_month_dir.is_dir():
@@ -35,25 +170,21 @@ class DataInventory:
                 #parse year and month, site_species_startDate_endData.csv
                 parts = csv_file.stem.split('_')
                 if len(parts) >= 4:
-                    site_code = parts[0]
-                    species_code = parts[1]
-
-                    #read the file to get record count and date range
-                    try:
-                        df = pd.read_csv(csv_file)
-                        record_count = len(df)
-
-                        results.append({
-                            'source':'LAQN',
-                            'period':year_month,
-                            'site':site_code,
-                            'pollutant':species_code,
-                            'records':record_count,
-                            'file':str(csv_file.relative_to(self.base_path))
-                        })
-                    except Exception as e:
-                        print(f"Error reading {csv_file}: {e}")
-            
+                    files.append((csv_file, {
+                        'source':'LAQN',
+                        'period':year_month,
+                        'site':parts[0],
+                        'pollutant':parts[1],
+                    }, _month_start(parts[2])))
+
+        #read the files to get the record counts, list to hold each record as a dict.
+        results = []
+        scanned = self._scan([f for f, _, _ in files], laqn_path, 'laqn', [m for _, _, m in files])
+        for (csv_file, record, _), metadata in zip(files, scanned):
+            if metadata is not None:
+                record.update(records=metadata[0], file=str(csv_file.relative_to(self.base_path)))
+                results.append(self._with_stats(record, metadata, 'laqn'))
+
         self.inventory['laqn'] = pd.DataFrame(results)
         return self.inventory['laqn']
     
@@ -65,7 +196,7 @@ class DataInventory:
         defra_base = self.base_path / 'data' / 'defra'
 
 
-        results = []
+        files = []
         for year_dir in defra_base.glob('*measurements'):
             year = year_dir.name.replace('measurements', '')
             
@@ -79,23 +210,19 @@ class DataInventory:
                     # Parse filename: POLLUTANT__YYYY_MM.csv
                     parts = csv_file.stem.split('__')
                     if len(parts) == 2:
-                        pollutant = parts[0]
-                        period = parts[1]  # e.g., "2023_01"
-                        
-                        try:
-                            df = pd.read_csv(csv_file)
-                            record_count = len(df)
-                            
-                            results.append({
-                                'source': 'DEFRA',
-                                'period': period,
-                                'station': station_name,
-                                'pollutant': pollutant,
-                                'records': record_count,
-                                'file': str(csv_file.relative_to(self.base_path))
-                            })
-                        except Exception as e:
-                            print(f"Error reading {csv_file}: {e}")
+                        files.append((csv_file, {
+                            'source': 'DEFRA',
+                            'period': parts[1],  # e.g., "2023_01"
+                            'station': station_name,
+                            'pollutant': parts[0],
+                        }, _month_start(parts[1])))
+
+        results = []
+        scanned = self._scan([f for f, _, _ in files], defra_base, 'defra', [m for _, _, m in files])
+        for (csv_file, record, _), metadata in zip(files, scanned):
+            if metadata is not None:
+                record.update(records=metadata[0], file=str(csv_file.relative_to(self.base_path)))
+                results.append(self._with_stats(record, metadata, 'defra'))
         
         self.inventory['defra'] = pd.DataFrame(results)
         return self.inventory['defra']
@@ -104,34 +231,143 @@ class DataInventory:
         """Scan meteorological data structure."""
         meteo_base = self.base_path / 'data' / 'meteo' / 'raw'
         
+        #Filename format YYYY-MM.csv
+        files = [csv_file for year_dir in meteo_base.glob('monthly*') for csv_file in year_dir.glob('*.csv')]
+
+        # Check for required columns
+        required_cols = METEO_COLS
         results = []
-        for year_dir in meteo_base.glob('monthly*'):
-            year = year_dir.name.replace('monthly', '')
-            
-            for csv_file in year_dir.glob('*.csv'):
-                #Filename format YYYY-MM.csv
-                try:
-                    df = pd.read_csv(csv_file)
-                    record_count = len(df)
-                    
-                    # Check for required columns
-                    required_cols = ['date', 'temperature_2m', 'wind_speed_10m', 
-                                   'surface_pressure', 'precipitation', 'relative_humidity_2m']
-                    has_all_cols = all(col in df.columns for col in required_cols)
-                    
-                    results.append({
-                        'source': 'METEO',
-                        'period': csv_file.stem, 
-                        'records': record_count,
-                        'complete': has_all_cols,
-                        'file': str(csv_file.relative_to(self.base_path))
-                    })
-                except Exception as e:
-                    print(f"Error reading {csv_file}: {e}")
+        scanned = self._scan(files, meteo_base, 'meteo', [_month_start(csv_file.stem) for csv_file in files])
+        for csv_file, metadata in zip(files, scanned):
+            if metadata is not None:
+                record_count, columns = metadata[:2]
+                results.append(self._with_stats({
+                    'source': 'METEO',
+                    'period': csv_file.stem, 
+                    'records': record_count,
+                    'complete': all(col in columns for col in required_cols),
+                    'file': str(csv_file.relative_to(self.base_path))
+                }, metadata, 'meteo'))
         
         self.inventory['meteo'] = pd.DataFrame(results)
         return self.inventory['meteo']
     
+    def _with_stats(self, record, metadata, source):
+        """record plus the stats columns of its file (None where they do not apply)."""
+        if self.stats:
+            fields = STATS_FIELDS if STATS_COLUMNS[source][2] else \
+                [f for f in STATS_FIELDS if f not in ('negative_count', 'flag_99', 'flag_1')]
+            record.update({field: (metadata[2] or {}).get(field) for field in fields})
+        return record
+
+    def _scan(self, files, root=None, source=None, months=None):
+        """(records, columns, stats) of every file in order, None for the ones that could not be read.
+
+        With a cache only new or changed files are read, cache entries under root whose file is gone are dropped.
+        """
+        months = months or [None] * len(files)
+        read = lambda i: self._read_file(files[i], source, months[i])
+        if self.cache is None:
+            results = self._map(read, range(len(files)))
+        else:
+            results = self._scan_cached(files, root, source, read)
+        metadata = []
+        for csv_file, (found, error) in zip(files, results):
+            if error is not None:
+                print(f"Error reading {csv_file}: {error}")
+            metadata.append(found)
+        return metadata
+
+    def _scan_cached(self, files, root, source, read):
+        keys = [csv_file.relative_to(self.base_path).as_posix() for csv_file in files]
+        stats = [csv_file.stat() for csv_file in files]
+        cached = self.cache.entries(root.relative_to(self.base_path).as_posix() + '/')
+
+        results = [None] * len(files)
+        changed = []
+        for i, (key, stat) in enumerate(zip(keys, stats)):
+            entry = cached.get(key)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns \
+                    and not self._needs_stats(entry):
+                results[i] = entry
+            else:
+                changed.append(i)
+
+        checksums = {}
+        if self.use_checksum and changed:
+            checksums = dict(zip(changed, self._map(file_checksum, [files[i] for i in changed])))
+            unchanged = [i for i in changed if cached.get(keys[i], {}).get('checksum') == checksums[i]
+                         and not self._needs_stats(cached[keys[i]])]
+            for i in unchanged:
+                results[i] = cached[keys[i]]
+            self.cache.touch_many([{'path': keys[i], 'size': stats[i].st_size, 'mtime_ns': stats[i].st_mtime_ns}
+                                   for i in unchanged])
+            changed = [i for i in changed if results[i] is None]
+
+        rows = []
+        for i, (found, error) in zip(changed, self._map(read, changed)):
+            results[i] = {'path': keys[i], 'size': stats[i].st_size, 'mtime_ns': stats[i].st_mtime_ns,
+                          'checksum': checksums.get(i), 'records': found[0] if found else None,
+                          'columns': found[1] if found else None, 'stats': found[2] if found else None,
+                          'error': error}
+            rows.append(results[i])
+        self.cache.put_many(rows)
+        removed = set(cached) - set(keys)
+        self.cache.remove(removed)
+        self.scan_counts[source] = {'read': len(rows), 'cached': len(files) - len(rows), 'removed': len(removed)}
+
+        return [((entry['records'], entry['columns'], entry['stats']), None) if entry['error'] is None
+                else (None, entry['error']) for entry in results]
+
+    def _needs_stats(self, entry):
+        """True for a cached file scanned without stats when they are wanted now."""
+        return self.stats and entry['error'] is None and entry['stats'] is None
+
+    def _read_file(self, csv_file, source=None, month=None):
+        """((records, columns, stats), None) of one file, (None, error message) when it cannot be read."""
+        try:
+            if self.stats:
+                time_col, value_cols, flags = STATS_COLUMNS[source]
+            if self.metadata_only and self.stats:
+                return csv_stats(csv_file, time_col, value_cols, month, flags), None
+            if self.metadata_only:
+                return csv_metadata(csv_file) + (None,), None
+            df = pd.read_csv(csv_file)
+            stats = _frame_stats(df, time_col, value_cols, month, flags) if self.stats else None
+            return (len(df), list(df.columns), stats), None
+        except Exception as e:
+            return None, str(e)
+
+    def _map(self, func, files):
+        """func over files in order, on the thread pool."""
+        if self.max_workers == 1 or len(files) < 2:
+            return [func(csv_file) for csv_file in files]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, files))
+
+    def high_missing_files(self, source='laqn', threshold=20, exclude_files=None):
+        """Files with more than threshold % missing values, from the stats columns (no file is read).
+
+        Same rule as the cleaning notebooks' issue rate (detailed_issue_rate_excluding_notactive,
+        calculate_projected_issue_rate): nan_count / records * 100 > threshold, files without records skipped.
+
+        Args:
+            source (str): 'laqn' or 'defra', scanned before with stats.
+            threshold (float): missing percentage.
+            exclude_files (set, optional): file names to leave out, e.g. the not-active site/species files.
+        Returns:
+            tuple: (issue rate %, files checked, DataFrame of the high missing files with missing_percentage)
+        """
+        table = self.inventory[source]
+        table = table[table['records'] > 0]
+        if exclude_files:
+            table = table[~table['file'].map(lambda f: Path(f).name).isin(set(exclude_files))]
+        missing_percentage = 100 * table['nan_count'] / table['records']
+        high = missing_percentage > threshold
+        high = table[high].assign(missing_percentage=missing_percentage[high].round(2))
+        issue_rate = len(high) / len(table) * 100 if len(table) else 0.0
+        return issue_rate, len(table), high
+
     def generate_summary(self):
         """Generate cross-source summary statistics."""
         summary = {
@@ -0,0 +1,101 @@
+"""Persistent cache of the per-file metadata DataInventory reads, so a rerun only inspects what changed.
+
+Each scanned file is recorded in a small SQLite file under its path (relative to the inventory base path) with
+the size and mtime it had when it was read, optionally its sha256, and what the scan found (record count,
+header, data quality stats, or the read error). On the next run a file is read again only when it is new or
+its size/mtime changed (and, with checksums on, its content too), entries of deleted files are dropped.
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from threading import Lock
+
+
+class InventoryCache:
+    """SQLite backed {path: size, mtime, checksum, records, columns, stats, error} table.
+
+    Args:
+        path (str): SQLite file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    checksum TEXT,
+                    records INTEGER,
+                    columns TEXT,
+                    stats TEXT,
+                    error TEXT,
+                    scanned_at TEXT
+                )""")
+            #caches written before the stats column.
+            if 'stats' not in [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]:
+                self._conn.execute("ALTER TABLE files ADD COLUMN stats TEXT")
+
+    def _now(self):
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    def entries(self, prefix=''):
+        """{path: entry dict} of every cached file under prefix."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT path, size, mtime_ns, checksum, records, columns, stats, error, scanned_at FROM files "
+                "WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+            names = [c[0] for c in cur.description]
+            rows = cur.fetchall()
+        entries = {}
+        for row in rows:
+            entry = dict(zip(names, row))
+            for key in ('columns', 'stats'):
+                entry[key] = json.loads(entry[key]) if entry[key] is not None else None
+            entries[entry['path']] = entry
+        return entries
+
+    def put_many(self, rows):
+        """Insert or replace entries.
+
+        Args:
+            rows (list): dicts with path, size, mtime_ns and optionally checksum, records, columns, stats, error.
+        """
+        now = self._now()
+        values = [(row['path'], int(row['size']), int(row['mtime_ns']), row.get('checksum'), row.get('records'),
+                   _json_or_none(row.get('columns')), _json_or_none(row.get('stats')), row.get('error'), now)
+                  for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, checksum, records, columns, stats, error, "
+                "scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+    def touch_many(self, rows):
+        """Record the new size/mtime of files whose content is unchanged (same checksum)."""
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                                   [(int(row['size']), int(row['mtime_ns']), row['path']) for row in rows])
+
+    def remove(self, paths):
+        """Drop entries, e.g. of deleted files."""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _json_or_none(value):
+    return json.dumps(value) if value is not None else None
@@ -1,14 +1,54 @@
 """This file contains functions to standardise pollutant names across data sources.
-LAQN and DEFRA will have the same pollutant names."""
+LAQN and DEFRA will have the same pollutant names.
 
-import pandas as pd
+Names are matched on a canonical key (case, spaces, underscores and punctuation dropped), so 'Nitrogen dioxide',
+'Nitrogen_dioxide' and 'NITROGEN-DIOXIDE' all find NO2 without listing every variant. Formulas (CO, NO2, PM2.5)
+keep their case, Co is cobalt and not carbon monoxide. The EEA vocabulary
+(euAirPollutantVocab.process_vocab, saved as data/defra/pollutant_mapping.csv) can be merged in for the
+pollutants the hand written table does not cover. Lookups are memoised and std_column maps a whole column
+through its categories, one lookup per distinct name instead of per row."""
+
+import difflib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from src.data_prep.columnar_store import DefraColumnarStore
+
+
+VOCAB_FILE = Path('data/defra/pollutant_mapping.csv')
+
+
+def canonical_key(name) -> str:
+    """Lookup key of a pollutant name: lower case letters and digits only, '1.3_Butadiene' -> '13butadiene'."""
+    return re.sub(r'[\W_]+', '', str(name).casefold())
+
+
+def formula_key(name) -> str:
+    """Lookup key of a formula style name (CO, NOx, PM2.5): letters and digits only, case kept, 'PM2.5' -> 'PM25'."""
+    return re.sub(r'[\W_]+', '', str(name))
+
+
+def is_formula(name) -> bool:
+    """True for formula style names, one word without two lower case letters in a row (CO, NOx, PM2.5)."""
+    return ' ' not in name and not re.search(r'[a-z]{2}', name)
+
 
 class PollutantMapper:
-    """Class to map and standardise pollutant names across LAQN and DEFRA data sources."""
+    """Class to map and standardise pollutant names across LAQN and DEFRA data sources.
 
-    def __init__(self):
+    Args:
+        vocab: Processed EEA vocabulary (DataFrame or CSV path) merged in with add_vocab, optional.
+        fuzzy_cutoff: difflib similarity (0-1) for names without a canonical match, off by default as close
+            names can be different pollutants (nitrogen trioxide scores 0.9 against nitrogen dioxide).
+    """
+
+    def __init__(self, vocab=None, fuzzy_cutoff=None):
         """Initialise the PollutantMapper with paths and mappings."""
         self.data_dir = Path('data')
         self.laqn_dir = self.data_dir / 'laqn'
@@ -87,6 +127,71 @@ class PollutantMapper:
             'Ethyne': 'Ethyne',
         }
 
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.compile()
+        if vocab is not None:
+            self.add_vocab(vocab)
+
+    def compile(self):
+        """Build the key tables from std_pollutants, call again after editing std_pollutants."""
+        self._keys = {}
+        self._formula_keys = {}
+        #the standard names map to themselves, so already standardised names are stable.
+        for name in list(self.std_pollutants) + list(self.std_pollutants.values()):
+            std_name = self.std_pollutants.get(name, name)
+            if is_formula(name):
+                #as written or all upper case (NOX), a casefolded key would turn cobalt (Co) into CO.
+                self._formula_keys.setdefault(formula_key(name), std_name)
+                self._formula_keys.setdefault(formula_key(name).upper(), std_name)
+            else:
+                self._keys.setdefault(canonical_key(name), std_name)
+        self._vocab_keys = {}
+        self._vocab_codes = {}
+        self._cache = {}
+
+    def add_vocab(self, vocab=VOCAB_FILE) -> int:
+        """Merge in the EEA pollutant vocabulary for names the hand written mappings do not know.
+
+        A vocabulary label maps to the standard name of its label without the sampling medium when one is known
+        ('Nitrogen dioxide (air)' -> 'NO2'), then to the hand written name its notation spells exactly
+        ('Particulate matter < 10 µm (aerosol)', notation PM10 -> 'PM10'), otherwise to the label without the
+        medium ('Cobalt (aerosol)' -> 'Cobalt'). Labels and labels without medium are accepted by canonical key,
+        notations only as written, so notation Co (cobalt) stays apart from CO (carbon monoxide).
+
+        Args:
+            vocab: DataFrame returned by euAirPollutantVocab.process_vocab, or the CSV save_vocab wrote.
+
+        Returns:
+            Number of names added.
+        """
+        if not isinstance(vocab, pd.DataFrame):
+            vocab = pd.read_csv(vocab, encoding='utf-8')
+        std_names = set(self.std_pollutants.values())
+        added = 0
+        for label, code in zip(vocab['pollutant_name'], vocab['pollutant_code']):
+            if pd.isna(label):
+                continue
+            label = str(label).strip()
+            base = re.sub(r'\s*\([^()]*\)$', '', label) or label
+            code = None if pd.isna(code) else str(code).strip()
+            if canonical_key(base) in self._keys:
+                std_name = self._keys[canonical_key(base)]
+            elif code in self.std_pollutants or code in std_names:
+                std_name = self.std_pollutants.get(code, code)
+            else:
+                std_name = base
+            for name in (label, base):
+                key = canonical_key(name)
+                if key and key not in self._keys and key not in self._vocab_keys:
+                    self._vocab_keys[key] = std_name
+                    added += 1
+            #notations only match as written, one spelt like a hand written name keeps the hand written mapping.
+            if code and code not in self.std_pollutants and code not in std_names and code not in self._vocab_codes:
+                self._vocab_codes[code] = std_name
+                added += 1
+        self._cache = {}
+        return added
+
     def std_pollutant(self, pollutant_name: str) -> str:
         """Standardise pollutant name to common format.
         
@@ -94,9 +199,52 @@ class PollutantMapper:
             pollutant_name: Original pollutant name from dataset.
             
         Returns:
-            Standardised pollutant name.
+            Standardised pollutant name, the name itself when it is not known.
+        """
+        try:
+            return self._cache[pollutant_name]
+        except KeyError:
+            std_name = self._cache[pollutant_name] = self._lookup(pollutant_name)
+            return std_name
+
+    def _lookup(self, pollutant_name):
+        """Exact name, vocabulary notation, formula key, then canonical key (hand written mappings before the
+        vocabulary), then fuzzy key."""
+        if pollutant_name in self.std_pollutants:
+            return self.std_pollutants[pollutant_name]
+        if isinstance(pollutant_name, str) and pollutant_name.strip() in self._vocab_codes:
+            return self._vocab_codes[pollutant_name.strip()]
+        if formula_key(pollutant_name) in self._formula_keys:
+            return self._formula_keys[formula_key(pollutant_name)]
+        key = canonical_key(pollutant_name)
+        for keys in (self._keys, self._vocab_keys):
+            if key in keys:
+                return keys[key]
+        if self.fuzzy_cutoff is not None and key:
+            match = difflib.get_close_matches(key, list(self._keys) + list(self._vocab_keys), n=1,
+                                              cutoff=self.fuzzy_cutoff)
+            if match:
+                return self._keys.get(match[0], self._vocab_keys.get(match[0]))
+        return pollutant_name
+
+    def std_column(self, names: pd.Series) -> pd.Series:
+        """Standardise a whole column of pollutant names, one lookup per distinct name.
+
+        Args:
+            names: Pollutant names, e.g. df['pollutant_name'] (plain or categorical).
+
+        Returns:
+            Categorical Series of standard names with the index and name of names, missing values stay missing.
         """
-        return self.std_pollutants.get(pollutant_name, pollutant_name)
+        names = names.astype('category')
+        categories = names.cat.categories
+        std_names = pd.Index([self.std_pollutant(name) for name in categories])
+        std_categories = std_names.unique()
+        #code table, old category code -> standard category code, -1 (missing) stays -1.
+        table = np.append(std_categories.get_indexer(std_names), -1)
+        codes = table[names.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, categories=std_categories), index=names.index,
+                         name=names.name)
     
     def get_common_pollutants(self, laqn_pollutants: set, defra_pollutants: set) -> set:
         """Get common pollutants between LAQN and DEFRA datasets.
@@ -203,87 +351,177 @@ class PollutantMapper:
 
 
 
-    def std_defra_pollutants(self, output_dir=Path('data/defra/processed')):
-            """Standardise DEFRA pollutant names across all measurement files.
-            
-            Args:
-                output_dir: Directory to save standardised files.
-                
-            Returns:
-                Number of files processed.
-            """
-            output_path = Path(output_dir)
-            output_path.mkdir(parents=True, exist_ok=True)
+    def std_defra_pollutants(self, output_dir=Path('data/defra/processed'), max_workers=8, skip_unchanged=True):
+        """Standardise DEFRA pollutant names across all measurement files.
+
+        Files are standardised in parallel on a thread pool. The pollutant_std column is appended to the lines of
+        the source CSV as they are rather than parsing and rewriting every value through pandas (files with
+        quoted fields still go through pandas), and outputs newer than their source are left as they are.
 
-            processed_count = 0
+        Args:
+            output_dir: Directory to save standardised files.
+            max_workers: Threads standardising files.
+            skip_unchanged: Skip files whose output is already newer than the source.
+
+        Returns:
+            Number of files processed (written this run).
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        print(f"Standardising DEFRA pollutants from {self.defra_dir}")
+        print(f"Output directory: {output_path}")
+
+        tasks = self._defra_std_tasks(output_path)
+
+        def standardise(task):
+            csv_file, output_file, std_pollutant_name = task
+            try:
+                return _std_defra_file(csv_file, output_file, std_pollutant_name, skip_unchanged)
+            except Exception as e:
+                print(f"  Error processing {csv_file.name}: {e}")
+                return None
+
+        processed_count = skipped_count = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for written in executor.map(standardise, tasks):
+                if written:
+                    processed_count += 1
+                    if processed_count % 100 == 0:
+                        print(f"  Processed {processed_count} files...")
+                elif written is not None:
+                    skipped_count += 1
+
+        print(f"\nCompleted. Standardised {processed_count} DEFRA files, {skipped_count} already up to date.")
+        print(f"Output saved to: {output_path}")
 
-            print(f"Standardising DEFRA pollutants from {self.defra_dir}")
-            print(f"Output directory: {output_path}")
+        return processed_count
 
-            #Iterate through year measurement folders 2023measurements, 2024measurements, 2025measurements.
-            for year_dir in self.defra_dir.glob('*measurements'):
-                if not year_dir.is_dir():
+    def _defra_std_tasks(self, output_path):
+        """(source csv, output csv, standard name) of every pollutant__yyyy_mm.csv under the DEFRA year folders."""
+        tasks = []
+        #Iterate through year measurement folders 2023measurements, 2024measurements, 2025measurements.
+        for year_dir in sorted(self.defra_dir.glob('*measurements')):
+            if not year_dir.is_dir():
+                continue
+            for station_dir in sorted(year_dir.glob('*')):
+                if not station_dir.is_dir():
                     continue
-                
-                year = year_dir.name.replace('measurements', '')
-                print(f"\nProcessing {year}...")
-                
-                #Create output directory for each year.
-                year_output_dir = output_path / f"{year}measurements"
-                year_output_dir.mkdir(parents=True, exist_ok=True)
-                
-                #Iterate through station folders.
-                for station_dir in year_dir.glob('*'):
-                    if not station_dir.is_dir():
-                        continue
-                    
-                    station_name = station_dir.name
-                    
-                    #Create output directory for each station.
-                    station_output_dir = year_output_dir / station_name
-                    station_output_dir.mkdir(parents=True, exist_ok=True)
-                    
-                    #Process each csv file.
-                    for csv_file in station_dir.glob('*.csv'):
-                        try:
-                            #Parse filename as pollutant__yyyy_mm.csv.
-                            parts = csv_file.stem.split('__')
-                            if len(parts) == 2:
-                                pollutant_name = parts[0]
-                                date_part = parts[1]
-                                
-                                #Standardise the pollutant name.
-                                std_pollutant_name = self.std_pollutant(pollutant_name)
-                                
-                                #Read the file.
-                                df = pd.read_csv(csv_file, encoding='utf-8')
-                                
-                                #Add standardised pollutant column.
-                                df['pollutant_std'] = std_pollutant_name
-                                
-                                #Create new filename with standardised pollutant.
-                                new_filename = f"{std_pollutant_name}__{date_part}.csv"
-                                output_file = station_output_dir / new_filename
-                                
-                                #Saving standardised file.
-                                df.to_csv(output_file, index=False)
-                                processed_count += 1
-                                
-                                if processed_count % 100 == 0:
-                                    print(f"  Processed {processed_count} files...")
-                        
-                        except Exception as e:
-                            print(f"  Error processing {csv_file.name}: {e}")
-            
-            print(f"\nCompleted. Standardised {processed_count} DEFRA files.")
-            print(f"Output saved to: {output_path}")
+                station_output_dir = output_path / year_dir.name / station_dir.name
+                station_output_dir.mkdir(parents=True, exist_ok=True)
+                for csv_file in sorted(station_dir.glob('*.csv')):
+                    parts = csv_file.stem.split('__')
+                    if len(parts) == 2:
+                        std_pollutant_name = self.std_pollutant(parts[0])
+                        tasks.append((csv_file, station_output_dir / f"{std_pollutant_name}__{parts[1]}.csv",
+                                      std_pollutant_name))
+        return tasks
 
-            return processed_count
-    
+    def std_defra_store(self, store_dir=Path('data/defra/store/processed'), max_workers=8, skip_unchanged=True):
+        """Standardise DEFRA pollutant names into the partitioned Parquet store instead of a CSV copy.
+
+        pollutant_std is a dictionary encoded column of DefraColumnarStore (a categorical with
+        read(categorical=True)), so each name is stored once per row group instead of on every row. Only the
+        <year>measurements/<station> folders with a source CSV added, changed or deleted since the last run are
+        written again, the Parquet files of folders that are gone are deleted.
+
+        Args:
+            store_dir: Root folder of the store.
+            max_workers: Threads parsing the CSVs of one station folder.
+            skip_unchanged: Keep the station folders whose source files are the same as when they were written,
+                False rebuilds the whole store.
+
+        Returns:
+            {'<year>measurements/<station>': rows written}, empty when the store was up to date.
+        """
+        store = DefraColumnarStore(store_dir)
+        #the (size, mtime) of every source file per station folder, ignored by the dataset ('_' prefix).
+        sources_file = Path(store_dir) / '_sources.json'
+        sources = {}
+        for csv_file in sorted(self.defra_dir.glob('*measurements/*/*.csv')):
+            stat = csv_file.stat()
+            name = csv_file.relative_to(self.defra_dir).as_posix()
+            sources.setdefault(name.rsplit('/', 1)[0], {})[name] = [stat.st_size, stat.st_mtime_ns]
+
+        previous = None
+        if skip_unchanged and store.exists() and sources_file.exists():
+            previous = json.loads(sources_file.read_text())
+            #a store written before the per station layout is rebuilt.
+            if not all(isinstance(files, dict) for files in previous.values()):
+                previous = None
+
+        if previous is None:
+            written = store.write_from_csv(self.defra_dir, max_workers=max_workers, std_names=self.std_column)
+            sources_file.write_text(json.dumps(sources))
+            return written
+
+        changed = sorted(name for name in sources if sources[name] != previous.get(name))
+        gone = sorted(set(previous) - set(sources))
+        if not changed and not gone:
+            print(f"Store {store.store_dir} is up to date with {sum(map(len, sources.values()))} DEFRA files.")
+            return {}
+
+        #forget the folders first, a run killed before they are written again redoes them.
+        sources_file.write_text(json.dumps({name: files for name, files in previous.items()
+                                            if name not in changed and name not in gone}))
+        store.remove_batches(changed + gone)
+        written = {}
+        if changed:
+            written = store.write_from_csv(self.defra_dir, max_workers=max_workers, overwrite=False,
+                                           std_names=self.std_column, batch_names=set(changed))
+        sources_file.write_text(json.dumps(sources))
+        print(f"Store {store.store_dir}: {len(changed)} station folders written again, {len(gone)} removed.")
+        return written
+
+
+def _std_defra_file(csv_file, output_file, std_pollutant_name, skip_unchanged=True):
+    """Write csv_file with the pollutant_std column to output_file.
+
+    Returns:
+        False when skipped because the output is newer than the source, True when written.
+    """
+    if skip_unchanged and output_file.exists() and output_file.stat().st_mtime_ns >= csv_file.stat().st_mtime_ns:
+        return False
+
+    #written next to the output and renamed, so an interrupted run never leaves a newer partial file.
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    data = _append_csv_column(csv_file.read_bytes(), 'pollutant_std', std_pollutant_name)
+    if data is not None:
+        tmp_file.write_bytes(data)
+    else:
+        df = pd.read_csv(csv_file, encoding='utf-8')
+        df['pollutant_std'] = std_pollutant_name
+        df.to_csv(tmp_file, index=False)
+    os.replace(tmp_file, output_file)
+    return True
+
+
+def _append_csv_column(data, name, value):
+    """CSV bytes with a constant column added to every line, reading back as df[name] = value would.
+
+    Returns:
+        The new bytes, None when the file needs a real parse (quoted fields, ragged rows, the column already
+        there or nothing to read).
+    """
+    if b'"' in data:
+        return None
+    lines = [line for line in data.splitlines() if line]
+    if not lines or name.encode() in lines[0].split(b','):
+        return None
+    #every row has the header's fields.
+    if data.count(b',') != len(lines) * lines[0].count(b','):
+        return None
+
+    cell = str(value)
+    if any(char in cell for char in ',"\r\n'):
+        cell = '"' + cell.replace('"', '""') + '"'
+    newline = os.linesep.encode()
+    suffix = b',' + cell.encode('utf-8')
+    return newline.join([lines[0] + b',' + name.encode()] + [line + suffix for line in lines[1:]]) + newline
 
 
 if __name__ == "__main__":
-    mapper = PollutantMapper()
+    mapper = PollutantMapper(vocab=VOCAB_FILE if VOCAB_FILE.exists() else None)
     
     # # Standardise LAQN files (commented out to prevent overwriting)
     # print("="*80)
@@ -8,16 +8,25 @@ base url here: https://uk-air.defra.gov.uk/sos-ukair/static/doc/api-doc/#station
 documentation of get capabilities: https://uk-air.defra.gov.uk/assets/documents/Example_SOS_queries_v1.3.pdf 
 """
 from config import Config
+from src.getData.rate_limiter import get_rate_limiter
+from src.getData.watermark import WatermarkStore, rows_after_watermark
+from src.getData.fetch_manifest import FetchManifest
 import pandas as pd 
+import numpy as np
 import requests
 import json
 import os
 from pathlib import Path
 from typing import Dict, List, Any
 from io import StringIO #csv reading from response text.(string)
+#pooled session + thread pool for the concurrent fetch mode.
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import BoundedSemaphore, Lock
+from contextlib import contextmanager
+from urllib.parse import urlparse
 
 #adding date time to fix the timestemp
-from datetime import datetime, timezone
 
 class DefraGet:
     """Class to DEFRA UK-AIR data using (SOS)sensor observation services API fetching data.
@@ -28,6 +37,9 @@ class DefraGet:
     - request: GetCapabilities.
     """
 
+    # coalesced getData spans in months: a year, a quarter, a month.
+    SPAN_STEPS = (12, 3, 1)
+
     def __init__(self):
         """Initialize DefraGet with base URL with config instance."""
         self.config = Config()
@@ -35,6 +47,35 @@ class DefraGet:
         self.timeout = 30
         self.rest_base_url = self.config.defra_url
         self.station_url = self.config.defra_station_url
+        #shared with every other DefraGet instance, SOS had no throttling at all before.
+        self.rate_limiter = get_rate_limiter('defra')
+        #one keep-alive session for every call instead of a new connection per requests.get.
+        self.pool_maxsize = 10
+        self.session = self._build_session(self.pool_maxsize)
+        #cap on requests in flight per host, whatever the number of worker threads.
+        self.max_per_host = 4
+        self._host_slots = {}
+        self._host_slots_lock = Lock()
+        #coalesced backfill: months per getData call, drops to the next step when the API refuses a span.
+        self.span_months = self.SPAN_STEPS[0]
+
+    def _build_session(self, pool_maxsize: int) -> requests.Session:
+        """requests.Session with a connection pool big enough for pool_maxsize threads."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.pool_maxsize = pool_maxsize
+        return session
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        """Hold one of the max_per_host slots of the url's host for the duration of a request."""
+        host = urlparse(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.setdefault(host, BoundedSemaphore(self.max_per_host))
+        with slot:
+            yield
 
     def post_capabilities(self, save_json: bool = True, save_csv: bool = True) -> Dict[str, Any]:
         """ DEFRA uses SOS standard, which is different from LAQN. Order to fetch the data first I need to call capabilities first.
@@ -51,7 +92,8 @@ class DefraGet:
         url = self.capabilities_url
         payload = {"request": "GetCapabilities", "service": "SOS", "version": "2.0.0"}
 
-        response = requests.post(url, json=payload, timeout=self.timeout)
+        with self._host_slot(url):
+            response = self.rate_limiter.call(self.session.post, url, json=payload, timeout=self.timeout)
         response.raise_for_status()
 
         data = response.json()  # expected JSON from /service/json
@@ -156,7 +198,8 @@ class DefraGet:
         }
 
         try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
+            with self._host_slot(url):
+                response = self.rate_limiter.call(self.session.post, url, json=payload, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -205,7 +248,8 @@ class DefraGet:
         params = { "expanded": "true" }
         
         try:
-            response = requests.get(url, params=params, timeout=self.timeout)
+            with self._host_slot(url):
+                response = self.rate_limiter.call(self.session.get, url, params=params, timeout=self.timeout)
             response.raise_for_status()
             stations = response.json()
             
@@ -289,7 +333,8 @@ class DefraGet:
     
         
     def get_timeseries_data(self, timeseries_id: str, timespan: str = None, 
-                           station_name: str = None, pollutant_name: str = None) -> pd.DataFrame:
+                           station_name: str = None, pollutant_name: str = None,
+                           raise_errors: bool = False, timestamp_dtype: str = "str") -> pd.DataFrame:
         """Function for get pollution measurements for a timeseries.
         
         Args:
@@ -297,6 +342,10 @@ class DefraGet:
             timespan: ISO formatted period "YYYY-MM-DDTHH:MM:SSZ/YYYY-MM-DDTHH:MM:SSZ".
             station_name: station name from london_stations_clean.csv 'station_name' column.
             pollutant_name: pollutant name from london_stations_clean.csv 'pollutant_available' column.
+            raise_errors: re-raise request/parse errors instead of returning an empty DataFrame,
+                so callers can tell a failed request from a period without data.
+            timestamp_dtype: "str" (default) gives "YYYY-MM-DD HH:MM:SS" strings as before,
+                "datetime" a typed datetime64[ns, UTC] column.
             
         Returns:
             DataFrame: measurements with timestamp (UTC), value, timeseries_id, station_name, pollutant_name.
@@ -308,7 +357,8 @@ class DefraGet:
             params["timespan"] = timespan
         
         try:
-            response = requests.get(url, params=params, timeout=self.timeout)
+            with self._host_slot(url):
+                response = self.rate_limiter.call(self.session.get, url, params=params, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
            
@@ -319,16 +369,8 @@ class DefraGet:
             
             df = pd.DataFrame(values)
 
-            # Convert epoch ms to "YYYY-MM-DD HH:MM:SS" (UTC).
-            def ms_to_iso(ts):
-                try:
-                    ms = int(ts)
-                    dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
-                    return dt.strftime("%Y-%m-%d %H:%M:%S")
-                except Exception:
-                    return None
-
-            df["timestamp"] = df["timestamp"].apply(ms_to_iso)
+            # Convert epoch ms to "YYYY-MM-DD HH:MM:SS" (UTC) in one vectorized pass, unparseable rows are dropped.
+            df["timestamp"] = epoch_ms_to_timestamps(df["timestamp"], dtype=timestamp_dtype)
             df = df.dropna(subset=["timestamp"])
             
             # Add metadata columns from cleaned CSV
@@ -341,6 +383,8 @@ class DefraGet:
 
         except Exception as e:
             print(f"Error fetching data for timeseries {timeseries_id}: {e}")
+            if raise_errors:
+                raise
             return pd.DataFrame(columns=["timestamp", "value", "timeseries_id", "station_name", "pollutant_name"])
 
 
@@ -348,7 +392,16 @@ class DefraGet:
 
     def fetch_all_monthly_measurements(self,
                                        input_csv: Path = Path("data/defra/test/london_stations_clean.csv"),
-                                       years=(2023, 2024, 2025)) -> None:
+                                       years=(2023, 2024, 2025),
+                                       incremental: bool = False,
+                                       watermarks: WatermarkStore = None,
+                                       until: str = None,
+                                       base_dir: Path = Path("data/defra"),
+                                       resume: bool = False,
+                                       manifest: FetchManifest = None,
+                                       max_workers: int = 1,
+                                       max_per_host: int = None,
+                                       coalesce: bool = False) -> None:
         """
         Fetch and save monthly measurements for ALL station-pollutant timeseries listed
         in london_stations_clean.csv, using the DEFRA REST API.
@@ -363,6 +416,32 @@ class DefraGet:
               data/defra/2023measurements/<station>/<pollutant>__YYYY_MM.csv
               data/defra/2024measurements/<station>/<pollutant>__YYYY_MM.csv
               data/defra/2025measurements/<station>/<pollutant>__YYYY_MM.csv
+
+        Incremental mode (refresh runs):
+        - A timeseries without a watermark is backfilled over `years` as above.
+        - A timeseries with one only asks for the hours between its watermark and `until`,
+          month by month, and appends them to the same monthly files.
+        - The watermark (data/watermarks/defra.json) moves after each month is on disk.
+
+        Resume (backfill runs):
+        - Every (timeseries_id, month) request is a unit in <base_dir>/fetch_manifest.sqlite with its
+          state, row count and file checksum.
+        - A rerun skips the units that completed and only retries failed or missing ones.
+        - A month that is not over yet, or whose timespan stops before its end (2025_11), stays 'partial'
+          and is fetched again.
+
+        Args:
+            incremental (bool): use the watermarks, see above.
+            watermarks (WatermarkStore, optional): defaults to data/watermarks/defra.json.
+            until (str, optional): end of a refresh, "YYYY-MM-DD HH:MM:SS" UTC, defaults to the current hour.
+            base_dir (Path): root of the <year>measurements folders.
+            resume (bool): record units in <base_dir>/fetch_manifest.sqlite and skip the completed ones, off by
+                default, passing a manifest turns it on too.
+            manifest (FetchManifest, optional): defaults to <base_dir>/fetch_manifest.sqlite.
+            max_workers (int): units fetched concurrently over the pooled session, 1 keeps the sequential loop.
+            max_per_host (int, optional): cap on requests in flight per host, defaults to self.max_per_host.
+            coalesce (bool): ask for a whole year per request (then quarters, then months when the API
+                refuses the span) and split the values into the monthly files locally, ~12x fewer round trips.
         """
         # 1) Load cleaned list
         df = pd.read_csv(input_csv)
@@ -371,36 +450,20 @@ class DefraGet:
         # 2) Normalize types (e.g., "4565.0" -> "4565")
         df["timeseries_id"] = df["timeseries_id"].apply(lambda x: str(int(x)) if pd.notna(x) else "")
 
-        # 3) Build monthly periods for each year
-        def build_periods_for_year(year: int):
-            months = []
-            if year in (2023, 2024):
-                # Full months
-                for m in range(1, 13):
-                    start = f"{year}-{m:02d}-01T00:00:00Z"
-                    # Month length
-                    if m in (1, 3, 5, 7, 8, 10, 12):
-                        end_day = 31
-                    elif m == 2:
-                        end_day = 29 if year % 4 == 0 else 28
-                    else:
-                        end_day = 30
-                    end = f"{year}-{m:02d}-{end_day:02d}T23:59:59Z"
-                    label = f"{year}_{m:02d}"
-                    months.append((start, end, label))
-            elif year == 2025:
-                # Up to 2025-11-09
-                for m in range(1, 12):
-                    start = f"2025-{m:02d}-01T00:00:00Z"
-                    end_day = 31 if m in (1, 3, 5, 7, 8, 10) else (29 if m == 2 else 30)
-                    end = f"2025-{m:02d}-{end_day:02d}T23:59:59Z"
-                    label = f"2025_{m:02d}"
-                    months.append((start, end, label))
-                # Override November end to 09
-                months[-1] = ("2025-11-01T00:00:00Z", "2025-11-09T23:59:59Z", "2025_11")
-            return months
-
-        # 4) Iterate station/pollutant combos
+        if incremental and watermarks is None:
+            watermarks = WatermarkStore.for_source('defra')
+        until = pd.Timestamp(until) if until else pd.Timestamp.now(tz='UTC').tz_localize(None).floor('h')
+        if resume and manifest is None:
+            manifest = FetchManifest(Path(base_dir) / "fetch_manifest.sqlite")
+        if max_per_host is not None and max_per_host != self.max_per_host:
+            self.max_per_host = max_per_host
+            self._host_slots = {}
+        if max_workers > self.pool_maxsize:
+            self.session = self._build_session(max_workers)
+
+        # 3) Iterate station/pollutant combos, backfill months become independent work units,
+        #    refresh series stay whole because each month starts at the previous one's watermark.
+        batches, refresh_series = [], []
         for _, row in df.iterrows():
             ts_id = row["timeseries_id"]
             station = row.get("station_name", "")
@@ -410,25 +473,285 @@ class DefraGet:
             safe_station = station.replace("/", "_").replace(" ", "_")
             safe_poll = pollutant.replace("/", "_").replace(" ", "_")
 
-            # 5) Per-year base dir and monthly saves
+            watermark = watermarks.get(WatermarkStore.key(ts_id)) if incremental else None
+            if watermark is not None:
+                refresh_series.append((ts_id, station, pollutant, safe_station, safe_poll, watermark))
+                continue
+
+            # 4) Per-year base dir and monthly saves
             for year in years:
-                year_dir = Path(f"data/defra/{year}measurements") / safe_station
+                year_dir = Path(base_dir) / f"{year}measurements" / safe_station
                 year_dir.mkdir(parents=True, exist_ok=True)
+                units = [(ts_id, station, pollutant, start, end, label, year_dir / f"{safe_poll}__{label}.csv")
+                         for start, end, label in self.build_periods_for_year(year)]
+                # coalesced: one batch per series-year, otherwise one batch per month.
+                batches += [units] if coalesce else [[unit] for unit in units]
+
+        # 5) Run the batches, one after the other or over the pooled session.
+        def run_refresh(series):
+            self._refresh_series(*series, until=until, base_dir=base_dir, watermarks=watermarks)
+            return []
+
+        # incremental backfills must see failures too, an empty month would let the watermark skip it.
+        def run_batch(batch):
+            if coalesce:
+                return self._backfill_span(batch, manifest=manifest, read_skipped=incremental,
+                                           raise_errors=incremental)
+            return [self._backfill_unit(*batch[0], manifest=manifest, read_skipped=incremental,
+                                        raise_errors=incremental)]
+
+        print(f"{len(batches)} backfill batches, {len(refresh_series)} series to refresh, {max_workers} worker(s).")
+        results = []
+        if max_workers <= 1:
+            for batch in batches:
+                results += run_batch(batch)
+            for series in refresh_series:
+                run_refresh(series)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(run_batch, batch) for batch in batches]
+                futures += [executor.submit(run_refresh, series) for series in refresh_series]
+                for future in as_completed(futures):
+                    results += future.result()
+
+        # 6) First run of a series in incremental mode is a backfill, remember where it got to.
+        #    Only once every month of it is stored, otherwise a failed month would sit behind the watermark.
+        if incremental:
+            by_series = {}
+            for ts_id, label, status, last_stored in results:
+                by_series.setdefault(ts_id, []).append((status, last_stored))
+            for ts_id, outcomes in by_series.items():
+                stored = [last for status, last in outcomes if last is not None]
+                if stored and all(status != 'failed' for status, _ in outcomes):
+                    watermarks.advance(WatermarkStore.key(ts_id), max(stored))
+
+        failed = sum(1 for result in results if result[2] == 'failed')
+        skipped = sum(1 for result in results if result[2] == 'skipped')
+        if manifest is not None:
+            print(f"Manifest {manifest.path}: {manifest.summary()}, skipped {skipped} completed units.")
+        elif failed:
+            print(f"{failed} units failed.")
+
+    @staticmethod
+    def build_periods_for_year(year: int):
+        """Monthly (start, end, label) timespans for one year, 2025 stops at 2025-11-09."""
+        months = []
+        if year in (2023, 2024):
+            # Full months
+            for m in range(1, 13):
+                start = f"{year}-{m:02d}-01T00:00:00Z"
+                # Month length
+                if m in (1, 3, 5, 7, 8, 10, 12):
+                    end_day = 31
+                elif m == 2:
+                    end_day = 29 if year % 4 == 0 else 28
+                else:
+                    end_day = 30
+                end = f"{year}-{m:02d}-{end_day:02d}T23:59:59Z"
+                label = f"{year}_{m:02d}"
+                months.append((start, end, label))
+        elif year == 2025:
+            # Up to 2025-11-09
+            for m in range(1, 12):
+                start = f"2025-{m:02d}-01T00:00:00Z"
+                end_day = 31 if m in (1, 3, 5, 7, 8, 10) else (28 if m == 2 else 30)  # 2025 is not a leap year
+                end = f"2025-{m:02d}-{end_day:02d}T23:59:59Z"
+                label = f"2025_{m:02d}"
+                months.append((start, end, label))
+            # Override November end to 09
+            months[-1] = ("2025-11-01T00:00:00Z", "2025-11-09T23:59:59Z", "2025_11")
+        return months
+
+    def _backfill_unit(self, ts_id, station, pollutant, start, end, label, out_file, manifest=None,
+                       read_skipped=False, raise_errors=False):
+        """Fetch one (timeseries_id, month) unit and save it as its monthly CSV.
+        A request error is a 'failed' unit with a manifest or raise_errors, otherwise an 'empty' one.
+
+        Returns:
+            tuple: (ts_id, label, status, last stored timestamp or None), status is
+                'saved', 'empty', 'skipped' (completed in an earlier run) or 'failed'.
+        """
+        if manifest is not None:
+            if manifest.is_complete(ts_id, label):
+                return self._skipped_unit(ts_id, label, out_file, read_skipped)
+            manifest.start(ts_id, label)
+
+        timespan = f"{start}/{end}"
+        try:
+            out = self.get_timeseries_data(
+                ts_id,
+                timespan=timespan,
+                station_name=station,
+                pollutant_name=pollutant,
+                raise_errors=raise_errors or manifest is not None
+            )
+        except Exception as e:
+            # recorded as failed, the next run retries it.
+            if manifest is not None:
+                manifest.fail(ts_id, label, e)
+            print(f"Fetch of {ts_id} {label} failed: {e}")
+            return (ts_id, label, 'failed', None)
+
+        return self._save_month(ts_id, label, out, out_file, manifest, end)
+
+    def _skipped_unit(self, ts_id, label, out_file, read_skipped=False):
+        """Result for a unit completed in an earlier run, read_skipped reads its file back for the watermark."""
+        last_stored = None
+        if read_skipped and out_file.exists():
+            _, last_stored = rows_after_watermark(pd.read_csv(out_file), "timestamp", None, "value")
+        return (ts_id, label, 'skipped', last_stored)
+
+    def _save_month(self, ts_id, label, out, out_file, manifest=None, end=None):
+        """Save one month of values as its CSV and close its manifest unit.
+        The unit is only final when the timespan (ending at end) covered the whole month and the month is over."""
+        partial = end is not None and not self._month_is_over(label, end)
+        if out.empty:
+            if manifest is not None:
+                manifest.finish(ts_id, label, 0, partial=partial)
+            return (ts_id, label, 'empty', None)
+
+        # write then rename, a run killed mid-write never leaves a truncated CSV marked as done.
+        tmp_file = out_file.with_name(out_file.name + ".tmp")
+        out.to_csv(tmp_file, index=False)
+        os.replace(tmp_file, out_file)
+        if manifest is not None:
+            manifest.finish(ts_id, label, len(out), out_file, partial=partial)
+        print(f"Saved: {out_file} ({len(out)} rows)")
+        _, last_stored = rows_after_watermark(out, "timestamp", None, "value")
+        return (ts_id, label, 'saved', last_stored)
+
+    @staticmethod
+    def _month_is_over(label, end):
+        """True when a "YYYY_MM" month has ended and the timespan end ("YYYY-MM-DDTHH:MM:SSZ") reaches its last hour."""
+        last_hour = pd.Timestamp(f"{label[:4]}-{label[5:]}-01") + pd.offsets.MonthBegin(1) - pd.Timedelta(hours=1)
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        return pd.Timestamp(end.rstrip("Z")) >= last_hour and now > last_hour + pd.Timedelta(hours=1)
+
+    def _backfill_span(self, units, manifest=None, read_skipped=False, raise_errors=False):
+        """Coalesced backfill of consecutive monthly units of one series.
+
+        Months still to fetch are requested span_months at a time, the values are split back into
+        the monthly files locally. Same results as _backfill_unit, one tuple per month.
+        """
+        results, pending = [], []
+        for unit in units:
+            ts_id, label, out_file = unit[0], unit[5], unit[6]
+            if manifest is not None and manifest.is_complete(ts_id, label):
+                results.append(self._skipped_unit(ts_id, label, out_file, read_skipped))
+            else:
+                pending.append(unit)
+
+        size = self.span_months
+        for i in range(0, len(pending), size):
+            results += self._fetch_span(pending[i:i + size], manifest, raise_errors)
+        return results
+
+    def _fetch_span(self, chunk, manifest=None, raise_errors=False):
+        """One getData call from the first to the last month of chunk, smaller spans if the API refuses it."""
+        if len(chunk) == 1:
+            return [self._backfill_unit(*chunk[0], manifest=manifest, raise_errors=raise_errors)]
+
+        ts_id, station, pollutant = chunk[0][:3]
+        timespan = f"{chunk[0][3]}/{chunk[-1][4]}"
+        try:
+            out = self.get_timeseries_data(ts_id, timespan=timespan, station_name=station,
+                                           pollutant_name=pollutant, raise_errors=True)
+        except Exception as e:
+            smaller = next(n for n in self.SPAN_STEPS if n < len(chunk))
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code in (400, 413):
+                # span too large for the API, start the next series at the smaller size straight away.
+                with self._host_slots_lock:
+                    self.span_months = min(self.span_months, smaller)
+            print(f"Span {timespan} failed for {ts_id}, retrying as {smaller}-month spans.")
+            return [result for i in range(0, len(chunk), smaller)
+                    for result in self._fetch_span(chunk[i:i + smaller], manifest, raise_errors)]
+
+        # split the span back into its months, timestamps are "YYYY-MM-DD HH:MM:SS" UTC.
+        labels = out["timestamp"].str[:7].str.replace("-", "_", regex=False)
+        results = []
+        for ts_id, station, pollutant, start, end, label, out_file in chunk:
+            if manifest is not None:
+                manifest.start(ts_id, label)
+            month = out[labels == label].reset_index(drop=True)
+            results.append(self._save_month(ts_id, label, month, out_file, manifest, end))
+        return results
+
+    def _refresh_series(self, ts_id, station, pollutant, safe_station, safe_poll, watermark, until, base_dir,
+                        watermarks):
+        """Refresh one series: only the hours after its watermark, appended to the monthly files.
+        A failed request stops the series where it is, so the watermark never moves past a month that was not
+        fetched, only months the API returned empty are skipped."""
+        for start, end, label in self._periods_after(watermark, until):
+            try:
+                out = self.get_timeseries_data(ts_id, timespan=f"{start}/{end}", station_name=station,
+                                               pollutant_name=pollutant, raise_errors=True)
+            except Exception:
+                print(f"Refresh of {ts_id} stopped at {label}, the watermark stays at {watermark}.")
+                return None
+            out, new_watermark = rows_after_watermark(out, "timestamp", watermark, "value")
+            if new_watermark is None:
+                continue
+            year_dir = Path(base_dir) / f"{label[:4]}measurements" / safe_station
+            year_dir.mkdir(parents=True, exist_ok=True)
+            out_file = year_dir / f"{safe_poll}__{label}.csv"
+            out.to_csv(out_file, mode="a", header=not out_file.exists(), index=False)
+            watermarks.advance(WatermarkStore.key(ts_id), new_watermark)
+            watermark = new_watermark
+            print(f"Appended: {out_file} ({len(out)} rows)")
+        return None
+
+    @staticmethod
+    def _periods_after(watermark, until):
+        """Monthly (start, end, label) timespans from the hour after the watermark up to until.
+
+        Args:
+            watermark (pd.Timestamp): last stored hour (UTC).
+            until (pd.Timestamp): last hour to ask for (UTC).
+        Returns:
+            list: [("YYYY-MM-DDTHH:MM:SSZ", "YYYY-MM-DDTHH:MM:SSZ", "YYYY_MM"), ...]
+        """
+        periods = []
+        start = watermark + pd.Timedelta(hours=1)
+        while start <= until:
+            month_end = (start + pd.offsets.MonthBegin(1)).normalize() - pd.Timedelta(seconds=1)
+            end = min(month_end, until + pd.Timedelta(minutes=59, seconds=59))
+            periods.append((start.strftime("%Y-%m-%dT%H:%M:%SZ"), end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                            start.strftime("%Y_%m")))
+            start = month_end + pd.Timedelta(seconds=1)
+        return periods
+
+def epoch_ms_to_timestamps(values, dtype: str = "str") -> pd.Series:
+    """Vectorized epoch milliseconds -> UTC timestamps, replaces the per-row datetime.fromtimestamp/strftime.
+
+    Args:
+        values: Series/array of epoch ms (ints, floats or numeric strings).
+        dtype: "str" for "YYYY-MM-DD HH:MM:SS" strings (None where the value is not a number),
+            "datetime" for a datetime64[ns, UTC] Series (NaT where the value is not a number).
+    Returns:
+        pd.Series: same index as values.
+    """
+    values = pd.Series(values)
+    ms = pd.to_numeric(values, errors="coerce")
+    valid = ms.notna().to_numpy()
+    # whole milliseconds like int(ts) did before, as datetime64[ms] so numpy does the calendar maths.
+    stamps = ms.to_numpy(dtype="float64", na_value=0).astype("int64").astype("datetime64[ms]")
+
+    if dtype == "datetime":
+        out = pd.Series(pd.DatetimeIndex(stamps).as_unit("ns").tz_localize("UTC"), index=values.index, name=values.name)
+        out[~valid] = pd.NaT
+        return out
+    if dtype != "str":
+        raise ValueError(f"timestamp_dtype must be 'str' or 'datetime', got {dtype!r}")
+
+    # "YYYY-MM-DDTHH:MM:SS" from numpy, the T is always character 10, swap it in place on the fixed-width buffer.
+    text = np.datetime_as_string(stamps, unit="s")
+    if len(text):
+        text.view("<U1").reshape(len(text), -1)[:, 10] = " "
+    text = pd.Series(text.astype(object), index=values.index, name=values.name)
+    text[~valid] = None
+    return text
 
-                for start, end, label in build_periods_for_year(year):
-                    timespan = f"{start}/{end}"
-                    out = self.get_timeseries_data(
-                        ts_id,
-                        timespan=timespan,
-                        station_name=station,
-                        pollutant_name=pollutant
-                    )
-                    if out.empty:
-                        continue
-
-                    out_file = year_dir / f"{safe_poll}__{label}.csv"
-                    out.to_csv(out_file, index=False)
-                    print(f"Saved: {out_file} ({len(out)} rows)")
 
 """2. STEP: Fetch and parse EU Air Quality pollutant vocabulary.
 Downloads pollutant definitions from EU EEA (European Environment Agency)
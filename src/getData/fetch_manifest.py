@@ -0,0 +1,118 @@
+"""Durable manifest of DEFRA backfill work units, so a crashed or killed run can resume where it stopped.
+
+One unit is one (timeseries_id, period) request, e.g. ('4565', '2024_03'). Each unit is recorded in a small
+SQLite file with its state, row count and the checksum of the CSV written for it:
+    running -> done     rows saved, checksum of the file
+            -> empty    the API had no rows for this period
+            -> partial  rows saved for a period that is not over yet (or was cut short), fetched again next run
+            -> failed   request/parse error, retried on the next run
+A rerun skips done/empty units (done only while its file is still there) and retries everything else.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+from threading import Lock
+
+from src.checksum import file_checksum
+
+
+class FetchManifest:
+    """SQLite backed {(timeseries_id, period): state, rows, checksum} table.
+
+    Args:
+        path (str): SQLite file, created if missing.
+    """
+
+    COMPLETE_STATES = ('done', 'empty')
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        #one connection shared by the fetch threads, sqlite calls are serialised with the lock.
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS units (
+                    timeseries_id TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    rows INTEGER DEFAULT 0,
+                    checksum TEXT,
+                    path TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT,
+                    PRIMARY KEY (timeseries_id, period)
+                )""")
+
+    def _now(self):
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    def get(self, timeseries_id, period):
+        """Unit as a dict, None if it was never started."""
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT timeseries_id, period, state, rows, checksum, path, attempts, error, updated_at "
+                "FROM units WHERE timeseries_id = ? AND period = ?", (str(timeseries_id), period))
+            row = cur.fetchone()
+            columns = [c[0] for c in cur.description]
+        return dict(zip(columns, row)) if row else None
+
+    def is_complete(self, timeseries_id, period):
+        """True if the unit finished in an earlier run and its CSV (if any) is still on disk."""
+        unit = self.get(timeseries_id, period)
+        if unit is None or unit['state'] not in self.COMPLETE_STATES:
+            return False
+        return unit['state'] == 'empty' or (unit['path'] is not None and os.path.exists(unit['path']))
+
+    def start(self, timeseries_id, period):
+        """Mark a unit as running, a unit still 'running' at the next start means the run died on it."""
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO units (timeseries_id, period, state, attempts, updated_at) VALUES (?, ?, 'running', 1, ?)
+                ON CONFLICT (timeseries_id, period)
+                DO UPDATE SET state = 'running', attempts = attempts + 1, error = NULL, updated_at = excluded.updated_at
+                """, (str(timeseries_id), period, self._now()))
+
+    def finish(self, timeseries_id, period, rows, path=None, partial=False):
+        """Mark a unit done (or empty when rows == 0), with the checksum of the file it wrote.
+        partial keeps it out of the completed states, e.g. for the current month."""
+        checksum = file_checksum(path) if path else None
+        state = 'partial' if partial else 'done' if rows else 'empty'
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE units SET state = ?, rows = ?, checksum = ?, path = ?, updated_at = ? "
+                "WHERE timeseries_id = ? AND period = ?",
+                (state, int(rows), checksum, str(path) if path else None, self._now(), str(timeseries_id), period))
+
+    def fail(self, timeseries_id, period, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE units SET state = 'failed', error = ?, updated_at = ? WHERE timeseries_id = ? AND period = ?",
+                (str(error)[:500], self._now(), str(timeseries_id), period))
+
+    def verify(self, timeseries_id, period):
+        """Recompute the checksum of a done unit's file, False if it is missing or changed since."""
+        unit = self.get(timeseries_id, period)
+        if unit is None or unit['state'] != 'done' or not unit['path'] or not os.path.exists(unit['path']):
+            return False
+        return file_checksum(unit['path']) == unit['checksum']
+
+    def summary(self):
+        """{state: number of units}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall())
+
+    def failed_units(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT timeseries_id, period, error FROM units WHERE state = 'failed' ORDER BY timeseries_id, period"
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
@@ -2,6 +2,7 @@
 
 1. get_monitor_sites: This function will fetch monitoring sites for a given group name with species information.
 2. get_hourly_data: This function will fetch hourly air quality data for a specific site and species within a date range.
+3. async_fetch_hourly_data: asyncio version of parallel_fetch_hourly_data, one pooled keep-alive client for every pair.
 """
 
 #import statements below for necessary libraries to make API requests and handle data.
@@ -10,6 +11,12 @@ import json, csv, os
 
 #config.py file importing Config class to access the API endpoint URLs.
 from config import Config
+#shared adaptive rate limiter instead of fixed sleeps between requests.
+from src.getData.rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+#persisted last-stored timestamps for incremental refresh runs.
+from src.getData.watermark import WatermarkStore, rows_after_watermark
+#streaming RawAQData decode into typed columns, instead of response.json() + DataFrame(list of dicts).
+from src.getData.laqn_stream import parse_raw_aq_stream
 import pandas as pd
 # import response
 import time # to handle rate limiting by adding delays between requests if necessary.
@@ -22,6 +29,18 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from threading import Lock
 
+# asyncio + httpx for the async fetch mode, hundreds of requests in flight on one thread.
+import asyncio
+import httpx
+
+
+# httpx's connection pool scans every connection for every queued request, which gets slow past a few dozen
+# connections. The async fetch splits its pool into clients of this size instead of one huge pool.
+_POOL_SHARD_SIZE = 16
+
+# bytes read from the socket per step in the streaming mode, a month of one pair is ~40 KB of JSON.
+_STREAM_CHUNK_SIZE = 16 * 1024
+
 
 class laqnGet:
     """Class to keep get_groups, get_monitor_sites functions to under one roof."""
@@ -29,6 +48,8 @@ class laqnGet:
     def __init__(self):
         """Initialize the laqnGet class with Config instance."""
         self.config = Config()
+        #one limiter for every laqnGet instance/thread in the process.
+        self.rate_limiter = get_rate_limiter('laqn')
     
 
     """Get_site_species url gave 400 bad request error. To understand the issure, I checked the API url on postman.
@@ -42,7 +63,7 @@ class laqnGet:
     def get_sites_species(self):
         """Fetch all monitoring sites and their species for London from the LAQN API."""
         url = self.config.get_sites_species.format(GROUPNAME="London")
-        response = requests.get(url)
+        response = self.rate_limiter.call(requests.get, url)
 
         if response.status_code != 200 or not response.text.strip():
             raise Exception(f"API request failed or returned empty response: {response.status_code}")
@@ -77,8 +98,10 @@ class laqnGet:
         # df_sites_species.to_csv(output_path, index=False)
         return df_sites_species
     
-    def get_hourly_data(self, site_code, species_code, start_date, end_date):
-        """Fetch hourly air quality data for a specific site and species within a date range."""
+    def get_hourly_data(self, site_code, species_code, start_date, end_date, stream=False):
+        """Fetch hourly air quality data for a specific site and species within a date range.
+        stream=True decodes the body on the fly into typed columns (datetime64 timestamps, float values,
+        categorical site/species) instead of strings, see laqn_stream.py."""
         # normalize dates to YYYY-MM-DD (API expects simple date strings)
         start_date = pd.to_datetime(start_date).strftime('%Y-%m-%d')
         end_date = pd.to_datetime(end_date).strftime('%Y-%m-%d')
@@ -89,7 +112,12 @@ class laqnGet:
             STARTDATE=start_date,
             ENDDATE=end_date
         )
-        response = requests.get(url, timeout=30)
+        if stream:
+            status_code, df_hourly = self._stream_hourly_frame(url, site_code, species_code, timeout=30)
+            print(f"[get_hourly_data] URL: {url} Status: {status_code}")
+            return df_hourly
+
+        response = self.rate_limiter.call(requests.get, url, timeout=30)
         print(f"[get_hourly_data] URL: {url} Status: {response.status_code}")
         if response.status_code != 200 or not response.text.strip():
             print(f"[get_hourly_data] Response text: {response.text[:1000]}")
@@ -128,7 +156,8 @@ class laqnGet:
 
     """I will use the site codes from  actv_sites_species.csv.csv to fetch the hourly data for each site and species.
     I will create a loop to iterate through each site code and species code to fetch the data"""
-    def helper_fetch_hourly_data(self, start_date, end_date, save_dir=None, sleep_sec=1):
+    def helper_fetch_hourly_data(self, start_date, end_date, save_dir=None, sleep_sec=None, incremental=False,
+                                 watermarks=None, sites_species_csv=None, stream=False):
         """
         Read site/species pairs from data/laqn/actv_sites_species.csv and fetch hourly data for each pair.
     
@@ -136,54 +165,61 @@ class laqnGet:
             start_date (str): Start date in ISO format (e.g., "2023-01-01T00:00:00").
             end_date (str): End date in ISO format (e.g., "2023-01-08T23:59:59").
             save_dir (str, optional): Directory to save individual CSV files.
-            sleep_sec (float): Sleep time between requests to avoid rate limiting.
+            sleep_sec (float, optional): Extra fixed sleep between requests. The shared adaptive
+                rate limiter already paces the requests, so None (default) means no extra sleep.
+            incremental (bool): Refresh mode, only request the hours after each pair's watermark and
+                append them to <save_dir>/<site>_<species>.csv. start_date is only used for pairs
+                without a watermark yet.
+            watermarks (WatermarkStore, optional): defaults to data/watermarks/laqn.json.
+            sites_species_csv (str, optional): Site/species list, defaults to actv_sites_species.csv
+            stream (bool): Decode responses on the fly into typed columns, lower peak memory per pair.
             
         Returns:
-            dict: Dictionary keyed by (site_code, species_code) with DataFrame values.
+            dict: Dictionary keyed by (site_code, species_code) with DataFrame values, only the new rows in incremental mode.
         """
 
-        api_start_date, api_end_date, pairs, total_pairs = self.parallel_fetch_params(start_date, end_date)
+        api_start_date, api_end_date, pairs, total_pairs = self.parallel_fetch_params(start_date, end_date, sites_species_csv)
         print(f"Found {total_pairs} unique site/species pairs to fetch data for {api_start_date} to {api_end_date}")
 
         results = {}
         url = self.config.get_hourly_data
 
-        if save_dir:
-            out_dir = os.path.join(os.path.dirname(__file__), '..', save_dir)
-            os.makedirs(out_dir, exist_ok=True)
-            print(f"Will save CSVs to: {out_dir}")
-        else:
-            out_dir = None
+        out_dir = self._prepare_out_dir(save_dir, incremental)
+        if incremental and watermarks is None:
+            watermarks = WatermarkStore.for_source('laqn')
 
         #changing tuple to progress count.
         for idx, (_, row) in enumerate(pairs.iterrows(), 1):
             site_code = row['SiteCode']
             species_code = row['SpeciesCode']
+            pair_start_date = api_start_date
+            if incremental:
+                pair_start_date = self._incremental_start_date(site_code, species_code, api_start_date, watermarks)
+                if pair_start_date > api_end_date:
+                    print(f"{site_code}/{species_code} is up to date - skipping.")
+                    continue
             try:
                 #added formatting here to replace string placeholders on get_hourly_data url.
                 formatted_url = url.format(
                     SITECODE=site_code,
                     SPECIESCODE=species_code,
-                    STARTDATE=api_start_date,
+                    STARTDATE=pair_start_date,
                     ENDDATE=api_end_date,
                 )
 
                 #let's request the url here. hope it says 200ok.
-                response = requests.get(formatted_url, timeout=30)
-
-                if response.status_code ==200:
-                    data = response.json()
+                if stream:
+                    status_code, df_hourly = self._stream_hourly_frame(formatted_url, site_code, species_code, timeout=30)
+                else:
+                    response = self.rate_limiter.call(requests.get, formatted_url, timeout=30)
+                    status_code = response.status_code
+                    df_hourly = self._json_hourly_frame(response) if status_code == 200 else None
 
+                if status_code ==200:
                     #extract data from response.
-                    if 'RawAQData' in data and 'Data' in data['RawAQData']:
-                        raw_data = data['RawAQData']['Data']
-
-                        #handle the single record case (dict instead of list) vs multiple records list.
-                        if isinstance(raw_data, dict):
-                            raw_data = [raw_data]
-                        
-                        #create dataframe
-                        df_hourly = pd.DataFrame(raw_data)
+                    if df_hourly is not None:
+                        if incremental:
+                            df_hourly = self._store_increment(df_hourly, site_code, species_code, out_dir, watermarks)
 
                         if df_hourly.empty:
                             print(f"No data for this periofd {site_code}/{species_code} - skipping.")
@@ -194,29 +230,31 @@ class laqnGet:
                             results[(site_code, species_code)] = df_hourly
 
                             #save to csv if out_dir specified.
-                            if out_dir is not None:
+                            if out_dir is not None and not incremental:
                                 fname = f"{site_code}_{species_code}_{api_start_date}_{api_end_date}.csv"
                                 df_hourly.to_csv(os.path.join(out_dir, fname), index=False)
                     else: 
                         print(f"Failed to response because of structure.")
                 else:
-                    print(f" HTTP {response.status_code}.")
+                    print(f" HTTP {status_code}.")
             except requests.exceptions.Timeout:
                     print(f"Request timeout for site {site_code}, species {species_code}.")
             except Exception as e:
                 print(f"Error fetching data, try again Burcu.")
         
-            #adding sleep to avoid rate limiting.
-            if idx < total_pairs:
+            #optional fixed sleep on top of the rate limiter.
+            if sleep_sec and idx < total_pairs:
                 time.sleep(sleep_sec)
         print(f"\nComleted: {len(results)}/{total_pairs} fetched.")
         return results
 
     
-    def parallel_fetch_params(self, start_date, end_date):
+    def parallel_fetch_params(self, start_date, end_date, sites_species_csv=None):
         """
         Shared preparation logic for date conversion and loading site-species pairs.
         Internal helper function used by both helper_fetch_hourly_data and parallel_fetch_hourly_data.
+        Args:
+            sites_species_csv (str, optional): path to the site/species list, defaults to data/laqn/actv_sites_species.csv.
         Returns:
             tuple: (api_start_date, api_end_date, pairs_dataframe, total_pairs)."""
         #Convert dates to API format ISO, copy-pasted from check.py
@@ -228,7 +266,7 @@ class laqnGet:
             raise ValueError(f"Data format ISO not working, check here: {e}")
 
         # read site/species pairs describe the paths.
-        csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'laqn', 'actv_sites_species.csv')
+        csv_path = sites_species_csv or os.path.join(os.path.dirname(__file__), '..', 'data', 'laqn', 'actv_sites_species.csv')
         
         try:
             df_sites_species = pd.read_csv(csv_path, encoding='utf-8')
@@ -253,7 +291,68 @@ class laqnGet:
 
         return api_start_date, api_end_date, pairs, total_pairs
 
-    def parallel_fetch_hourly_data(self, start_date, end_date, max_workers=8, save_dir=None, sleep_sec=0.2):
+    def _prepare_out_dir(self, save_dir, incremental=False):
+        """Resolve save_dir relative to src/ like before, incremental runs must have somewhere to append to."""
+        if not save_dir:
+            if incremental:
+                raise ValueError("incremental fetch needs a save_dir, the watermark only moves once rows are stored.")
+            return None
+        out_dir = os.path.join(os.path.dirname(__file__), '..', save_dir)
+        os.makedirs(out_dir, exist_ok=True)
+        print(f"Will save CSVs to: {out_dir}")
+        return out_dir
+
+    def _incremental_start_date(self, site_code, species_code, api_start_date, watermarks):
+        """First day to request for a pair, the day of the hour after its watermark.
+        The LAQN API only takes dates, so the already stored hours of that day come back and get filtered out."""
+        watermark = watermarks.get(WatermarkStore.key(site_code, species_code))
+        if watermark is None:
+            return api_start_date
+        return (watermark + pd.Timedelta(hours=1)).strftime("%Y-%m-%d")
+
+    def _store_increment(self, df_hourly, site_code, species_code, out_dir, watermarks):
+        """Append the rows after the pair's watermark to <site>_<species>.csv, then move the watermark.
+
+        Returns:
+            pd.DataFrame: the new rows, empty when there is nothing new.
+        """
+        key = WatermarkStore.key(site_code, species_code)
+        new_rows, new_watermark = rows_after_watermark(df_hourly, '@MeasurementDateGMT', watermarks.get(key), '@Value')
+        if new_watermark is None:
+            return new_rows
+
+        path = os.path.join(out_dir, f"{site_code}_{species_code}.csv")
+        new_rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+        #watermark only after the rows are on disk, a crash in between means refetching, never a gap.
+        watermarks.advance(key, new_watermark)
+        return new_rows
+
+    def _json_hourly_frame(self, response):
+        """RawAQData.Data of a 200 response as a DataFrame (strings), None if the structure is not there."""
+        data = response.json()
+        if 'RawAQData' in data and 'Data' in data['RawAQData']:
+            raw_data = data['RawAQData']['Data']
+            #handle the single record case (dict instead of list) vs multiple records list.
+            if isinstance(raw_data, dict):
+                raw_data = [raw_data]
+            return pd.DataFrame(raw_data)
+        return None
+
+    def _stream_hourly_frame(self, formatted_url, site_code, species_code, timeout):
+        """Streaming request + decode shared by the fetchers.
+
+        Returns:
+            tuple: (status code, typed DataFrame, empty when the status is not 200 or there is no data).
+        """
+        response = self.rate_limiter.call(requests.get, formatted_url, timeout=timeout, stream=True)
+        with response:
+            if response.status_code != 200:
+                return response.status_code, pd.DataFrame()
+            chunks = response.iter_content(chunk_size=_STREAM_CHUNK_SIZE)
+            return 200, parse_raw_aq_stream(chunks, site_code, species_code)
+
+    def parallel_fetch_hourly_data(self, start_date, end_date, max_workers=8, save_dir=None, sleep_sec=None,
+                                   sites_species_csv=None, incremental=False, watermarks=None, stream=False):
         """
     Fetch hourly data for all site-species pairs using parallel processing.
     
@@ -262,24 +361,25 @@ class laqnGet:
         end_date (str): End date in ISO format (e.g., "2023-01-31T23:59:59")
         save_dir (str, optional): Directory to save individual CSV files
         max_workers (int): Number of parallel workers (default: 7) for now.
-        sleep_sec (float): Sleep between requests per worker to avoid rate limiting
+        sleep_sec (float, optional): Extra fixed sleep per worker, None (default) leaves pacing to the rate limiter
+        sites_species_csv (str, optional): Site/species list, defaults to actv_sites_species.csv
+        incremental (bool): Refresh mode, see helper_fetch_hourly_data.
+        watermarks (WatermarkStore, optional): defaults to data/watermarks/laqn.json.
+        stream (bool): Decode responses on the fly into typed columns, lower peak memory with many workers.
         
     Returns:
         dict: Dictionary keyed by (site_code, species_code) with DataFrame values
     """
     
     # Shared preparation logic
-        api_start_date, api_end_date, pairs, total_pairs = self.parallel_fetch_params(start_date, end_date)
+        api_start_date, api_end_date, pairs, total_pairs = self.parallel_fetch_params(start_date, end_date, sites_species_csv)
         print(f"Found {total_pairs} unique site/species pairs to fetch data for {api_start_date} to {api_end_date}")
         print(f"Date range: {start_date} to {end_date}.")
         print(f"Using up to {max_workers} parallel workers.")
 
-        if save_dir:
-            out_dir = os.path.join(os.path.dirname(__file__), '..', save_dir)
-            os.makedirs(out_dir, exist_ok=True)
-            print(f"Will save CSVs to: {out_dir}")
-        else:
-            out_dir = None
+        out_dir = self._prepare_out_dir(save_dir, incremental)
+        if incremental and watermarks is None:
+            watermarks = WatermarkStore.for_source('laqn')
         
         #Create shated results dict and lock for thread safety.
         results = {}
@@ -292,34 +392,39 @@ class laqnGet:
             """Fetch data for a single site/species pair."""
             site_code = row['SiteCode']
             species_code = row['SpeciesCode']
+            pair_start_date = api_start_date
+            if incremental:
+                pair_start_date = self._incremental_start_date(site_code, species_code, api_start_date, watermarks)
+                if pair_start_date > api_end_date:
+                    return (site_code, species_code, 0, 'up to date')
 
             try:
                 formatted_url = url.format(
                     SITECODE=site_code,
                     SPECIESCODE=species_code,
-                    STARTDATE=api_start_date,
+                    STARTDATE=pair_start_date,
                     ENDDATE=api_end_date,
                 )
 
-                #addding api delay here.
-                time.sleep(sleep_sec)
+                #addding api delay here, only if asked for on top of the shared rate limiter.
+                if sleep_sec:
+                    time.sleep(sleep_sec)
 
                 #requesting the url.
-                response = requests.get(formatted_url, timeout=150)
-
-                #the same logic as in helper_fetch_hourly_data
-                if response.status_code == 200:
-                    data = response.json()
-
+                if stream:
+                    status_code, df_hourly = self._stream_hourly_frame(formatted_url, site_code, species_code, timeout=150)
+                else:
+                    response = self.rate_limiter.call(requests.get, formatted_url, timeout=150)
+                    status_code = response.status_code
                     #extracting data RawAQDAta -> Data
-                    if 'RawAQData' in data and 'Data' in data['RawAQData']:
-                        raw_data = data['RawAQData']['Data']
-
-                        #handle single record case (dict instead of list)
-                        if isinstance(raw_data, dict):
-                            raw_data = [raw_data]
+                    df_hourly = self._json_hourly_frame(response) if status_code == 200 else None
 
-                        df_hourly = pd.DataFrame(raw_data)
+                #the same logic as in helper_fetch_hourly_data
+                if status_code == 200:
+                    if df_hourly is not None:
+                        if incremental:
+                            #one file and one watermark key per pair, so no extra locking is needed.
+                            df_hourly = self._store_increment(df_hourly, site_code, species_code, out_dir, watermarks)
 
                         if not df_hourly.empty:
                             #thread safe write to- locking results dict.
@@ -327,7 +432,7 @@ class laqnGet:
                                 results[(site_code, species_code)] = df_hourly
 
                             #save functionality if needed
-                            if out_dir is not None:
+                            if out_dir is not None and not incremental:
                                 fname = f"{site_code}_{species_code}_{api_start_date}_{api_end_date}.csv"
                                 df_hourly.to_csv(os.path.join(out_dir, fname), index=False)
 
@@ -344,7 +449,7 @@ class laqnGet:
                     else:
                         return (site_code, species_code, 0, 'invalid structure mate...')
                 else:
-                    return (site_code, species_code, 0, f'HTTP {response.status_code}')
+                    return (site_code, species_code, 0, f'HTTP {status_code}')
                 
             except requests.exceptions.Timeout:
                 return (site_code, species_code, 0, 'timeout error')
@@ -362,7 +467,7 @@ class laqnGet:
             #results collection as they complete.
             for future in as_completed(futures):
                 site_code, species_code, record_count, status = future.result()
-                if status != 'success' and status != 'empty...':
+                if status not in ('success', 'empty...', 'up to date'):
                     print(f"[{site_code}/{species_code}] Fetch failed: {status}")
                     
         elapsed_time = time.time() - start_time
@@ -370,4 +475,140 @@ class laqnGet:
         print(f"Average time per successful fetch: {elapsed_time/len(results):.2f} seconds." if results else "No successful fetches.")
 
         return results
-                
\ No newline at end of file
+                
+
+
+    """parallel_fetch_hourly_data is bound by I/O wait, 8 threads each sleep and open a new connection per request.
+    The async version below keeps one httpx.AsyncClient (keep-alive pool) for the whole run, so the monthly pull
+    over every row of actv_sites_species.csv can hold hundreds of requests in flight on a single thread."""
+
+    async def fetch_hourly_data_async(self, start_date, end_date, max_concurrency=64, save_dir=None,
+                                      requests_per_sec='adaptive', timeout=150, sites_species_csv=None):
+        """
+        Coroutine that fetches hourly data for all site-species pairs with asyncio.
+
+        Args:
+            start_date (str): Start date in ISO format (e.g., "2023-01-01T00:00:00")
+            end_date (str): End date in ISO format (e.g., "2023-01-31T23:59:59")
+            max_concurrency (int): Max requests in flight, also the size of the connection pool.
+            save_dir (str, optional): Directory to save individual CSV files
+            requests_per_sec: 'adaptive' (default) draws from the shared LAQN rate limiter, a number gives this
+                run its own fixed req/s budget, None disables rate limiting.
+            timeout (float): Per request timeout in seconds.
+            sites_species_csv (str, optional): Site/species list, defaults to actv_sites_species.csv
+
+        Returns:
+            dict: Dictionary keyed by (site_code, species_code) with DataFrame values
+        """
+        api_start_date, api_end_date, pairs, total_pairs = self.parallel_fetch_params(start_date, end_date, sites_species_csv)
+        print(f"Found {total_pairs} unique site/species pairs to fetch data for {api_start_date} to {api_end_date}")
+        print(f"Using up to {max_concurrency} concurrent requests, rate budget: {requests_per_sec} req/s.")
+
+        if save_dir:
+            out_dir = os.path.join(os.path.dirname(__file__), '..', save_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            print(f"Will save CSVs to: {out_dir}")
+        else:
+            out_dir = None
+
+        results = {}
+        url = self.config.get_hourly_data
+        if requests_per_sec == 'adaptive':
+            budget = self.rate_limiter
+        elif requests_per_sec:
+            budget = AdaptiveRateLimiter('laqn-run', rate=requests_per_sec, adaptive=False)
+        else:
+            budget = None
+
+        #pooled keep-alive clients, each with its own cap so the shards add up to max_concurrency.
+        n_shards = max(1, -(-max_concurrency // _POOL_SHARD_SIZE))
+        shard_size = max(1, max_concurrency // n_shards)
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        clients = [httpx.AsyncClient(limits=limits, timeout=timeout) for _ in range(n_shards)]
+        semaphores = [asyncio.Semaphore(shard_size) for _ in range(n_shards)]
+
+        try:
+            async def fetch_single_pair(shard, site_code, species_code):
+                """Fetch data for a single site/species pair, same statuses as the threaded version."""
+                formatted_url = url.format(
+                    SITECODE=site_code,
+                    SPECIESCODE=species_code,
+                    STARTDATE=api_start_date,
+                    ENDDATE=api_end_date,
+                )
+                try:
+                    #semaphore caps requests in flight, the budget caps requests per second.
+                    async with semaphores[shard]:
+                        if budget is not None:
+                            response = await budget.call_async(clients[shard].get, formatted_url)
+                        else:
+                            response = await clients[shard].get(formatted_url)
+
+                    if response.status_code != 200:
+                        return (site_code, species_code, 0, f'HTTP {response.status_code}')
+
+                    data = response.json()
+                    if 'RawAQData' not in data or 'Data' not in data['RawAQData']:
+                        return (site_code, species_code, 0, 'invalid structure mate...')
+
+                    raw_data = data['RawAQData']['Data']
+                    #handle single record case (dict instead of list)
+                    if isinstance(raw_data, dict):
+                        raw_data = [raw_data]
+
+                    df_hourly = pd.DataFrame(raw_data)
+                    if df_hourly.empty:
+                        return (site_code, species_code, 0, 'empty...')
+
+                    #single thread, so no lock needed around results.
+                    results[(site_code, species_code)] = df_hourly
+
+                    if out_dir is not None:
+                        fname = f"{site_code}_{species_code}_{api_start_date}_{api_end_date}.csv"
+                        #csv writing is blocking, push it off the event loop.
+                        await asyncio.to_thread(df_hourly.to_csv, os.path.join(out_dir, fname), index=False)
+
+                    return (site_code, species_code, len(df_hourly), 'success')
+
+                except httpx.TimeoutException:
+                    return (site_code, species_code, 0, 'timeout error')
+                except Exception as e:
+                    return (site_code, species_code, 0, f'error: {str(e)[:50]}')
+
+            start_time = time.time()
+            tasks = [fetch_single_pair(idx % n_shards, row.SiteCode, row.SpeciesCode)
+                     for idx, row in enumerate(pairs.itertuples(index=False))]
+
+            completed = 0
+            for next_done in asyncio.as_completed(tasks):
+                site_code, species_code, record_count, status = await next_done
+                completed += 1
+                if status != 'success' and status != 'empty...':
+                    print(f"[{site_code}/{species_code}] Fetch failed: {status}")
+                if completed % 50 == 0 or completed == total_pairs:
+                    print(f"Completed {completed}/{total_pairs} pairs.")
+        finally:
+            for client in clients:
+                await client.aclose()
+
+        elapsed_time = time.time() - start_time
+        print(f"\nCompleted: {len(results)}/{total_pairs} fetched in {elapsed_time:.2f} seconds.")
+        return results
+
+    def async_fetch_hourly_data(self, start_date, end_date, max_concurrency=64, save_dir=None,
+                                requests_per_sec='adaptive', timeout=150, sites_species_csv=None):
+        """
+        Blocking wrapper around fetch_hourly_data_async, drop-in for parallel_fetch_hourly_data.
+        Inside a notebook (event loop already running) await fetch_hourly_data_async directly instead.
+
+        Returns:
+            dict: Dictionary keyed by (site_code, species_code) with DataFrame values
+        """
+        return asyncio.run(self.fetch_hourly_data_async(
+            start_date, end_date,
+            max_concurrency=max_concurrency,
+            save_dir=save_dir,
+            requests_per_sec=requests_per_sec,
+            timeout=timeout,
+            sites_species_csv=sites_species_csv,
+        ))
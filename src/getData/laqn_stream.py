@@ -0,0 +1,194 @@
+"""Streaming decode of LAQN RawAQData responses straight into columnar arrays.
+
+response.json() -> list of dicts -> pd.DataFrame keeps three copies of a month-long response in memory at once.
+RawAQStreamParser reads the response body chunk by chunk instead: it skips to RawAQData.Data and decodes one
+{"@MeasurementDateGMT": ..., "@Value": ...} record at a time into
+    - timestamps: list of "YYYY-MM-DD HH:MM:SS" strings, parsed in one numpy pass at the end (datetime64)
+    - values: array('d') of floats, NaN for the empty "" values
+    - site/species: dictionary coded (array of int codes + categories), so a month of one pair costs 2 strings.
+Only the not yet decoded tail of the body is kept in memory.
+
+Handles both shapes the API returns: "Data": [ {...}, {...} ] and the single record case "Data": {...}.
+"""
+
+import codecs
+import json
+import math
+import re
+from array import array
+
+import numpy as np
+import pandas as pd
+
+#same columns as the DataFrame(raw_data) path, typed.
+TIME_COL, VALUE_COL, SITE_COL, SPECIES_COL = '@MeasurementDateGMT', '@Value', '@SiteCode', '@SpeciesCode'
+
+_WHITESPACE = ' \t\n\r'
+_HEADER_CODES = {attr: re.compile(rf'"{col}"\s*:\s*"([^"]*)"')
+                 for attr, col in (('site_code', SITE_COL), ('species_code', SPECIES_COL))}
+
+
+class _DictionaryColumn:
+    """Dictionary coded string column: int codes + list of categories."""
+
+    def __init__(self):
+        self.codes = array('i')
+        self.categories = []
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def to_categorical(self):
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32) if self.codes else [],
+                                         categories=self.categories)
+
+
+class RawAQStreamParser:
+    """Incremental RawAQData parser, feed() it the body chunks then close() for the DataFrame.
+
+    Args:
+        site_code (str): used when the records and the RawAQData header carry no @SiteCode.
+        species_code (str): same for @SpeciesCode.
+    """
+
+    def __init__(self, site_code=None, species_code=None):
+        self.site_code = site_code
+        self.species_code = species_code
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        # seek -> list/single -> done
+        self._state = 'seek'
+
+        self.timestamps = []
+        self.values = array('d')
+        self.sites = _DictionaryColumn()
+        self.species = _DictionaryColumn()
+
+    def feed(self, chunk):
+        """Decode every complete record in chunk (bytes or str), keep the incomplete tail for the next one."""
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        if not chunk or self._state == 'done':
+            return
+        #drop what is already decoded before growing the buffer, keeps it at about one chunk.
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        self._parse()
+
+    def close(self):
+        """Finish the body and return the records as a typed DataFrame.
+
+        Returns:
+            pd.DataFrame: @MeasurementDateGMT (datetime64[ns]), @Value (float64),
+                @SiteCode and @SpeciesCode (category). Empty DataFrame if the body had no RawAQData.Data.
+        Raises:
+            ValueError: the body ended in the middle of the Data records.
+        """
+        self.feed(self._decoder.decode(b'', final=True))
+        if self._state in ('list', 'single'):
+            raise ValueError(f"RawAQData response ended inside Data after {len(self.values)} records")
+        return self.to_frame()
+
+    def to_frame(self):
+        if not self.values:
+            return pd.DataFrame()
+        try:
+            times = np.array(self.timestamps, dtype='datetime64[s]')
+        except ValueError:
+            # a malformed date somewhere, fall back to the forgiving parser for this pair.
+            times = pd.to_datetime(pd.Series(self.timestamps), errors='coerce').to_numpy()
+        return pd.DataFrame({
+            TIME_COL: pd.DatetimeIndex(times).as_unit('ns'),
+            VALUE_COL: np.frombuffer(self.values, dtype=np.float64),
+            SITE_COL: self.sites.to_categorical(),
+            SPECIES_COL: self.species.to_categorical(),
+        })
+
+    def _parse(self):
+        if self._state == 'seek':
+            self._seek_data()
+        if self._state == 'list':
+            self._parse_list()
+        elif self._state == 'single':
+            self._parse_single()
+
+    def _seek_data(self):
+        """Skip to the value of the "Data" key, picking up the header's site/species codes on the way."""
+        key = self._buffer.find('"Data"', self._pos)
+        if key == -1:
+            #the header is only a few bytes, keep all of it until "Data" shows up.
+            return
+        self._read_header(self._buffer[:key])
+
+        pos = key + len('"Data"')
+        while pos < len(self._buffer) and self._buffer[pos] in _WHITESPACE + ':':
+            pos += 1
+        if pos >= len(self._buffer):
+            self._pos = key
+            return
+        opening = self._buffer[pos]
+        self._pos = pos + 1
+        self._state = 'list' if opening == '[' else 'single' if opening == '{' else 'done'
+        if self._state == 'single':
+            self._pos = pos
+
+    def _read_header(self, header):
+        """@SiteCode/@SpeciesCode of the RawAQData object, they come before Data."""
+        for attr, pattern in _HEADER_CODES.items():
+            match = pattern.search(header)
+            if match:
+                setattr(self, attr, match.group(1))
+
+    def _parse_list(self):
+        buffer, pos, end = self._buffer, self._pos, len(self._buffer)
+        while True:
+            while pos < end and buffer[pos] in _WHITESPACE + ',':
+                pos += 1
+            if pos >= end:
+                break
+            if buffer[pos] == ']':
+                self._state = 'done'
+                pos += 1
+                break
+            try:
+                record, next_pos = self._json.raw_decode(buffer, pos)
+            except ValueError:
+                # record cut at the end of this chunk, finish it on the next feed.
+                break
+            self._add(record)
+            pos = next_pos
+        self._pos = pos
+
+    def _parse_single(self):
+        try:
+            record, next_pos = self._json.raw_decode(self._buffer, self._pos)
+        except ValueError:
+            return
+        self._add(record)
+        self._pos = next_pos
+        self._state = 'done'
+
+    def _add(self, record):
+        self.timestamps.append(record.get(TIME_COL))
+        value = record.get(VALUE_COL)
+        try:
+            self.values.append(float(value) if value not in (None, '') else math.nan)
+        except (TypeError, ValueError):
+            self.values.append(math.nan)
+        self.sites.append(record.get(SITE_COL, self.site_code))
+        self.species.append(record.get(SPECIES_COL, self.species_code))
+
+
+def parse_raw_aq_stream(chunks, site_code=None, species_code=None):
+    """Parse an iterable of body chunks (e.g. response.iter_content()) into the typed DataFrame."""
+    parser = RawAQStreamParser(site_code, species_code)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
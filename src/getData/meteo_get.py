@@ -35,6 +35,7 @@ from retry_requests import retry
 import openmeteo_requests
 
 from config import MeteoConfig
+from src.getData.rate_limiter import get_rate_limiter
 
 
 class MeteoGet:
@@ -45,6 +46,8 @@ class MeteoGet:
         self.archive_url = MeteoConfig.open_meteo_archive
         # added parameters from config file.
         self.params = dict(MeteoConfig.meteo_param)
+        # same adaptive limiter as LAQN/DEFRA use, one per API.
+        self.rate_limiter = get_rate_limiter('meteo')
 
         """ commented out the code below to not overwrite to fetched data."""
         # # Prepare client with cache + retries. Take this from openmeteo_requests python code document.
@@ -60,7 +63,7 @@ class MeteoGet:
         # params["start_date"] = start_date
         # params["end_date"] = end_date
 
-        # responses = self._client.weather_api(self.archive_url, params=params)
+        # responses = self.rate_limiter.call(self._client.weather_api, self.archive_url, params=params)
         # return responses[0]
         pass
 
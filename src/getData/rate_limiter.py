@@ -0,0 +1,196 @@
+"""Adaptive token-bucket rate limiter shared by the LAQN, DEFRA SOS and Open-Meteo clients.
+
+A fixed time.sleep per request wastes most of the budget when the API is healthy and still gets
+throttled when it is slow. The limiter below tunes its own rate instead (AIMD, like TCP congestion control):
+- every healthy response adds a little to the rate (additive increase, about `increase` req/s per second),
+- 429 / 5xx / timeouts cut the rate (multiplicative decrease) and honour Retry-After,
+- other 4xx are counted as errors but leave the rate alone,
+- latency rising well above the best latency seen so far slows it down gently before the API starts throttling.
+
+One limiter per API is kept in a module level registry (get_rate_limiter), so every laqnGet/DefraGet/MeteoGet
+instance, thread and coroutine in the process draws from the same budget.
+"""
+
+import asyncio
+import time
+from threading import Lock
+
+from config import Config
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate adapts to how the API is responding.
+
+    Args:
+        name (str): label used in stats/prints, e.g. 'laqn'.
+        rate (float): starting rate in requests per second.
+        min_rate (float): the rate never drops below this.
+        max_rate (float): the rate never grows above this.
+        burst (float): bucket size, requests that can go out back to back. Defaults to one second of rate.
+        increase (float): additive increase, req/s gained per second of healthy responses.
+        decrease (float): multiplicative factor applied on 429/5xx/errors.
+        latency_factor (float): slow down when smoothed latency exceeds this many times the best latency.
+        cooldown (float): seconds between two decreases, so one burst of failures counts once.
+        adaptive (bool): False gives a plain fixed-rate token bucket.
+    """
+
+    def __init__(self, name, rate=5.0, min_rate=0.5, max_rate=50.0, burst=None, increase=0.5,
+                 decrease=0.5, latency_factor=2.0, cooldown=1.0, adaptive=True):
+        self.name = name
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.adaptive = adaptive
+
+        self.tokens = self._capacity()
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.latency_ewma = None
+        self.best_latency = None
+        self.counts = {'ok': 0, 'throttled': 0, 'errors': 0}
+        self._lock = Lock()
+
+    def _capacity(self):
+        return float(self.burst) if self.burst else max(1.0, self.rate)
+
+    def _reserve(self):
+        """Take one token (the bucket may go negative) and return how long the caller has to wait.
+        Reserving up front keeps waiters in order instead of all waking up and racing for the same token."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self._capacity(), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        """Block the calling thread until one request fits in the budget."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Same as acquire for coroutines, waits without blocking the event loop."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, status_code, latency, retry_after=None):
+        """Feed one response back into the limiter.
+
+        Args:
+            status_code (int): HTTP status, None when the request raised (timeout, connection error).
+            latency (float): seconds the request took.
+            retry_after (str/float): Retry-After header value if the API sent one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            throttled = status_code is None or status_code == 429 or status_code >= 500
+
+            if throttled:
+                self.counts['throttled' if status_code == 429 else 'errors'] += 1
+                seconds = self._parse_retry_after(retry_after)
+                if seconds:
+                    self.blocked_until = max(self.blocked_until, now + seconds)
+                self._slow_down(now, self.decrease)
+                return
+            #other 4xx (bad request, not found, too large) are the request's fault, they say nothing about load.
+            if status_code >= 400:
+                self.counts['errors'] += 1
+                return
+
+            self.counts['ok'] += 1
+            if not self.adaptive:
+                return
+
+            #smoothed latency vs the best smoothed latency seen, the best one drifts up slowly so one lucky
+            #fast response does not pin the baseline forever.
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if self.best_latency is None or self.latency_ewma < self.best_latency:
+                self.best_latency = self.latency_ewma
+            else:
+                self.best_latency *= 1.001
+
+            if self.latency_ewma > self.latency_factor * self.best_latency:
+                self._slow_down(now, 0.9)
+            else:
+                # additive increase, spread over the requests of one second.
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def _slow_down(self, now, factor):
+        """Multiplicative decrease, at most once per cooldown (called with the lock held)."""
+        if not self.adaptive or now - self.last_decrease < self.cooldown:
+            return
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.tokens = min(self.tokens, self._capacity())
+        self.last_decrease = now
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """Retry-After in seconds, only the delta-seconds form is used by these APIs."""
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def call(self, func, *args, **kwargs):
+        """Run one HTTP call (requests.get, session.post, ...) inside the limiter and learn from its response.
+        Exceptions are recorded as failures and re-raised, so callers keep their own error handling."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            response = func(*args, **kwargs)
+        except Exception:
+            self.record(None, time.monotonic() - start)
+            raise
+        headers = getattr(response, 'headers', None) or {}
+        self.record(getattr(response, 'status_code', 200), time.monotonic() - start, headers.get('Retry-After'))
+        return response
+
+    async def call_async(self, func, *args, **kwargs):
+        """Async version of call, for httpx.AsyncClient.get and friends."""
+        await self.acquire_async()
+        start = time.monotonic()
+        try:
+            response = await func(*args, **kwargs)
+        except Exception:
+            self.record(None, time.monotonic() - start)
+            raise
+        headers = getattr(response, 'headers', None) or {}
+        self.record(getattr(response, 'status_code', 200), time.monotonic() - start, headers.get('Retry-After'))
+        return response
+
+    def eta_seconds(self, n_requests):
+        """Rough time for n more requests at the current rate, e.g. for a full backfill."""
+        return n_requests / self.rate
+
+    def stats(self):
+        """Snapshot of the current rate and response counts."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'rate': round(self.rate, 3),
+                'latency_ewma': self.latency_ewma,
+                'best_latency': self.best_latency,
+                **self.counts,
+            }
+
+
+_registry = {}
+_registry_lock = Lock()
+
+
+def get_rate_limiter(name):
+    """Shared limiter for one API ('laqn', 'defra', 'meteo'), created from Config.rate_limits on first use."""
+    with _registry_lock:
+        if name not in _registry:
+            settings = Config.rate_limits.get(name, {})
+            _registry[name] = AdaptiveRateLimiter(name, **settings)
+        return _registry[name]
@@ -0,0 +1,119 @@
+"""High-watermark store for incremental fetching.
+
+A watermark is the last timestamp successfully stored for one series: a LAQN (site, species) pair or a
+DEFRA timeseries_id. Refresh runs only ask the APIs for the hours after it and append the new rows,
+instead of pulling whole months again.
+
+Watermarks live in one small JSON file per source, e.g. data/watermarks/laqn.json:
+    {"BG1/NO2": "2025-11-09 13:00:00", ...}
+Timestamps are naive "YYYY-MM-DD HH:MM:SS" strings, GMT for LAQN and UTC for DEFRA (same thing).
+"""
+
+import json
+import os
+from threading import Lock
+
+import pandas as pd
+
+from config import Config
+
+
+class WatermarkStore:
+    """Thread safe {series key: last stored timestamp} map persisted as JSON.
+
+    Args:
+        path (str): JSON file, created on the first save.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+        self._marks = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self._marks = json.load(f)
+
+    @classmethod
+    def for_source(cls, source):
+        """Store for one API ('laqn', 'defra') under Config.watermark_dir."""
+        return cls(os.path.join(Config.watermark_dir, f"{source}.json"))
+
+    @staticmethod
+    def key(*parts):
+        """Series key, e.g. key('BG1', 'NO2') -> 'BG1/NO2'."""
+        return "/".join(str(p) for p in parts)
+
+    def get(self, key):
+        """Last stored timestamp for key as pd.Timestamp, None if the series was never fetched."""
+        with self._lock:
+            value = self._marks.get(key)
+        return pd.Timestamp(value) if value else None
+
+    def advance(self, key, timestamp, save=True):
+        """Move the watermark forward to timestamp, never backwards.
+
+        Returns:
+            bool: True if the watermark moved.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        with self._lock:
+            current = self._marks.get(key)
+            if current is not None and pd.Timestamp(current) >= timestamp:
+                return False
+            self._marks[key] = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            if save:
+                self._save_locked()
+        return True
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        #write to a temp file then replace, a killed run never leaves half a JSON file behind.
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._marks, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._marks)
+
+
+def rows_after_watermark(df, time_col, watermark, value_col=None):
+    """Keep rows newer than the watermark and return them with the new watermark.
+
+    When value_col is given, trailing rows without a value are dropped and don't move the watermark:
+    the APIs list the rest of the current day with empty values, those hours have to be asked for again.
+
+    Args:
+        df (pd.DataFrame): rows returned by the API.
+        time_col (str): timestamp column ('@MeasurementDateGMT' for LAQN, 'timestamp' for DEFRA).
+        watermark (pd.Timestamp): current watermark, None keeps every row.
+        value_col (str, optional): measurement column.
+
+    Returns:
+        tuple: (new rows DataFrame, new watermark or None when there is nothing new).
+    """
+    if df.empty:
+        return df, None
+
+    times = pd.to_datetime(df[time_col], errors='coerce')
+    keep = times.notna()
+    if watermark is not None:
+        keep &= times > watermark
+    df, times = df[keep], times[keep]
+
+    if value_col is not None and not df.empty:
+        values = df[value_col]
+        has_value = values.notna() & (values.astype(str).str.strip() != '')
+        if not has_value.any():
+            return df.iloc[0:0], None
+        last_stored = times[has_value].max()
+        keep = times <= last_stored
+        df, times = df[keep], times[keep]
+
+    if df.empty:
+        return df, None
+    return df.reset_index(drop=True), times.max()
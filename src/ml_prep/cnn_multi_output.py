@@ -0,0 +1,108 @@
+"""Multi-output CNN: one shared convolutional trunk for every site/pollutant target.
+
+cnn_training_laqn_all builds, fits and evaluates a separate build_cnn_model per target (about 145 of them),
+repeating the same convolutions over the same inputs each time. build_multi_output_cnn keeps the tuned layers
+of build_cnn_model as a shared trunk and ends in one output per target:
+    Input (timesteps, features) -> Conv1D(128) -> Dropout -> Conv1D(64) -> Dropout -> Flatten -> Dense(50)
+        -> Dense(n_targets)                                 (heads='shared', default)
+        -> per target Dense(head_units) -> Dense(1), concat  (heads='separate', a little capacity per target)
+One fit trains every target, train_multi_output_cnn still returns the per-target test R2/RMSE/MAE table of
+cnn_all_results.csv (epochs is the same for all targets, they stop together).
+"""
+
+import time
+
+import numpy as np
+from tensorflow.keras import layers, models
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.optimizers import Adam
+
+from src.ml_prep.evaluation import target_results
+
+
+def build_multi_output_cnn(timesteps, features, n_targets, filters_1=128, filters_2=64, kernel_size=2,
+                           dropout_rate=0.1, dense_units=50, learning_rate=0.001, heads='shared', head_units=16):
+    """Build the shared-trunk CNN, same hyperparameters as build_cnn_model.
+
+    Args:
+        timesteps (int): number of historical hours (n_past).
+        features (int): number of input features.
+        n_targets (int): number of outputs, one per target column.
+        filters_1, filters_2, kernel_size, dropout_rate, dense_units, learning_rate: as build_cnn_model.
+        heads (str): 'shared' one Dense(n_targets) output layer, 'separate' a small dense head per target.
+        head_units (int): width of each separate head.
+    Returns:
+        compiled keras model, output shape (batch, n_targets).
+    """
+    inputs = layers.Input(shape=(timesteps, features))
+    x = layers.Conv1D(filters=filters_1, kernel_size=kernel_size, activation='relu', padding='causal')(inputs)
+    x = layers.Dropout(dropout_rate)(x)
+    x = layers.Conv1D(filters=filters_2, kernel_size=kernel_size, activation='relu', padding='causal')(x)
+    x = layers.Dropout(dropout_rate)(x)
+    x = layers.Flatten()(x)
+    x = layers.Dense(dense_units, activation='relu')(x)
+    x = layers.Dropout(dropout_rate)(x)
+
+    if heads == 'shared':
+        outputs = layers.Dense(n_targets, name='targets')(x)
+    elif heads == 'separate':
+        outputs = [layers.Dense(1, name=f'target_{i}')(layers.Dense(head_units, activation='relu')(x))
+                   for i in range(n_targets)]
+        outputs = layers.Concatenate(name='targets')(outputs) if n_targets > 1 else outputs[0]
+    else:
+        raise ValueError(f"heads must be 'shared' or 'separate', got {heads!r}")
+
+    model = models.Model(inputs, outputs)
+    # mse over all outputs averages the per-target losses, every target weighs the same like separate models.
+    model.compile(optimizer=Adam(learning_rate=learning_rate, clipnorm=1.0), loss='mse', metrics=['mae'])
+    return model
+
+
+def get_callbacks():
+    """Same early stopping / learning rate schedule as the per-target notebooks."""
+    return [
+        EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True, verbose=0),
+        ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, min_lr=0.00001, verbose=0),
+    ]
+
+
+def train_multi_output_cnn(train, val, test, y_test, target_names, max_epochs=50, batch_size=32, verbose=0,
+                           **model_kwargs):
+    """Fit one multi-output CNN for all targets and evaluate it per target.
+
+    Args:
+        train, val, test: tf.data.Datasets from input_pipeline (built with target_indices), or (X, y) array
+            tuples with y already reduced to the target columns, e.g. (X_train, y_train[:, target_indices]).
+        y_test (np.ndarray): (samples, targets) actual test values, in the order test yields them.
+        target_names (list): target column names, in y order.
+        max_epochs, batch_size (int): as MAX_EPOCHS/BATCH_SIZE of the notebooks (batch_size only for arrays).
+        verbose (int): keras verbosity.
+        **model_kwargs: passed to build_multi_output_cnn (heads, filters_1, ...).
+    Returns:
+        tuple: (model, history, results DataFrame with the cnn_all_results.csv columns).
+    """
+    X_sample = _first_inputs(train)
+    model = build_multi_output_cnn(X_sample.shape[1], X_sample.shape[2], len(target_names), **model_kwargs)
+
+    start_time = time.time()
+    if isinstance(train, tuple):
+        history = model.fit(train[0], train[1], validation_data=val, epochs=max_epochs, batch_size=batch_size,
+                            callbacks=get_callbacks(), verbose=verbose)
+        y_pred = model.predict(test[0], batch_size=batch_size, verbose=0)
+    else:
+        history = model.fit(train, validation_data=val, epochs=max_epochs, callbacks=get_callbacks(),
+                            verbose=verbose)
+        y_pred = model.predict(test, verbose=0)
+    elapsed = time.time() - start_time
+
+    results = target_results(y_test, y_pred, target_names, epochs=len(history.history['loss']))
+    print(f"Trained {len(target_names)} targets in one model: {elapsed / 60:.1f} min, "
+          f"mean test R2 {results['test_r2'].mean():.3f}")
+    return model, history, results
+
+
+def _first_inputs(data):
+    if isinstance(data, tuple):
+        return np.asarray(data[0][:1])
+    X, _ = next(iter(data.take(1)))
+    return X.numpy()
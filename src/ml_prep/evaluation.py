@@ -0,0 +1,46 @@
+"""Per-target metrics in the layout of the training notebooks' results CSVs (cnn_all_results.csv etc.)."""
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+
+def target_pollutant(target_name):
+    """'BG1_NO2' -> 'NO2', the notebooks' rsplit('_', 1) convention."""
+    parts = target_name.rsplit('_', 1)
+    return parts[1] if len(parts) > 1 else 'unknown'
+
+
+def regression_metrics(y_true, y_pred, prefix='test'):
+    """{<prefix>_r2, <prefix>_rmse, <prefix>_mae} of one target."""
+    return {
+        f'{prefix}_r2': r2_score(y_true, y_pred),
+        f'{prefix}_rmse': np.sqrt(mean_squared_error(y_true, y_pred)),
+        f'{prefix}_mae': mean_absolute_error(y_true, y_pred),
+    }
+
+
+def target_results(y_true, y_pred, target_names, prefix='test', **extra):
+    """One row per target with R2, RMSE and MAE, same columns as the per-target loops wrote.
+
+    Args:
+        y_true, y_pred (np.ndarray): (samples, targets) actual and predicted values, column i is target_names[i].
+        target_names (list): 'site_pollutant' names.
+        prefix (str): metric column prefix, 'test' gives test_r2/test_rmse/test_mae.
+        **extra: more columns, a scalar for every row or a list with one value per target (e.g. epochs).
+    Returns:
+        pd.DataFrame: target, pollutant, <prefix>_r2, <prefix>_rmse, <prefix>_mae, extra columns.
+    """
+    y_true = np.asarray(y_true).reshape(len(y_true), -1)
+    y_pred = np.asarray(y_pred).reshape(len(y_pred), -1)
+    if y_true.shape != y_pred.shape or y_true.shape[1] != len(target_names):
+        raise ValueError(f"y_true {y_true.shape}, y_pred {y_pred.shape} and {len(target_names)} targets do not match")
+
+    rows = []
+    for i, target_name in enumerate(target_names):
+        rows.append({'target': target_name, 'pollutant': target_pollutant(target_name),
+                     **regression_metrics(y_true[:, i], y_pred[:, i], prefix)})
+    results = pd.DataFrame(rows)
+    for column, value in extra.items():
+        results[column] = value
+    return results
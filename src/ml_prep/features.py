@@ -0,0 +1,280 @@
+"""Model input features of the ml_prep notebooks, for serving new observations.
+
+ml_prep builds the training matrix as
+    pollutant columns (site_species)  MinMaxScaler fitted on the train split
+    hour, day_of_week, month, is_weekend  temporal columns, not scaled (LAQN) or scaled with the rest (DEFRA,
+                                          whose scaler was fitted on the whole matrix)
+in the order of feature_names, then windows of N_PAST hours (create_sequences / flatten_rf).
+FeatureSpec repeats exactly those steps for a few hours of raw observations, so the saved models can be
+served without re-running the notebooks. OnlineFeatureWindow keeps that window up to date one hourly reading at
+a time.
+"""
+
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.ml_prep.imputation import WINDOW_SIZE, impute_gaps
+
+TEMPORAL_COLS = ['hour', 'day_of_week', 'month', 'is_weekend']
+
+
+class FeatureSpec:
+    """Scaler + feature order + window length of one trained model set.
+
+    Args:
+        feature_names (list): columns of the training matrix, in order.
+        scaler (MinMaxScaler): fitted on the pollutant (non temporal) columns, or on every column of
+            feature_names (temporal ones included) when it has as many features.
+        n_past (int): hours per model input window.
+    """
+
+    def __init__(self, feature_names, scaler, n_past=12):
+        self.feature_names = list(feature_names)
+        self.scaler = scaler
+        self.n_past = n_past
+        scaled = getattr(scaler, 'feature_names_in_', None)
+        if scaled is not None:
+            self.scaled_cols = list(scaled)
+        elif scaler.n_features_in_ == len(self.feature_names):
+            self.scaled_cols = list(self.feature_names)
+        else:
+            self.scaled_cols = [c for c in self.feature_names if c not in TEMPORAL_COLS]
+        #MinMaxScaler is x * scale_ + min_, per column, identity for the columns it was not fitted on.
+        scale = dict(zip(self.scaled_cols, np.asarray(scaler.scale_, dtype=np.float64)))
+        minimum = dict(zip(self.scaled_cols, np.asarray(scaler.min_, dtype=np.float64)))
+
+        #the columns fed from observations, kept as arrays for the vectorized paths.
+        self.observed_cols = [c for c in self.feature_names if c not in TEMPORAL_COLS]
+        self.observed_positions = np.array([self.feature_names.index(c) for c in self.observed_cols], dtype=int)
+        self.scale_ = np.array([scale.get(c, 1.0) for c in self.observed_cols])
+        self.min_ = np.array([minimum.get(c, 0.0) for c in self.observed_cols])
+        self._observed_index = {c: i for i, c in enumerate(self.observed_cols)}
+        self._temporal = [(col, self.feature_names.index(col), scale.get(col, 1.0), minimum.get(col, 0.0))
+                          for col in TEMPORAL_COLS if col in self.feature_names]
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    @classmethod
+    def from_dir(cls, ml_prep_dir, n_past=None):
+        """Load scaler.joblib, feature_names.joblib and n_past from config.joblib (LAQN ml_prep) or
+        metadata.joblib (DEFRA ml_prep) written by ml_prep."""
+        ml_prep_dir = Path(ml_prep_dir)
+        if n_past is None:
+            n_past = 12
+            for name in ('config.joblib', 'metadata.joblib'):
+                if (ml_prep_dir / name).exists():
+                    n_past = joblib.load(ml_prep_dir / name).get('n_past', n_past)
+                    break
+        return cls(joblib.load(ml_prep_dir / 'feature_names.joblib'), joblib.load(ml_prep_dir / 'scaler.joblib'),
+                   n_past)
+
+    def transform(self, frame):
+        """Raw hourly observations -> scaled feature matrix.
+
+        Args:
+            frame (pd.DataFrame): DatetimeIndex rows, site_species columns in raw units (extra columns ignored,
+                missing ones NaN). Temporal columns are computed from the index.
+        Returns:
+            np.ndarray: (rows, n_features) float64 in feature_names order.
+        """
+        frame = frame.reindex(columns=self.observed_cols)
+        out = np.empty((len(frame), self.n_features), dtype=np.float64)
+        out[:, self.observed_positions] = frame.to_numpy(dtype=np.float64) * self.scale_ + self.min_
+        self._set_temporal(out, temporal_features(frame.index))
+        return out
+
+    def _set_temporal(self, out, temporal):
+        """Write the temporal columns (scaled when the scaler covers them) into the rows of out."""
+        for col, position, scale, minimum in self._temporal:
+            out[:, position] = temporal[col] * scale + minimum
+
+    def window(self, frame):
+        """The model input for the hour after the last row of frame, see window_from_arrays."""
+        return self.window_from_arrays(frame.index, {col: frame[col].to_numpy() for col in frame.columns})
+
+    def window_from_arrays(self, timestamps, observations):
+        """The model input for the hour after the latest timestamp, without building a DataFrame.
+
+        Takes the last n_past hours on a regular hourly axis, gaps are forward/back filled within the window
+        and anything still missing becomes 0 (the scaled train minimum).
+
+        Args:
+            timestamps (list/array): hourly timestamps of the observations.
+            observations (dict): {site_species: values aligned with timestamps}, raw units.
+        Returns:
+            np.ndarray: (n_past, n_features) scaled window.
+        """
+        hours = np.asarray(pd.DatetimeIndex(timestamps).values, dtype='datetime64[h]')
+        end = hours.max()
+        slots = (hours - (end - (self.n_past - 1))).astype(np.int64)
+        keep = slots >= 0
+
+        values = np.full((self.n_past, len(self.observed_cols)), np.nan)
+        for col, series in observations.items():
+            j = self._observed_index.get(col)
+            if j is not None:
+                values[slots[keep], j] = np.asarray(series, dtype=np.float64)[keep]
+        values = _fill_down(_fill_down(values)[::-1])[::-1]
+
+        window = np.empty((self.n_past, self.n_features), dtype=np.float64)
+        window[:, self.observed_positions] = values * self.scale_ + self.min_
+        self._set_temporal(window, _temporal_from_hours(end - np.arange(self.n_past - 1, -1, -1)))
+        return np.nan_to_num(window, nan=0.0)
+
+    def unscale(self, target, values):
+        """Scaled predictions of one target back to raw units."""
+        i = self._observed_index[target]
+        return (np.asarray(values, dtype=np.float64) - self.min_[i]) / self.scale_[i]
+
+
+class OnlineFeatureWindow:
+    """Streaming model input, fed one hour of readings at a time.
+
+    Raw readings and scaled feature rows live in fixed size ring buffers stored twice (row i and i + capacity),
+    so the newest rows are always one contiguous slice: window is a read-only view, never a copy. A new hour
+    costs one scaled row, O(features). Columns with a gap inside the window are re-imputed from the raw
+    history with impute_gaps, so the window equals ml_prep's imputation of the last `history` hours (the
+    rolling median needs WINDOW_SIZE // 2 hours before the window).
+
+    Args:
+        spec (FeatureSpec): scaler/feature order/n_past of the models.
+        history (int, optional): raw hours kept for the gap fill, default n_past + WINDOW_SIZE // 2.
+        fill_values (dict/pd.Series, optional): raw last resort per column (e.g. train medians), for columns
+            without any reading in the history. Anything still missing becomes 0, the scaled train minimum.
+    """
+
+    def __init__(self, spec, history=None, fill_values=None):
+        self.spec = spec
+        self.n_past = spec.n_past
+        self.history = max(history or spec.n_past + WINDOW_SIZE // 2, spec.n_past)
+        self.fill_values = None if fill_values is None else pd.Series(fill_values, dtype=np.float64)
+        self._raw = np.full((2 * self.history, len(spec.observed_cols)), np.nan)
+        self._scaled = np.zeros((2 * self.n_past, spec.n_features))
+        self._raw_pos = 0
+        self._scaled_pos = 0
+        self.count = 0
+        self.last_hour = None
+
+    @property
+    def ready(self):
+        """True once n_past hours have been added."""
+        return self.count >= self.n_past
+
+    @property
+    def window(self):
+        """The current (n_past, n_features) scaled window, oldest hour first."""
+        view = self._scaled[self._scaled_pos:self._scaled_pos + self.n_past]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def raw_history(self):
+        """The (history, n_observed) raw readings, oldest hour first, NaN for gaps."""
+        view = self._raw[self._raw_pos:self._raw_pos + self.history]
+        view.flags.writeable = False
+        return view
+
+    def update(self, timestamp, observations):
+        """Add the readings of one hour, skipped hours become gaps.
+
+        Args:
+            timestamp: the hour of the readings, later than the previous one.
+            observations (dict/pd.Series/np.ndarray): {site_species: raw value}, or an array in spec.observed_cols
+                order. Missing columns and NaN are gaps.
+        Returns:
+            np.ndarray: the window for predicting the next hour.
+        """
+        self._add(timestamp, observations)
+        self._fill_gaps()
+        return self.window
+
+    def extend(self, frame):
+        """Add many hours at once (e.g. the last weeks from the cube at start up), gaps are filled once.
+
+        Args:
+            frame (pd.DataFrame): DatetimeIndex rows, site_species columns in raw units.
+        Returns:
+            np.ndarray: the current window.
+        """
+        frame = frame.reindex(columns=self.spec.observed_cols).sort_index().iloc[-self.history:]
+        for timestamp, values in zip(frame.index, frame.to_numpy(dtype=np.float64)):
+            self._add(timestamp, values)
+        self._fill_gaps()
+        return self.window
+
+    def _add(self, timestamp, observations):
+        hour = pd.Timestamp(timestamp).to_datetime64().astype('datetime64[h]')
+        if self.last_hour is not None:
+            step = int((hour - self.last_hour).astype(np.int64))
+            if step <= 0:
+                raise ValueError(f"{timestamp} is not after the last hour {self.last_hour}")
+            #only the last `history` skipped hours can still matter.
+            empty = np.full(self._raw.shape[1], np.nan)
+            last_hour = self.last_hour
+            for skipped in range(max(1, step - self.history), step):
+                self._push(last_hour + np.timedelta64(skipped, 'h'), empty)
+        self._push(hour, self._as_row(observations))
+
+    def _push(self, hour, raw):
+        self._raw[self._raw_pos] = raw
+        self._raw[self._raw_pos + self.history] = raw
+        self._raw_pos = (self._raw_pos + 1) % self.history
+
+        row = np.empty(self.spec.n_features)
+        row[self.spec.observed_positions] = raw * self.spec.scale_ + self.spec.min_
+        self.spec._set_temporal(row[None, :], _temporal_from_hours(np.array([hour])))
+        self._scaled[self._scaled_pos] = row
+        self._scaled[self._scaled_pos + self.n_past] = row
+        self._scaled_pos = (self._scaled_pos + 1) % self.n_past
+        self.count += 1
+        self.last_hour = hour
+
+    def _fill_gaps(self):
+        """Re-impute the columns that have a gap in the window, from the raw history."""
+        history = self._raw[self._raw_pos:self._raw_pos + self.history]
+        gaps = np.flatnonzero(np.isnan(history[-self.n_past:]).any(axis=0))
+        if not len(gaps):
+            return
+        columns = [self.spec.observed_cols[j] for j in gaps]
+        filled = impute_gaps(pd.DataFrame(history[:, gaps], columns=columns), fill_values=self.fill_values)
+        values = filled.to_numpy(dtype=np.float64)[-self.n_past:] * self.spec.scale_[gaps] + self.spec.min_[gaps]
+        rows = ((self._scaled_pos + np.arange(self.n_past)) % self.n_past)[:, None]
+        positions = self.spec.observed_positions[gaps]
+        self._scaled[rows, positions] = np.nan_to_num(values, nan=0.0)
+        self._scaled[rows + self.n_past, positions] = self._scaled[rows, positions]
+
+    def _as_row(self, observations):
+        if isinstance(observations, np.ndarray):
+            if observations.shape != (self._raw.shape[1],):
+                raise ValueError(f"Expected {self._raw.shape[1]} values, got {observations.shape}")
+            return observations.astype(np.float64)
+        return np.array([observations.get(col, np.nan) for col in self.spec.observed_cols], dtype=np.float64)
+
+
+def temporal_features(index):
+    """hour, day_of_week, month, is_weekend of a DatetimeIndex, as ml_prep adds them."""
+    index = pd.DatetimeIndex(index)
+    day_of_week = index.dayofweek.to_numpy()
+    return {'hour': index.hour.to_numpy(), 'day_of_week': day_of_week, 'month': index.month.to_numpy(),
+            'is_weekend': np.isin(day_of_week, [5, 6]).astype(int)}
+
+
+def _temporal_from_hours(hours):
+    """temporal_features for a datetime64[h] array, plain integer arithmetic."""
+    n = hours.astype(np.int64)
+    day_of_week = (n // 24 + 3) % 7  # 1970-01-01 was a Thursday, Monday is 0
+    return {'hour': n % 24, 'day_of_week': day_of_week,
+            'month': hours.astype('datetime64[M]').astype(np.int64) % 12 + 1,
+            'is_weekend': (day_of_week >= 5).astype(int)}
+
+
+def _fill_down(values):
+    """Forward fill NaNs along axis 0."""
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
@@ -0,0 +1,196 @@
+"""Missing value imputation of the ml_prep notebooks (steps 2-5), as one function.
+
+ml_prep_laqn_all / ml_prep_defra_all_* fill the wide site_species table in tiers:
+    2. linear interpolation, up to INTERP_LIMIT hours in both directions
+    3. ffill then bfill, up to FILL_LIMIT hours
+    4. centered rolling WINDOW_SIZE hour median, only where still missing
+    5. column median
+Step 1 (dropping columns with too little coverage) selects columns and is left to the notebooks.
+
+The notebooks run every step over the whole frame, the rolling median of all 145 columns over years of hours
+being the slowest part of prep although most cells are present. impute_gaps finds the gaps first and only
+works there: complete columns are skipped, interpolation and ffill/bfill only touch the cells within their
+limits of a valid value, and the rolling median is only taken at the cells still missing after step 3.
+Columns are processed in chunks on a thread pool (the sorts release the GIL). The result is the same as the
+pandas chain, cell for cell, and the mask tells which step filled each cell.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+INTERP_LIMIT = 6
+FILL_LIMIT = 4
+WINDOW_SIZE = 336
+
+#imputation mask codes, which step filled a cell.
+OBSERVED = 0
+INTERPOLATED = 1
+FILLED = 2
+ROLLING_MEDIAN = 3
+COLUMN_MEDIAN = 4
+FILL_VALUE = 5
+MISSING = -1
+STEP_NAMES = {OBSERVED: 'observed', INTERPOLATED: 'interpolated', FILLED: 'ffill/bfill',
+              ROLLING_MEDIAN: 'rolling median', COLUMN_MEDIAN: 'column median', FILL_VALUE: 'fill value',
+              MISSING: 'missing'}
+
+CHUNK_COLUMNS = 8
+SORT_MEDIAN_BELOW = 32
+
+
+def impute_gaps(df, interp_limit=INTERP_LIMIT, fill_limit=FILL_LIMIT, window_size=WINDOW_SIZE, fill_values=None,
+                return_mask=False, max_workers=None, chunk_columns=CHUNK_COLUMNS):
+    """Fill the gaps of a wide hourly table the way ml_prep does.
+
+    Same result as
+        df.interpolate(method='linear', limit=interp_limit, limit_direction='both')
+          .ffill(limit=fill_limit).bfill(limit=fill_limit)
+          .fillna(rolling(window=window_size, center=True, min_periods=1).median())
+          .fillna(median())
+    computed only around the gaps.
+
+    Args:
+        df (pd.DataFrame): regular hourly rows, one numeric column per site_species.
+        fill_values (pd.Series/dict, optional): last resort per column (e.g. the train medians), used where the
+            column median of df is NaN (a column without any value).
+        return_mask (bool): also return the imputation mask.
+        max_workers (int, optional): threads over the column chunks, 1 runs in the calling thread.
+        chunk_columns (int): columns per task.
+    Returns:
+        pd.DataFrame: filled float64 copy of df, plus the int8 mask DataFrame (OBSERVED, INTERPOLATED, FILLED,
+            ROLLING_MEDIAN, COLUMN_MEDIAN, FILL_VALUE or MISSING per cell) when return_mask.
+    """
+    #column major, so every column is one contiguous array.
+    values = np.array(df.to_numpy(dtype=np.float64), order='F')
+    codes = np.zeros(values.shape, dtype=np.int8, order='F')
+    gap_columns = np.flatnonzero(np.isnan(values).any(axis=0))
+    chunks = [gap_columns[i:i + chunk_columns] for i in range(0, len(gap_columns), chunk_columns)]
+
+    def impute_chunk(columns):
+        for j in columns:
+            _impute_column(values[:, j], codes[:, j], interp_limit, fill_limit, window_size)
+
+    max_workers = max_workers or min(len(chunks), os.cpu_count() or 1)
+    if max_workers <= 1 or len(chunks) <= 1:
+        for columns in chunks:
+            impute_chunk(columns)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(impute_chunk, chunks))
+
+    if fill_values is not None:
+        fill_values = pd.Series(fill_values, dtype=np.float64).reindex(df.columns).to_numpy()
+        for j in gap_columns:
+            still_missing = codes[:, j] == MISSING
+            if still_missing.any() and not np.isnan(fill_values[j]):
+                values[still_missing, j] = fill_values[j]
+                codes[still_missing, j] = FILL_VALUE
+
+    filled = pd.DataFrame(values, index=df.index, columns=df.columns)
+    if return_mask:
+        return filled, pd.DataFrame(codes, index=df.index, columns=df.columns)
+    return filled
+
+
+def impute_summary(mask):
+    """Cells filled per step, like the notebooks' 'Filled: ...' prints.
+
+    Args:
+        mask (pd.DataFrame): mask returned by impute_gaps.
+    Returns:
+        pd.Series: {step name: cells}.
+    """
+    counts = pd.Series(mask.to_numpy().ravel()).value_counts()
+    return pd.Series({name: int(counts.get(code, 0)) for code, name in STEP_NAMES.items()})
+
+
+def _impute_column(column, codes, interp_limit, fill_limit, window_size):
+    """Steps 2-5 on one column in place, codes gets the step of every filled cell."""
+    missing = np.isnan(column)
+    codes[missing] = MISSING
+    if missing.all():
+        return
+
+    #2. linear interpolation between the neighbouring values (positions, not timestamps, as pandas 'linear'),
+    #filled when within the limit of a valid value on either side, ends take the nearest value.
+    _, dist_prev, _, dist_next = _neighbours(missing)
+    fill = missing & ((dist_prev <= interp_limit) | (dist_next <= interp_limit))
+    valid = np.flatnonzero(~missing)
+    column[fill] = np.interp(np.flatnonzero(fill), valid, column[valid])
+    codes[fill] = INTERPOLATED
+
+    #3. ffill then bfill, the bfill neighbours are unchanged by the ffill (it only fills the start of gaps).
+    missing &= ~fill
+    if missing.any():
+        prev, dist_prev, nxt, dist_next = _neighbours(missing)
+        forward = missing & (dist_prev <= fill_limit)
+        column[forward] = column[prev[forward]]
+        missing &= ~forward
+        backward = missing & (dist_next <= fill_limit)
+        column[backward] = column[nxt[backward]]
+        missing &= ~backward
+        codes[forward | backward] = FILLED
+
+    #4. rolling median of the step 3 values, only at the cells still missing.
+    positions = np.flatnonzero(missing)
+    if len(positions):
+        medians = _rolling_median_at(column, positions, window_size)
+        found = ~np.isnan(medians)
+        column[positions[found]] = medians[found]
+        codes[positions[found]] = ROLLING_MEDIAN
+        positions = positions[~found]
+
+    #5. column median.
+    if len(positions):
+        median = np.nanmedian(column)
+        column[positions] = median
+        codes[positions] = COLUMN_MEDIAN
+
+
+def _neighbours(missing):
+    """Index of and distance to the previous/next valid cell of every cell, distance n+1 when there is none."""
+    n = len(missing)
+    positions = np.arange(n)
+    prev = np.maximum.accumulate(np.where(missing, -1, positions))
+    nxt = np.minimum.accumulate(np.where(missing, n, positions)[::-1])[::-1]
+    dist_prev = np.where(prev >= 0, positions - prev, n + 1)
+    dist_next = np.where(nxt < n, nxt - positions, n + 1)
+    return prev, dist_prev, nxt, dist_next
+
+
+def _rolling_median_at(column, positions, window_size):
+    """rolling(window_size, center=True, min_periods=1).median() of column at positions only.
+
+    Positions are grouped into segments whose windows overlap. Long segments run pandas' rolling median on
+    just the rows their windows cover, short ones sort their few windows directly.
+    """
+    left, right = window_size // 2, (window_size - 1) // 2
+    medians = np.empty(len(positions))
+    windows = None
+    breaks = np.flatnonzero(np.diff(positions) > window_size) + 1
+    for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(positions)]):
+        segment = positions[start:stop]
+        if len(segment) < SORT_MEDIAN_BELOW:
+            if windows is None:
+                padded = np.concatenate([np.full(left, np.nan), column, np.full(right, np.nan)])
+                windows = sliding_window_view(padded, window_size)
+            medians[start:stop] = _sorted_window_medians(windows[segment])
+            continue
+        first, last = max(segment[0] - left, 0), min(segment[-1] + right + 1, len(column))
+        rolling = pd.Series(column[first:last]).rolling(window=window_size, center=True, min_periods=1).median()
+        medians[start:stop] = rolling.to_numpy()[segment - first]
+    return medians
+
+
+def _sorted_window_medians(windows):
+    """Median of each window row by sorting it, for a handful of windows."""
+    block = np.sort(windows, axis=1)  # NaN sort last
+    counts = np.count_nonzero(~np.isnan(block), axis=1)
+    rows = np.arange(len(block))
+    #the mean of the two middle values for even counts, as pandas' rolling median.
+    middle = (block[rows, np.maximum(counts - 1, 0) // 2] + block[rows, counts // 2]) / 2
+    return np.where(counts > 0, middle, np.nan)
@@ -0,0 +1,321 @@
+"""Long-running local inference server for the trained LAQN/DEFRA next-hour forecasters.
+
+Loads the scaler, feature_names and the registry models once, then answers
+    POST /forecast  {"timestamps": [... last hours ...], "observations": {"BG1_NO2": [...], ...},
+                     "targets": ["BG1_NO2", ...]}          targets optional, default all loaded ones
+                 -> {"forecast_for": "YYYY-MM-DD HH:MM:SS", "forecasts": {"BG1_NO2": 41.3, ...}}
+    GET  /metrics   request count, p50/p99 latency, batch sizes
+    GET  /health
+Observations are raw hourly values (same units as the CSVs). Concurrent requests are micro-batched: the
+batcher thread waits up to max_wait_ms for up to max_batch windows and runs one vectorized predict per model
+file for all of them.
+
+Run from the project root:
+    python -m src.ml_prep.inference_server --registry data/ml/LAQN_all/registry --ml-prep-dir data/laqn/ml_prep_all
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.ml_prep.features import FeatureSpec
+from src.ml_prep.model_registry import CompactForest, ModelRegistry
+
+
+class LatencyTracker:
+    """Latencies of the most recent requests, thread safe."""
+
+    def __init__(self, window=10000):
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.count += 1
+
+    def record_batch(self, size):
+        with self._lock:
+            self._batch_sizes.append(size)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            batches = np.array(self._batch_sizes)
+            count, errors = self.count, self.errors
+        if not len(latencies):
+            return {'requests': count, 'errors': errors}
+        return {
+            'requests': count,
+            'errors': errors,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'mean_ms': float(latencies.mean()),
+            'max_ms': float(latencies.max()),
+            'mean_batch': float(batches.mean()) if len(batches) else None,
+        }
+
+
+class Forecaster:
+    """Registry models + FeatureSpec, everything loaded up front.
+
+    Args:
+        registry (ModelRegistry): trained models.
+        spec (FeatureSpec): scaler/feature order/n_past the models were trained with.
+        targets (list, optional): only serve these targets (e.g. the sites of one deployment).
+        compact (bool): repack sklearn forests as CompactForests at load time, same predictions without
+            sklearn's per-call overhead (~10x faster for small batches).
+    """
+
+    def __init__(self, registry, spec, targets=None, compact=True):
+        self.registry = registry
+        self.spec = spec
+        self.targets = list(targets) if targets is not None else registry.targets()
+        #targets grouped by model file, a multi-output forest is predicted once for all its targets.
+        self.files = {}
+        self.models = {}
+        for target in self.targets:
+            entry = registry.entry(target)
+            self.files.setdefault(entry['file'], []).append((target, entry.get('output_index')))
+            if entry['file'] not in self.models:
+                model = registry.load(target)
+                if compact and entry['kind'] == 'sklearn' and hasattr(model, 'estimators_'):
+                    model = CompactForest.from_sklearn(model)
+                self.models[entry['file']] = model
+
+    def predict_windows(self, windows, targets=None):
+        """Next-hour forecasts for a batch of windows.
+
+        Args:
+            windows (np.ndarray): (batch, n_past, n_features) scaled windows.
+            targets (set, optional): targets to predict, default all.
+        Returns:
+            dict: {target: (batch,) forecasts in raw units}.
+        """
+        flat = windows.reshape(len(windows), -1).astype(np.float32)
+        out = {}
+        for file, members in self.files.items():
+            members = [(t, i) for t, i in members if targets is None or t in targets]
+            if not members:
+                continue
+            entry = self.registry.entry(members[0][0])
+            model = self.models[file]
+            if entry['kind'] == 'keras':
+                prediction = np.asarray(model.predict(windows.astype(np.float32), verbose=0))
+            else:
+                prediction = np.asarray(model.predict(flat))
+            prediction = prediction.reshape(len(windows), -1)
+            for target, output_index in members:
+                out[target] = self.spec.unscale(target, prediction[:, output_index or 0])
+        return out
+
+
+class MicroBatcher:
+    """Collects concurrent forecast requests into one predict call.
+
+    Args:
+        forecaster (Forecaster): does the predicting.
+        max_batch (int): most windows per predict call.
+        max_wait_ms (float): how long the first request of a batch waits for others.
+        tracker (LatencyTracker, optional): batch sizes are recorded here.
+    """
+
+    def __init__(self, forecaster, max_batch=64, max_wait_ms=2.0, tracker=None):
+        self.forecaster = forecaster
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.tracker = tracker
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, window, targets=None):
+        """Queue one (n_past, n_features) window, the Future resolves to {target: forecast}."""
+        future = Future()
+        self._queue.put((window, None if targets is None else set(targets), future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._predict(batch)
+
+    def _predict(self, batch):
+        targets = None
+        if all(requested is not None for _, requested, _ in batch):
+            targets = set().union(*(requested for _, requested, _ in batch))
+        try:
+            forecasts = self.forecaster.predict_windows(np.stack([window for window, _, _ in batch]), targets)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        if self.tracker is not None:
+            self.tracker.record_batch(len(batch))
+        for i, (_, requested, future) in enumerate(batch):
+            names = requested if requested is not None else forecasts.keys()
+            future.set_result({t: float(forecasts[t][i]) for t in names if t in forecasts})
+
+
+class _InferenceHandler(BaseHTTPRequestHandler):
+    """JSON request handler, keeps connections alive for load test clients."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.inference
+        if self.path == '/metrics':
+            self._send(200, server.tracker.snapshot())
+        elif self.path == '/health':
+            self._send(200, {'status': 'ok', 'targets': len(server.forecaster.targets)})
+        else:
+            self._send(404, {'error': 'unknown path'})
+
+    def do_POST(self):
+        server = self.server.inference
+        if self.path != '/forecast':
+            self._send(404, {'error': 'unknown path'})
+            return
+        start = time.perf_counter()
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            response = server.forecast(body)
+        except (KeyError, ValueError, TypeError) as e:
+            server.tracker.record_error()
+            self._send(400, {'error': str(e)})
+            return
+        server.tracker.record(time.perf_counter() - start)
+        self._send(200, response)
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class InferenceServer:
+    """Threaded HTTP server around a Forecaster and a MicroBatcher, usable as a context manager.
+
+    Args:
+        forecaster (Forecaster): loaded models.
+        host (str), port (int): bind address, port 0 picks a free port.
+        max_batch (int), max_wait_ms (float): micro-batching, see MicroBatcher.
+    """
+
+    def __init__(self, forecaster, host='127.0.0.1', port=8080, max_batch=64, max_wait_ms=2.0):
+        self.forecaster = forecaster
+        self.tracker = LatencyTracker()
+        self.batcher = MicroBatcher(forecaster, max_batch, max_wait_ms, self.tracker)
+        self._httpd = ThreadingHTTPServer((host, port), _InferenceHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.inference = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def forecast(self, body):
+        """Handle one /forecast body: build its window and wait for its micro-batch."""
+        timestamps, observations = body['timestamps'], body['observations']
+        if not timestamps or not observations:
+            raise ValueError("no observations")
+        if any(len(values) != len(timestamps) for values in observations.values()):
+            raise ValueError("every observations list needs one value per timestamp")
+        targets = body.get('targets')
+        if targets is not None:
+            unknown = set(targets) - set(self.forecaster.targets)
+            if unknown:
+                raise KeyError(f"not served: {sorted(unknown)}")
+        window = self.forecaster.spec.window_from_arrays(timestamps, observations)
+        forecasts = self.batcher.submit(window, targets).result()
+        forecast_for = pd.Timestamp(max(timestamps)) + pd.Timedelta(hours=1)
+        return {'forecast_for': forecast_for.strftime('%Y-%m-%d %H:%M:%S'), 'forecasts': forecasts}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='inference-http', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+        self._httpd.server_close()
+        self.batcher.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve next-hour forecasts from a model registry.")
+    parser.add_argument('--registry', required=True, help="registry folder, see model_registry.py")
+    parser.add_argument('--ml-prep-dir', required=True, help="folder with scaler.joblib and feature_names.joblib")
+    parser.add_argument('--sites', nargs='*', help="only serve these sites")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    start = time.perf_counter()
+    forecaster = Forecaster(registry, FeatureSpec.from_dir(args.ml_prep_dir), registry.targets(sites=args.sites))
+    print(f"Loaded {len(forecaster.targets)} targets in {time.perf_counter() - start:.1f}s")
+    server = InferenceServer(forecaster, args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
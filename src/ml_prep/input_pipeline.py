@@ -0,0 +1,111 @@
+"""Batched tf.data input pipeline for the CNN training notebooks.
+
+cnn_training_laqn_all and cnn_training_defra_* np.load the 3D X_train/X_val/X_test (n_past copies of every
+row) and hand them to model.fit. Here the ml_prep notebooks save the scaled 2D split matrices instead
+(save_scaled_splits) and training streams the windows out of a memory map:
+    <split>_scaled.npy (timestamps, features) -> batch_sequences -> tf.data.Dataset -> prefetch -> model.fit
+so at most a few batches of (batch, n_past, features) windows exist at once and n_past can grow freely.
+
+Usage in a training notebook:
+    datasets = split_datasets(data_dir, n_past=N_PAST, batch_size=BATCH_SIZE, target_indices=target_indices)
+    model.fit(datasets['train'], validation_data=datasets['val'], epochs=MAX_EPOCHS, callbacks=get_callbacks())
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from src.ml_prep.sequences import batch_sequences, n_sequences
+
+SPLITS = ('train', 'val', 'test')
+SCALED_FILE = '{split}_scaled.npy'
+PIPELINE_CONFIG = 'pipeline_config.json'
+
+
+def save_scaled_splits(output_path, feature_names, n_past=12, n_future=1, dtype=np.float32, **splits):
+    """Save the scaled split matrices the pipeline streams from, next to the ml_prep outputs.
+
+    Args:
+        output_path (str/Path): e.g. data/laqn/ml_prep_all.
+        feature_names (list): column order of the matrices.
+        n_past, n_future (int): the window config the sequences were created with (default for the pipeline).
+        dtype: stored dtype, float32 is what the CNN trains on.
+        **splits: train=df_train_scaled, val=df_val_scaled, test=df_test_scaled (DataFrames or arrays).
+    Returns:
+        dict: {split: saved file}.
+    """
+    output_path = Path(output_path)
+    output_path.mkdir(parents=True, exist_ok=True)
+    saved = {}
+    for split, data in splits.items():
+        saved[split] = output_path / SCALED_FILE.format(split=split)
+        np.save(saved[split], np.asarray(data, dtype=dtype))
+    with open(output_path / PIPELINE_CONFIG, 'w', encoding='utf-8') as f:
+        json.dump({'n_past': n_past, 'n_future': n_future, 'feature_names': list(feature_names),
+                   'splits': {split: int(len(data)) for split, data in splits.items()}}, f, indent=2)
+    return saved
+
+
+def load_scaled_split(data_dir, split):
+    """One scaled split as a read-only memory map."""
+    return np.load(Path(data_dir) / SCALED_FILE.format(split=split), mmap_mode='r')
+
+
+def window_dataset(data, n_past=12, n_future=1, batch_size=32, shuffle=False, seed=None, target_indices=None,
+                   prefetch=tf.data.AUTOTUNE):
+    """tf.data.Dataset of (X, y) batches built from a 2D scaled matrix, one batch of windows at a time.
+
+    Args:
+        data (np.ndarray): scaled (timestamps, features) matrix, ideally a memmap from load_scaled_split.
+        n_past, n_future (int): as create_sequences.
+        batch_size (int): samples per batch.
+        shuffle (bool): new sample order every epoch (seed + epoch number), for training only.
+        seed (int, optional): seed of the first epoch's order.
+        target_indices (int/list, optional): y columns to keep, an int gives a 1D y like y_train[:, target_idx].
+        prefetch (int): batches prepared ahead while the model trains, None to disable.
+    Returns:
+        tf.data.Dataset: yields (X float32 (b, n_past, features), y float32) with a known number of batches.
+    """
+    n_features = data.shape[1]
+    if target_indices is None:
+        y_shape = (None, n_features)
+    elif np.ndim(target_indices) == 0:
+        y_shape = (None,)
+    else:
+        y_shape = (None, len(target_indices))
+    epochs = iter(range(1 << 31))
+
+    def generator():
+        epoch_seed = None if seed is None else seed + next(epochs)
+        for X, y in batch_sequences(data, n_past, n_future, batch_size=batch_size, shuffle=shuffle,
+                                    seed=epoch_seed):
+            if target_indices is not None:
+                y = y[:, target_indices]
+            yield X.astype(np.float32, copy=False), y.astype(np.float32, copy=False)
+
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=(
+        tf.TensorSpec(shape=(None, n_past, n_features), dtype=tf.float32),
+        tf.TensorSpec(shape=y_shape, dtype=tf.float32),
+    ))
+    n_batches = -(-n_sequences(len(data), n_past, n_future) // batch_size)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(n_batches))
+    return dataset.prefetch(prefetch) if prefetch is not None else dataset
+
+
+def split_datasets(data_dir, n_past=None, n_future=None, batch_size=32, target_indices=None, seed=42):
+    """train/val/test datasets streamed from the saved scaled splits, only train is shuffled.
+
+    n_past/n_future default to the values saved by save_scaled_splits.
+    """
+    data_dir = Path(data_dir)
+    with open(data_dir / PIPELINE_CONFIG, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    n_past = n_past or config['n_past']
+    n_future = n_future or config['n_future']
+    return {
+        split: window_dataset(load_scaled_split(data_dir, split), n_past, n_future, batch_size=batch_size,
+                              shuffle=split == 'train', seed=seed, target_indices=target_indices)
+        for split in SPLITS if (data_dir / SCALED_FILE.format(split=split)).exists()
+    }
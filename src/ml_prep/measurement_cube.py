@@ -0,0 +1,263 @@
+"""Persistent dense time x (site, species) measurement cube, the wide_format matrix of the ml_prep notebooks.
+
+wide_format concatenates every CSV and runs pivot_table(aggfunc='mean') on each notebook run. MeasurementCube
+builds that matrix once and keeps it on disk:
+    values.npy   float32 (n_hours, n_columns), NaN where nothing was measured
+    mask.npy     bool (n_hours, n_columns), True where at least one non-NaN value was observed
+    index.json   hourly UTC axis (start, freq, length) and the column labels with their site/species
+Both arrays are opened memory mapped, so reading a time window or a few columns only touches those pages.
+
+Differences to wide_format:
+    - the time axis is dense, hours with no values at all are NaN rows instead of missing rows
+      (window(..., dropna=True) drops them again),
+    - timestamps are floored to the hour, timestamps are UTC (tz-naive like the GMT columns of the CSVs),
+    - values are float32.
+
+Build from the project root:
+    python -m src.ml_prep.measurement_cube laqn --store data/laqn/store/optimised --dest data/laqn/cube/optimised
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+INDEX_FILE = 'index.json'
+VALUES_FILE = 'values.npy'
+MASK_FILE = 'mask.npy'
+
+
+class MeasurementCube:
+    """Memory mapped hourly cube, open an existing one with MeasurementCube(cube_dir).
+
+    Args:
+        cube_dir (str/Path): folder holding values.npy, mask.npy and index.json.
+        mode (str): 'r' read only (default) or 'r+' to update values in place.
+    """
+
+    def __init__(self, cube_dir, mode='r'):
+        self.cube_dir = Path(cube_dir)
+        index_file = self.cube_dir / INDEX_FILE
+        if not index_file.exists():
+            raise FileNotFoundError(f"No measurement cube at {self.cube_dir}, build it first.")
+        with open(index_file, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+
+        self.freq = pd.Timedelta(self.index['freq'])
+        self.start = pd.Timestamp(self.index['start'])
+        self.columns = pd.Index(self.index['columns'], name='site_species')
+        self.sites = np.array(self.index['sites'], dtype=object)
+        self.species = np.array(self.index['species'], dtype=object)
+        self.values = np.load(self.cube_dir / VALUES_FILE, mmap_mode=mode)
+        self.mask = np.load(self.cube_dir / MASK_FILE, mmap_mode=mode)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def time_index(self):
+        return pd.date_range(self.start, periods=self.shape[0], freq=self.freq, name=self.index['datetime_col'])
+
+    @property
+    def end(self):
+        return self.start + (self.shape[0] - 1) * self.freq
+
+    @classmethod
+    def build(cls, df, cube_dir, datetime_col, site_col, species_col, value_col, freq='h', overwrite=True):
+        """Build a cube from a long DataFrame, same arguments as the notebooks' wide_format.
+
+        Args:
+            df (pd.DataFrame): long rows, one per timestamp/site/species.
+            cube_dir (str/Path): output folder.
+            datetime_col, site_col, species_col, value_col (str): column names.
+            freq (str): axis step, hourly by default.
+            overwrite (bool): replace an existing cube.
+        Returns:
+            MeasurementCube: the new cube opened read only.
+        """
+        times = _utc_naive(df[datetime_col]).dt.floor(freq)
+        labels = df[site_col].astype(str) + '_' + df[species_col].astype(str)
+        columns = sorted(pd.unique(labels))
+        pairs = pd.DataFrame({'label': labels, 'site': df[site_col].astype(str), 'species': df[species_col].astype(str)})
+        pairs = pairs.drop_duplicates('label').set_index('label').loc[columns]
+
+        writer = _CubeWriter(cube_dir, times.min(), times.max(), freq, columns, list(pairs['site']),
+                             list(pairs['species']), datetime_col, overwrite)
+        writer.add(times, labels, df[value_col])
+        return writer.close()
+
+    @classmethod
+    def from_store(cls, store, cube_dir, value_col=None, freq='h', overwrite=True):
+        """Build a cube straight from a LAQN/DEFRA columnar store, one month partition at a time.
+
+        Only one month of long rows is held in memory: a first pass over the months collects the column
+        labels and the time range, a second one writes the values into the memory mapped arrays.
+
+        Args:
+            store (PartitionedStore): e.g. LaqnColumnarStore('data/laqn/store/optimised').
+            cube_dir (str/Path): output folder.
+            value_col (str, optional): defaults to '@Value' for LAQN and 'value' for DEFRA.
+        """
+        value_col = value_col or ('@Value' if store.time_col == '@MeasurementDateGMT' else 'value')
+        key_cols = [store.time_col, store.site_col, store.species_col]
+        months = store.months()
+
+        pairs, first_time, last_time = {}, None, None
+        for year, month in months:
+            keys = _read_month(store, year, month, key_cols)
+            for site, species in keys[[store.site_col, store.species_col]].drop_duplicates().itertuples(index=False):
+                pairs.setdefault(f"{site}_{species}", (str(site), str(species)))
+            times = _utc_naive(keys[store.time_col]).dt.floor(freq)
+            if times.notna().any():
+                first_time = times.min() if first_time is None else min(first_time, times.min())
+                last_time = times.max() if last_time is None else max(last_time, times.max())
+        columns = sorted(pairs)
+
+        writer = _CubeWriter(cube_dir, first_time, last_time, freq, columns, [pairs[c][0] for c in columns],
+                             [pairs[c][1] for c in columns], store.time_col, overwrite)
+        for year, month in months:
+            part = _read_month(store, year, month, key_cols + [value_col])
+            writer.add(_utc_naive(part[store.time_col]).dt.floor(freq),
+                       part[store.site_col].astype(str) + '_' + part[store.species_col].astype(str),
+                       part[value_col])
+        return writer.close()
+
+    def _rows(self, start=None, end=None):
+        """Row slice for an inclusive time range, plain arithmetic on the regular axis."""
+        first = 0 if start is None else int(np.ceil((pd.Timestamp(start) - self.start) / self.freq))
+        last = self.shape[0] - 1 if end is None else int(np.floor((pd.Timestamp(end) - self.start) / self.freq))
+        return slice(max(first, 0), max(min(last, self.shape[0] - 1) + 1, 0))
+
+    def column_positions(self, columns=None, sites=None, species=None):
+        """Positions of the selected columns, by label and/or by site/species."""
+        keep = np.ones(len(self.columns), dtype=bool)
+        if columns is not None:
+            positions = self.columns.get_indexer(list(columns))
+            if (positions == -1).any():
+                missing = [c for c, p in zip(columns, positions) if p == -1]
+                raise KeyError(f"Columns not in the cube: {missing}")
+            return positions
+        if sites is not None:
+            keep &= np.isin(self.sites, list(sites))
+        if species is not None:
+            keep &= np.isin(self.species, list(species))
+        return np.flatnonzero(keep)
+
+    def array(self, start=None, end=None, columns=None, sites=None, species=None, mask=False):
+        """Values (or the observed mask) of a window as a numpy array.
+
+        A time-only selection is a view on the memory map, selecting columns copies just those columns.
+        """
+        source = self.mask if mask else self.values
+        rows = self._rows(start, end)
+        if columns is None and sites is None and species is None:
+            return source[rows]
+        return source[rows][:, self.column_positions(columns, sites, species)]
+
+    def window(self, start=None, end=None, columns=None, sites=None, species=None, dropna=False):
+        """A time window / column subset as the wide DataFrame wide_format returns.
+
+        Args:
+            start, end (str/Timestamp, optional): inclusive time range.
+            columns (list, optional): 'site_species' labels.
+            sites, species (list, optional): select columns by site and/or species instead.
+            dropna (bool): drop hours without any value, like pivot_table does.
+        Returns:
+            pd.DataFrame: DatetimeIndex rows, site_species columns, float32 values.
+        """
+        rows = self._rows(start, end)
+        positions = None if columns is None and sites is None and species is None \
+            else self.column_positions(columns, sites, species)
+        values = self.values[rows] if positions is None else self.values[rows][:, positions]
+        labels = self.columns if positions is None else self.columns[positions]
+        df = pd.DataFrame(np.asarray(values), index=self.time_index[rows], columns=labels)
+        if dropna:
+            df = df.dropna(how='all')
+        return df
+
+
+def _read_month(store, year, month, columns):
+    """One month partition of a store."""
+    first = pd.Timestamp(year=int(year), month=int(month), day=1)
+    last = first + pd.offsets.MonthEnd(1) + pd.Timedelta(hours=23, minutes=59, seconds=59)
+    return store.read(start=first, end=last, columns=columns, categorical=True)
+
+
+class _CubeWriter:
+    """Creates the memory mapped arrays and fills them batch by batch, index.json is written last."""
+
+    def __init__(self, cube_dir, start, end, freq, columns, sites, species, datetime_col, overwrite=True):
+        self.cube_dir = Path(cube_dir)
+        if self.cube_dir.exists():
+            if not overwrite:
+                raise FileExistsError(f"{self.cube_dir} already exists.")
+            shutil.rmtree(self.cube_dir)
+        self.cube_dir.mkdir(parents=True)
+
+        self.start, self.freq = pd.Timestamp(start), pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+        n_times = int((pd.Timestamp(end) - self.start) / self.freq) + 1
+        self.columns = pd.Index(columns)
+        self.index = {'datetime_col': datetime_col, 'start': self.start.isoformat(), 'freq': str(self.freq),
+                      'timezone': 'UTC', 'columns': list(columns), 'sites': list(sites), 'species': list(species)}
+
+        self.values = open_memmap(self.cube_dir / VALUES_FILE, mode='w+', dtype=np.float32,
+                                  shape=(n_times, len(columns)))
+        self.values[:] = np.nan
+        self.mask = open_memmap(self.cube_dir / MASK_FILE, mode='w+', dtype=np.bool_, shape=(n_times, len(columns)))
+
+    def add(self, times, labels, values):
+        """Mean of the values per (hour, column) cell, same as pivot_table(aggfunc='mean')."""
+        values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+        rows = ((times - self.start) // self.freq).to_numpy()
+        cols = self.columns.get_indexer(labels)
+        observed = ~np.isnan(values) & (cols >= 0) & ~pd.isna(times).to_numpy()
+        if not observed.any():
+            return
+        flat = rows[observed].astype(np.int64) * len(self.columns) + cols[observed]
+        cells, inverse = np.unique(flat, return_inverse=True)
+        sums = np.bincount(inverse, weights=values[observed])
+        counts = np.bincount(inverse)
+        #a batch never splits a cell across add() calls (batches are whole months).
+        self.values.reshape(-1)[cells] = (sums / counts).astype(np.float32)
+        self.mask.reshape(-1)[cells] = True
+
+    def close(self):
+        self.values.flush()
+        self.mask.flush()
+        self.index['shape'] = list(self.values.shape)
+        del self.values, self.mask
+        with open(self.cube_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        return MeasurementCube(self.cube_dir)
+
+
+def _utc_naive(times):
+    """Datetime series on the UTC clock without tz, the way the CSV GMT timestamps are read."""
+    times = pd.to_datetime(pd.Series(times).reset_index(drop=True), errors='coerce')
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    return times
+
+
+def main():
+    from src.data_prep.columnar_store import DefraColumnarStore, LaqnColumnarStore
+
+    parser = argparse.ArgumentParser(description="Build the dense measurement cube from a columnar store.")
+    parser.add_argument('dataset', choices=['laqn', 'defra'])
+    parser.add_argument('--store', required=True, help="columnar store, e.g. data/laqn/store/optimised")
+    parser.add_argument('--dest', required=True, help="cube folder, e.g. data/laqn/cube/optimised")
+    args = parser.parse_args()
+
+    store_class = LaqnColumnarStore if args.dataset == 'laqn' else DefraColumnarStore
+    cube = MeasurementCube.from_store(store_class(args.store), args.dest)
+    print(f"Cube {cube.cube_dir}: {cube.shape[0]:,} hours x {cube.shape[1]} columns, "
+          f"{cube.start} to {cube.end}, {cube.mask.mean():.1%} observed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Model registry: one artifact per target plus a manifest, instead of one joblib dict of every model.
+
+The training notebooks dump all_models ({target: model}) into cnn_all_models.joblib / all_rf_models*.joblib,
+so loading one site deserialises all 145 models. A registry folder holds
+    manifest.json        {target: file, kind, pollutant, metrics, output index}, feature_names, scaler version
+    models/<target>.*    one file per target (or per pollutant group for the multi-output forests)
+and loads a model only when it is first asked for.
+
+Random forests can be stored as a CompactForest: the tree arrays packed in one .npz with float32 thresholds
+(and optionally float32 leaf values). Thresholds are rounded down to float32, sklearn compares float32 inputs
+against them so the predictions are unchanged. About half the size of the pickle, and predict() works on the
+packed arrays without sklearn.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.checksum import file_checksum
+from src.ml_prep.evaluation import target_pollutant
+
+MANIFEST_FILE = 'manifest.json'
+MODELS_DIR = 'models'
+
+
+class CompactForest:
+    """Packed regression forest, all trees in flat node arrays.
+
+    Args:
+        left, right (np.ndarray): child node of every node, -1 for leaves (global node numbers).
+        feature (np.ndarray): feature tested at every node.
+        threshold (np.ndarray): float32 split thresholds, x <= threshold goes left.
+        value (np.ndarray): (n_nodes, n_outputs) leaf predictions.
+        roots (np.ndarray): first node of every tree.
+        n_features (int): number of input features.
+    """
+
+    def __init__(self, left, right, feature, threshold, value, roots, n_features):
+        self.left, self.right, self.feature = left, right, feature
+        self.threshold, self.value, self.roots = threshold, value, roots
+        self.n_features = int(n_features)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model, value_dtype=np.float64):
+        """Pack a fitted RandomForestRegressor (or ExtraTreesRegressor).
+
+        Args:
+            model: fitted sklearn forest.
+            value_dtype: dtype of the leaf values, float32 halves them at ~1e-7 relative error.
+        """
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            leaf = tree.children_left == -1
+            roots.append(offset)
+            left.append(np.where(leaf, -1, tree.children_left + offset))
+            right.append(np.where(leaf, -1, tree.children_right + offset))
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(_float32_floor(tree.threshold))
+            value.append(tree.value[:, :, 0])
+            offset += tree.node_count
+        return cls(np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+                   np.concatenate(feature).astype(np.int32), np.concatenate(threshold),
+                   np.concatenate(value).astype(value_dtype), np.array(roots, dtype=np.int32), model.n_features_in_)
+
+    def predict(self, X):
+        """Mean of the trees' leaf values, 1D for single output forests like sklearn."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected (samples, {self.n_features}) input, got {X.shape}")
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        #one level of every tree for every sample per step, max_depth steps.
+        while True:
+            inner = self.left[nodes] != -1
+            if not inner.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(inner, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+        prediction = self.value[nodes].astype(np.float64).mean(axis=1)
+        return prediction[:, 0] if self.n_outputs == 1 else prediction
+
+    def save(self, path, compress=False):
+        save = np.savez_compressed if compress else np.savez
+        save(path, left=self.left, right=self.right, feature=self.feature, threshold=self.threshold,
+             value=self.value, roots=self.roots, n_features=np.array(self.n_features))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays['left'], arrays['right'], arrays['feature'], arrays['threshold'], arrays['value'],
+                       arrays['roots'], int(arrays['n_features']))
+
+
+class ModelRegistry:
+    """Folder of per-target models with a JSON manifest, models are loaded lazily and cached.
+
+    Args:
+        root (str/Path): registry folder, created on the first register.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = Lock()
+        self._cache = {}
+        self.manifest = {'feature_names': None, 'scaler': None, 'models': {}}
+        if (self.root / MANIFEST_FILE).exists():
+            with open(self.root / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    @property
+    def feature_names(self):
+        return self.manifest['feature_names']
+
+    def targets(self, pollutant=None, sites=None):
+        """Registered target names, optionally only one pollutant and/or some sites."""
+        return [target for target, entry in self.manifest['models'].items()
+                if (pollutant is None or entry['pollutant'] == pollutant)
+                and (sites is None or target.rsplit('_', 1)[0] in sites)]
+
+    def entry(self, target):
+        return self.manifest['models'][target]
+
+    def set_features(self, feature_names, scaler_path=None):
+        """Record the model inputs: feature_names and the scaler (copied in, versioned by checksum)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest['feature_names'] = list(feature_names)
+        if scaler_path is not None:
+            target = self.root / 'scaler.joblib'
+            if Path(scaler_path).resolve() != target.resolve():
+                target.write_bytes(Path(scaler_path).read_bytes())
+            self.manifest['scaler'] = {'file': target.name, 'version': file_checksum(target)[:12]}
+        self._save_manifest()
+
+    def register(self, target, model, metrics=None, kind=None, compact=False, compress=3, save=True, **info):
+        """Store one target's model.
+
+        Args:
+            target (str): 'site_pollutant' name.
+            model: fitted sklearn estimator or keras model.
+            metrics (dict, optional): e.g. a row of the results table (test_r2, test_rmse, ...).
+            kind (str, optional): 'sklearn', 'compact' or 'keras', guessed from the model when None.
+            compact (bool): store a forest as a CompactForest (float32 thresholds).
+            compress (int/bool): joblib/npz compression, 0/False to store uncompressed.
+            save (bool): write the manifest now, False when registering many models in a row.
+            **info: extra manifest fields (e.g. params).
+        """
+        path, kind = self._write_model(target, model, kind, compact, compress)
+        self._add_entry(target, path, kind, metrics, save=save, **info)
+
+    def register_group(self, name, model, targets, results=None, compact=False, compress=3):
+        """Store one multi-output model serving several targets (train_rf_pollutant_groups).
+
+        Args:
+            name (str): group name, e.g. the pollutant.
+            model: fitted multi-output model, output i predicts targets[i].
+            targets (list): target names in output order.
+            results (pd.DataFrame, optional): per-target rows with a 'target' column, kept as metrics.
+        """
+        path, kind = self._write_model(f'group_{name}', model, None, compact, compress)
+        rows = {} if results is None else results.set_index('target').to_dict('index')
+        for i, target in enumerate(targets):
+            self._add_entry(target, path, kind, rows.get(target), save=False, group=name,
+                            output_index=i if len(targets) > 1 else None)
+        self._save_manifest()
+
+    def load(self, target):
+        """The model of target, read from disk on the first call only (group models are shared)."""
+        entry = self.entry(target)
+        with self._lock:
+            model = self._cache.get(entry['file'])
+        if model is None:
+            model = _read_model(self.root / entry['file'], entry['kind'])
+            with self._lock:
+                model = self._cache.setdefault(entry['file'], model)
+        return model
+
+    def predict(self, target, X):
+        """1D predictions of one target, picks its output from a group model."""
+        entry = self.entry(target)
+        model = self.load(target)
+        if entry['kind'] == 'keras':
+            prediction = np.asarray(model.predict(X, verbose=0))
+        else:
+            prediction = np.asarray(model.predict(X))
+        if entry.get('output_index') is not None:
+            prediction = prediction.reshape(len(prediction), -1)[:, entry['output_index']]
+        return prediction.reshape(len(prediction))
+
+    def load_scaler(self):
+        if not self.manifest.get('scaler'):
+            return None
+        return joblib.load(self.root / self.manifest['scaler']['file'])
+
+    def unload(self, target=None):
+        """Drop cached models (all, or the file of one target)."""
+        with self._lock:
+            if target is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.entry(target)['file'], None)
+
+    def _write_model(self, name, model, kind, compact, compress):
+        models_dir = self.root / MODELS_DIR
+        models_dir.mkdir(parents=True, exist_ok=True)
+        if kind is None:
+            kind = 'keras' if hasattr(model, 'save') and hasattr(model, 'layers') else 'sklearn'
+        if compact or kind == 'compact':
+            kind = 'compact'
+            if not isinstance(model, CompactForest):
+                model = CompactForest.from_sklearn(model)
+            path = models_dir / f'{name}.npz'
+            model.save(path, compress=bool(compress))
+        elif kind == 'keras':
+            path = models_dir / f'{name}.keras'
+            model.save(path)
+        else:
+            path = models_dir / f'{name}.joblib'
+            joblib.dump(model, path, compress=compress)
+        with self._lock:
+            self._cache.pop(path.relative_to(self.root).as_posix(), None)
+        return path, kind
+
+    def _add_entry(self, target, path, kind, metrics=None, save=True, **info):
+        metrics = {key: _json_value(value) for key, value in (metrics or {}).items()
+                   if key not in ('target', 'site', 'pollutant')}
+        entry = {'file': path.relative_to(self.root).as_posix(), 'kind': kind, 'pollutant': target_pollutant(target),
+                 'metrics': metrics, 'bytes': path.stat().st_size,
+                 'created': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}
+        entry.update({key: _json_value(value) for key, value in info.items()})
+        with self._lock:
+            self.manifest['models'][target] = entry
+        if save:
+            self._save_manifest()
+
+    def save(self):
+        self._save_manifest()
+
+    def _save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f'{MANIFEST_FILE}.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=2)
+            os.replace(tmp_path, self.root / MANIFEST_FILE)
+
+
+def migrate_all_models(all_models_path, registry_dir, results=None, feature_names=None, scaler_path=None,
+                       compact=False, compress=3):
+    """Split a monolithic all_models joblib dict into a registry, one file per target.
+
+    Args:
+        all_models_path (str/Path): e.g. cnn_all_models.joblib or all_rf_models.joblib.
+        registry_dir (str/Path): new registry folder.
+        results (pd.DataFrame/str, optional): results table (or its CSV), rows become the targets' metrics.
+        feature_names (list, optional): the ml_prep feature_names.
+        scaler_path (str/Path, optional): the ml_prep scaler.joblib.
+    Returns:
+        ModelRegistry
+    """
+    all_models = joblib.load(all_models_path)
+    if isinstance(results, (str, Path)):
+        results = pd.read_csv(results)
+    rows = {} if results is None else results.set_index('target').to_dict('index')
+
+    registry = ModelRegistry(registry_dir)
+    if feature_names is not None:
+        registry.set_features(feature_names, scaler_path)
+    for target, model in all_models.items():
+        registry.register(target, model, rows.get(target), compact=compact, compress=compress, save=False)
+    registry.save()
+    print(f"Registered {len(all_models)} models in {registry.root}")
+    return registry
+
+
+def _read_model(path, kind):
+    if kind == 'compact':
+        return CompactForest.load(path)
+    if kind == 'keras':
+        from tensorflow import keras
+        return keras.models.load_model(path)
+    return joblib.load(path)
+
+
+def _float32_floor(values):
+    """Largest float32 <= each value, x <= t and float32(x) <= floor32(t) agree for float32 x."""
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
@@ -0,0 +1,224 @@
+"""Process-parallel per-target Random Forest training over one shared, memory mapped feature matrix.
+
+rf_training_laqn_all / rf_training_defra_all_* fit one RandomForestRegressor per target in a loop over the same
+X_train_rf, then loop again calling predict on X_train_rf/X_val_rf/X_test_rf for every target. Tree building
+inside one forest scales poorly with ~1,700 features and few samples, so train_rf_targets spreads the targets
+over a process pool instead:
+    - X_train_rf/X_val_rf/X_test_rf are written once as float32 .npy files (the dtype the trees use anyway,
+      so sklearn does not copy them), the y arrays as they are, and every worker opens them read-only with
+      mmap_mode='r', nothing big is pickled to the workers,
+    - each worker fits its target with the pollutant's params (n_jobs=1), predicts the three splits once and
+      returns the row of the notebooks' results table,
+    - models are saved per target to model_dir (or sent back when model_dir is None).
+
+train_rf_pollutant_groups is the multi-output mode: one forest per pollutant (best_params_by_pollutant are per
+pollutant anyway) predicting every site of that pollutant at once, about 145 forests become 6. It reports the
+same per-target rows, the importances of a group forest are shared by all its targets.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+from sklearn.ensemble import RandomForestRegressor
+
+from src.ml_prep.evaluation import regression_metrics, target_pollutant
+
+SPLIT_ARRAYS = ('X_train', 'y_train', 'X_val', 'y_val', 'X_test', 'y_test')
+PARAM_COLUMNS = ('n_estimators', 'max_depth', 'min_samples_split', 'min_samples_leaf')
+
+#arrays opened by each worker process in _init_worker.
+_SHARED = {}
+
+
+def share_array(data, path, dtype=np.float32, chunk_rows=4096):
+    """Write data as a C-ordered .npy that workers can memory map.
+
+    Args:
+        data (np.ndarray/str/Path): the array, or an existing .npy file (reused as is when it has the dtype).
+        path (str/Path): where to write the shared copy.
+        dtype: stored dtype, None keeps the dtype of data.
+    Returns:
+        Path: the file to open with np.load(..., mmap_mode='r').
+    """
+    if isinstance(data, (str, Path)):
+        source = np.load(data, mmap_mode='r')
+        if source.dtype == (dtype or source.dtype) and source.flags.c_contiguous:
+            return Path(data)
+        data = source
+    out = open_memmap(path, mode='w+', dtype=dtype or data.dtype, shape=data.shape)
+    #chunked, a float64 memmap source is never loaded whole.
+    for start in range(0, len(data), chunk_rows):
+        out[start:start + chunk_rows] = data[start:start + chunk_rows]
+    out.flush()
+    del out
+    return Path(path)
+
+
+def train_rf_targets(X_train, y_train, X_val, y_val, X_test, y_test, target_names, target_mapping,
+                     params_by_pollutant, max_workers=None, model_dir=None, work_dir=None, random_state=42):
+    """Train one RandomForestRegressor per target across a process pool.
+
+    Args:
+        X_train, y_train, X_val, y_val, X_test, y_test: arrays or .npy paths, X the flattened rf matrices.
+        target_names (list): targets to train, 'site_pollutant'.
+        target_mapping (dict): {target name: column in y}.
+        params_by_pollutant (dict): {pollutant: RandomForestRegressor params}, e.g. best_params_by_pollutant.
+        max_workers (int, optional): processes, defaults to the number of cores.
+        model_dir (str/Path, optional): save each model as <model_dir>/<target>.joblib.
+        work_dir (str/Path, optional): where the shared float32 arrays go, a temp folder removed afterwards.
+        random_state (int): as the notebooks.
+    Returns:
+        tuple: (results DataFrame with the notebooks' evaluation columns plus train_time,
+                {target: model, or its .joblib path when model_dir is given}).
+    """
+    if model_dir is not None:
+        Path(model_dir).mkdir(parents=True, exist_ok=True)
+    tasks = []
+    for target_name in target_names:
+        params = dict(params_by_pollutant[target_pollutant(target_name)])
+        params.update(n_jobs=1, random_state=random_state)
+        tasks.append((target_name, target_mapping[target_name], params,
+                      str(Path(model_dir) / f'{target_name}.joblib') if model_dir is not None else None))
+
+    rows, models = {}, {}
+    total_start = time.time()
+    arrays = (X_train, y_train, X_val, y_val, X_test, y_test)
+    with _shared_pool(arrays, max_workers, work_dir) as executor:
+        futures = [executor.submit(_fit_target, *task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row, model = future.result()
+            rows[row['target']], models[row['target']] = row, model
+            print(f"[{done:3d}/{len(tasks)}] {row['target']:15s} | R2={row['val_r2']:.3f} | "
+                  f"Time={row['train_time']:.0f}s", flush=True)
+    print(f"Trained {len(tasks)} models in {(time.time() - total_start) / 60:.1f} min")
+
+    results = pd.DataFrame([rows[target_name] for target_name in target_names])
+    return results, {target_name: models[target_name] for target_name in target_names}
+
+
+def train_rf_pollutant_groups(X_train, y_train, X_val, y_val, X_test, y_test, target_names, target_mapping,
+                              params_by_pollutant, max_workers=None, model_dir=None, work_dir=None, random_state=42,
+                              feature_names=None):
+    """Train one multi-output RandomForestRegressor per pollutant, covering all its sites at once.
+
+    Same arguments as train_rf_targets, plus:
+        feature_names (list, optional): rf_feature_names, columns of the importances table.
+    Returns:
+        tuple: (results DataFrame, one row per target like train_rf_targets plus its model_group,
+                {pollutant: model, or its .joblib path when model_dir is given},
+                {pollutant: target names in the order of the model's outputs},
+                importances DataFrame, one row per pollutant group, one column per feature).
+    """
+    if len(target_names) == 0:
+        raise ValueError("No targets to train.")
+    if model_dir is not None:
+        Path(model_dir).mkdir(parents=True, exist_ok=True)
+    groups = {}
+    for target_name in target_names:
+        groups.setdefault(target_pollutant(target_name), []).append(target_name)
+
+    #few groups, so the cores left over after one process per group go to the trees of each forest.
+    cpus = os.cpu_count() or 1
+    max_workers = max(1, max_workers or min(len(groups), cpus))
+    forest_jobs = max(1, cpus // max_workers)
+    tasks = []
+    for pollutant, group in groups.items():
+        params = dict(params_by_pollutant[pollutant])
+        params.update(n_jobs=forest_jobs, random_state=random_state)
+        tasks.append((pollutant, group, [target_mapping[t] for t in group], params,
+                      str(Path(model_dir) / f'rf_{pollutant}.joblib') if model_dir is not None else None))
+
+    rows, models, importances = {}, {}, {}
+    total_start = time.time()
+    arrays = (X_train, y_train, X_val, y_val, X_test, y_test)
+    with _shared_pool(arrays, max_workers, work_dir) as executor:
+        futures = [executor.submit(_fit_group, *task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            pollutant, group_rows, model, importance = future.result()
+            rows.update({row['target']: row for row in group_rows})
+            models[pollutant], importances[pollutant] = model, importance
+            print(f"[{done}/{len(tasks)}] {pollutant:6s} {len(group_rows):3d} sites | "
+                  f"mean R2={np.mean([row['val_r2'] for row in group_rows]):.3f} | "
+                  f"Time={group_rows[0]['train_time']:.0f}s", flush=True)
+    print(f"Trained {len(tasks)} multi-output models for {len(target_names)} targets "
+          f"in {(time.time() - total_start) / 60:.1f} min")
+
+    results = pd.DataFrame([rows[target_name] for target_name in target_names])
+    importances = pd.DataFrame.from_dict(importances, orient='index', columns=feature_names)
+    return results, models, groups, importances
+
+
+@contextmanager
+def _shared_pool(arrays, max_workers=None, work_dir=None):
+    """Process pool whose workers memory map the six split arrays, shared files removed afterwards."""
+    own_work_dir = work_dir is None
+    work_dir = Path(tempfile.mkdtemp(prefix='rf_shared_') if own_work_dir else work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        paths = {name: str(share_array(data, work_dir / f'{name}.npy', np.float32 if name[0] == 'X' else None))
+                 for name, data in zip(SPLIT_ARRAYS, arrays)}
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(paths,)) as executor:
+            yield executor
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _init_worker(paths):
+    for name, path in paths.items():
+        _SHARED[name] = np.load(path, mmap_mode='r')
+
+
+def _fit_target(target_name, target_idx, params, model_path=None):
+    """Fit and evaluate one target in a worker, each split is predicted once."""
+    start = time.time()
+    model = RandomForestRegressor(**params)
+    model.fit(_SHARED['X_train'], _SHARED['y_train'][:, target_idx])
+    train_time = time.time() - start
+
+    row = {'target': target_name, 'site': target_name.rsplit('_', 1)[0], 'pollutant': target_pollutant(target_name)}
+    for split in ('train', 'val', 'test'):
+        y_pred = model.predict(_SHARED[f'X_{split}'])
+        row.update(regression_metrics(_SHARED[f'y_{split}'][:, target_idx], y_pred, prefix=split))
+    row.update({param: params.get(param) for param in PARAM_COLUMNS})
+    row['train_time'] = train_time
+
+    if model_path is not None:
+        joblib.dump(model, model_path)
+        return row, model_path
+    return row, model
+
+
+def _fit_group(pollutant, target_names, target_indices, params, model_path=None):
+    """Fit one multi-output forest for a pollutant group in a worker, rows per target like _fit_target."""
+    start = time.time()
+    model = RandomForestRegressor(**params)
+    y_train = _SHARED['y_train'][:, target_indices]
+    model.fit(_SHARED['X_train'], y_train if len(target_indices) > 1 else y_train.ravel())
+    train_time = time.time() - start
+
+    predictions = {split: model.predict(_SHARED[f'X_{split}']).reshape(len(_SHARED[f'X_{split}']), -1)
+                   for split in ('train', 'val', 'test')}
+    rows = []
+    for i, (target_name, target_idx) in enumerate(zip(target_names, target_indices)):
+        row = {'target': target_name, 'site': target_name.rsplit('_', 1)[0], 'pollutant': pollutant}
+        for split, y_pred in predictions.items():
+            row.update(regression_metrics(_SHARED[f'y_{split}'][:, target_idx], y_pred[:, i], prefix=split))
+        row.update({param: params.get(param) for param in PARAM_COLUMNS})
+        row.update(train_time=train_time, model_group=pollutant)
+        rows.append(row)
+
+    if model_path is not None:
+        joblib.dump(model, model_path)
+        return pollutant, rows, model_path, model.feature_importances_
+    return pollutant, rows, model, model.feature_importances_
@@ -0,0 +1,106 @@
+"""Sliding-window sequences for the CNN/RF models without copying the scaled matrix.
+
+The notebooks' create_sequences appends data[i - n_past:i] slices to a list and calls np.array(X), an
+(N, n_past, F) copy that is n_past times the size of the source matrix, for each of train, val and test.
+Here the windows are
+    - strided read-only views on the source array (create_sequences, same arguments and shapes), or
+    - copied one batch at a time (batch_sequences), or
+    - written straight into a 2D memmap for the random forest (flatten_sequences, replaces flatten_rf(X)).
+The source can itself be memory mapped, e.g. MeasurementCube.array() or np.load(..., mmap_mode='r').
+"""
+
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def n_sequences(n_rows, n_past=12, n_future=1):
+    """Number of (X, y) samples create_sequences makes from n_rows timestamps."""
+    return max(n_rows - n_past - n_future + 1, 0)
+
+
+def create_sequences(data, n_past=12, n_future=1):
+    """Sliding windows as read-only views, drop-in for the notebooks' create_sequences.
+
+    Args:
+        data (np.ndarray/pd.DataFrame): scaled data of shape (timestamps, features).
+        n_past (int): past timesteps used as input.
+        n_future (int): how many steps ahead the target is.
+    Returns:
+        tuple: (X, y), X shape (samples, n_past, features), y shape (samples, features).
+            Both are views on data, np.array(X) (or X.copy()) if an owned array is really needed.
+    """
+    data = _as_2d(data)
+    n = n_sequences(len(data), n_past, n_future)
+    if n == 0:
+        return np.empty((0, n_past, data.shape[1]), dtype=data.dtype), np.empty((0, data.shape[1]), dtype=data.dtype)
+    # (rows - n_past + 1, features, n_past) -> (samples, n_past, features), still a view.
+    X = sliding_window_view(data, n_past, axis=0)[:n].transpose(0, 2, 1)
+    y = data[n_past + n_future - 1:n_past + n_future - 1 + n].view()
+    y.flags.writeable = False
+    return X, y
+
+
+def batch_sequences(data, n_past=12, n_future=1, batch_size=256, shuffle=False, seed=None, indices=None):
+    """Lazy batches of (X, y), only one batch of windows is copied at a time.
+
+    Args:
+        data (np.ndarray/pd.DataFrame): scaled data of shape (timestamps, features).
+        n_past, n_future (int): as create_sequences.
+        batch_size (int): samples per batch, the last batch can be smaller.
+        shuffle (bool): visit the samples in a random order.
+        seed (int, optional): seed of the shuffle.
+        indices (array, optional): only these sample numbers (e.g. a train/val split of the windows).
+    Yields:
+        tuple: (X_batch, y_batch) float arrays of shape (b, n_past, features) and (b, features).
+    """
+    X, y = create_sequences(data, n_past, n_future)
+    order = np.arange(len(X)) if indices is None else np.asarray(indices)
+    if shuffle:
+        order = np.random.default_rng(seed).permutation(order)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        if not shuffle and indices is None:
+            # consecutive samples, a slice copy is cheaper than fancy indexing.
+            batch = slice(batch[0], batch[-1] + 1)
+        yield np.array(X[batch]), np.array(y[batch])
+
+
+def flatten_sequences(data, n_past=12, n_future=1, path=None, dtype=None):
+    """2D random forest input (samples, n_past * features), same layout as flatten_rf(X).
+
+    Written one lag at a time, column block t holds data[k + t] for sample k, so the 3D windows never exist.
+
+    Args:
+        data (np.ndarray/pd.DataFrame): scaled data of shape (timestamps, features).
+        n_past, n_future (int): as create_sequences.
+        path (str/Path, optional): .npy file to write as a memmap, in memory if None.
+        dtype (optional): output dtype, defaults to the dtype of data (float32 halves the file).
+    Returns:
+        tuple: (X_rf, y), X_rf a np.memmap when path is given, y a view as in create_sequences.
+    """
+    data = _as_2d(data)
+    n, n_features = n_sequences(len(data), n_past, n_future), data.shape[1]
+    dtype = dtype or data.dtype
+    shape = (n, n_past * n_features)
+    if path is None:
+        X_rf = np.empty(shape, dtype=dtype)
+    else:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        X_rf = open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    for t in range(n_past):
+        X_rf[:, t * n_features:(t + 1) * n_features] = data[t:t + n]
+    if path is not None:
+        X_rf.flush()
+    _, y = create_sequences(data, n_past, n_future)
+    return X_rf, y
+
+
+def _as_2d(data):
+    if not isinstance(data, np.ndarray):
+        data = np.asarray(data)
+    if data.ndim != 2:
+        raise ValueError(f"Expected (timestamps, features) data, got shape {data.shape}")
+    return data
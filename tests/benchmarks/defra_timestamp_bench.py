@@ -0,0 +1,62 @@
+"""Benchmark: per-row ms_to_iso (the old DefraGet.get_timeseries_data conversion) vs epoch_ms_to_timestamps.
+Converts a year of hourly DEFRA epoch-millisecond timestamps, the size of one coalesced getData response.
+
+Run from the project root:
+    python -m tests.benchmarks.defra_timestamp_bench --years 1
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.getData.defra_get import epoch_ms_to_timestamps
+
+
+def ms_to_iso(ts):
+    """The per-row conversion get_timeseries_data used before, kept here as the baseline."""
+    try:
+        ms = int(ts)
+        dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+        return dt.strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=1, help="years of hourly values to convert")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start_ms = int(datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp()) * 1000
+    hours = 8760 * args.years
+    # same shape as pd.DataFrame(values)["timestamp"] in get_timeseries_data.
+    timestamps = pd.DataFrame({"timestamp": [start_ms + h * 3_600_000 for h in range(hours)]})["timestamp"]
+
+    engines = {
+        "apply(ms_to_iso)": lambda: timestamps.apply(ms_to_iso),
+        "vectorized, str": lambda: epoch_ms_to_timestamps(timestamps, dtype="str"),
+        "vectorized, datetime64[ns, UTC]": lambda: epoch_ms_to_timestamps(timestamps, dtype="datetime"),
+    }
+
+    expected = engines["apply(ms_to_iso)"]()
+    pd.testing.assert_series_equal(engines["vectorized, str"](), expected, check_dtype=False)
+
+    print("=" * 80)
+    print(f"DEFRA timestamp conversion, {hours} hourly values, best of {args.repeat}")
+    print("=" * 80)
+    baseline = None
+    for name, fn in engines.items():
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"{name:<36} {best * 1000:9.2f} ms  {hours / best / 1e6:7.2f} M rows/s  {baseline / best:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark: the notebooks' imputation chain (steps 2-5 over the whole frame) vs impute_gaps.
+Synthetic wide frame shaped like the LAQN ml_prep table (145 columns, hourly) with scattered and long gaps.
+
+Run from the project root:
+    python -m tests.benchmarks.imputation_bench --years 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ml_prep.imputation import impute_gaps, impute_summary
+from tests.imputation_test import notebook_imputation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--series", type=int, default=145)
+    parser.add_argument("--outages", type=int, default=20, help="long gaps per column")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    hours = 8760 * args.years
+    rng = np.random.default_rng(0)
+    values = rng.gamma(3, 12, (hours, args.series))
+    for j in range(args.series):
+        for _ in range(args.outages):
+            start = rng.integers(0, hours)
+            values[start:start + rng.integers(1, 500), j] = np.nan
+    values[rng.random(values.shape) < 0.05] = np.nan
+    df = pd.DataFrame(values, index=pd.date_range("2021-01-01", periods=hours, freq="h"))
+    print(f"{hours:,} hours x {args.series} columns, {np.isnan(values).mean():.1%} missing")
+
+    start = time.perf_counter()
+    expected = notebook_imputation(df)
+    pandas_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filled, mask = impute_gaps(df, return_mask=True, max_workers=args.workers)
+    gaps_time = time.perf_counter() - start
+
+    assert np.array_equal(filled.to_numpy(), expected.to_numpy())
+    print(impute_summary(mask).to_string())
+    print(f"notebook chain       {pandas_time:8.3f} s")
+    print(f"impute_gaps          {gaps_time:8.3f} s   (identical result)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Load test for the inference server: many concurrent clients posting /forecast, client and server latencies.
+
+Against a running server (python -m src.ml_prep.inference_server ...), with raw hourly history from a CSV
+(DatetimeIndex first column, one column per site_species):
+    python -m tests.benchmarks.inference_load_test --url http://127.0.0.1:8080 --history recent.csv
+Without --url it starts a local server on synthetic forests shaped like the LAQN set:
+    python -m tests.benchmarks.inference_load_test --sites 145 --requests 2000 --concurrency 32
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ml_prep.inference_server import Forecaster, InferenceServer
+from tests.inference_server_test import build_demo_models, request_body
+
+
+def run_load(url, bodies, n_requests, concurrency):
+    """Post n_requests bodies round robin from concurrency threads, one keep-alive session per thread."""
+    sessions = {}
+
+    def post(i):
+        session = sessions.setdefault(os.getpid() * 1000 + i % concurrency, requests.Session())
+        start = time.perf_counter()
+        response = session.post(f"{url}/forecast", json=bodies[i % len(bodies)], timeout=30)
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(post, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([r[0] for r in results]) * 1000
+    errors = sum(status != 200 for _, status in results)
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="running server, default starts a local one on synthetic models")
+    parser.add_argument("--history", help="CSV of raw hourly observations to build requests from")
+    parser.add_argument("--sites", type=int, default=145)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        if args.url:
+            url = args.url
+            raw = pd.read_csv(args.history, index_col=0, parse_dates=True)
+            n_past = 12
+        else:
+            print(f"Training {args.sites} synthetic forests...")
+            raw, spec, registry = build_demo_models(Path(tmp) / "registry", n_sites=args.sites, n_past=12,
+                                                    hours=400, n_estimators=20)
+            server = InferenceServer(Forecaster(registry, spec), port=0, max_batch=args.max_batch,
+                                     max_wait_ms=args.max_wait_ms).start()
+            url, n_past = server.url, spec.n_past
+
+        bodies = [request_body(raw, end, n_past=n_past) for end in raw.index[n_past:n_past + 200]]
+        run_load(url, bodies, min(50, args.requests), args.concurrency)  # warm up
+        elapsed, latencies, errors = run_load(url, bodies, args.requests, args.concurrency)
+        server_metrics = requests.get(f"{url}/metrics", timeout=10).json()
+        if server is not None:
+            server.stop()
+
+    print("=" * 60)
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, {len(raw.columns)} targets each")
+    print("=" * 60)
+    print(f"throughput        {args.requests / elapsed:10.1f} req/s ({errors} errors)")
+    print(f"client p50        {np.percentile(latencies, 50):10.2f} ms")
+    print(f"client p99        {np.percentile(latencies, 99):10.2f} ms")
+    print(f"server p50        {server_metrics.get('p50_ms', float('nan')):10.2f} ms")
+    print(f"server p99        {server_metrics.get('p99_ms', float('nan')):10.2f} ms")
+    print(f"mean batch size   {server_metrics.get('mean_batch') or float('nan'):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
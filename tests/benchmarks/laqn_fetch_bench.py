@@ -0,0 +1,73 @@
+"""Benchmark: threaded parallel_fetch_hourly_data vs async_fetch_hourly_data against the local stub API.
+Every row of actv_sites_species.csv is fetched once per engine with a fixed fake API latency.
+
+Run from the project root:
+    python -m tests.benchmarks.laqn_fetch_bench --latency 0.25
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.getData.laqn_get import laqnGet
+from src.getData.rate_limiter import AdaptiveRateLimiter
+from tests.stub_api import StubApiServer
+
+PAIRS_CSV = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'laqn', 'actv_sites_species.csv')
+
+
+def run_engine(name, fetch):
+    """Time one engine, the fetch functions print per pair so their output is swallowed."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = fetch()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {len(results):>5} pairs  {elapsed:8.2f} s  {len(results) / elapsed:8.1f} pairs/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.25, help="fake API latency per request (s)")
+    parser.add_argument("--start", default="2023-01-01T00:00:00")
+    parser.add_argument("--end", default="2023-01-31T23:59:59")
+    args = parser.parse_args()
+
+    getter = laqnGet()
+    #threaded runs reproduce the old fixed-sleep behaviour, so take the shared limiter out of the way.
+    getter.rate_limiter = AdaptiveRateLimiter('bench', rate=1e6, max_rate=1e6, adaptive=False)
+    print("=" * 80)
+    print(f"LAQN fetch benchmark, stub latency {args.latency}s, {args.start} to {args.end}")
+    print("=" * 80)
+
+    with StubApiServer(latency=args.latency) as stub:
+        getter.config.get_hourly_data = stub.laqn_url
+
+        threaded = run_engine("threaded (8 workers, sleep 0.2s)", lambda: getter.parallel_fetch_hourly_data(
+            args.start, args.end, max_workers=8, sleep_sec=0.2, sites_species_csv=PAIRS_CSV))
+        threaded_no_sleep = run_engine("threaded (8 workers, no sleep)", lambda: getter.parallel_fetch_hourly_data(
+            args.start, args.end, max_workers=8, sleep_sec=0, sites_species_csv=PAIRS_CSV))
+        for concurrency in (64, 256):
+            elapsed = run_engine(f"async ({concurrency} in flight, no budget)", lambda: getter.async_fetch_hourly_data(
+                args.start, args.end, max_concurrency=concurrency, requests_per_sec=None,
+                sites_species_csv=PAIRS_CSV))
+        run_engine("async (256 in flight, 100 req/s budget)", lambda: getter.async_fetch_hourly_data(
+            args.start, args.end, max_concurrency=256, requests_per_sec=100, sites_species_csv=PAIRS_CSV))
+        getter.rate_limiter = AdaptiveRateLimiter('laqn', rate=20, max_rate=200, increase=20)
+        run_engine("async (256 in flight, adaptive limiter)", lambda: getter.async_fetch_hourly_data(
+            args.start, args.end, max_concurrency=256, requests_per_sec='adaptive', sites_species_csv=PAIRS_CSV))
+        print(f"Adaptive limiter after the run: {getter.rate_limiter.stats()}")
+
+    print("-" * 80)
+    print(f"Speed-up vs threaded default: {threaded / elapsed:.1f}x, vs threaded without sleep: "
+          f"{threaded_no_sleep / elapsed:.1f}x")
+    print(f"Peak requests in flight at the stub: {stub.max_in_flight}")
+
+
+if __name__ == "__main__":
+    main()
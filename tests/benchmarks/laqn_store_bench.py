@@ -0,0 +1,72 @@
+"""Benchmark: notebooks' load_data (pd.read_csv over every monthly CSV) vs LaqnColumnarStore.read.
+Builds a synthetic optimised/ tree shaped like the real one (141 site/species files per month).
+
+Run from the project root:
+    python -m tests.benchmarks.laqn_store_bench --months 36
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_prep.columnar_store import LaqnColumnarStore
+from tests.columnar_store_test import write_laqn_tree
+
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+
+def load_data(optimised_path):
+    """Same loop as load_data in notebooks/ml_laqn/ml_prep_laqn_all.ipynb, without the prints."""
+    frames = []
+    for folder in sorted(f for f in Path(optimised_path).iterdir() if f.is_dir()):
+        for csv_file in folder.glob("*.csv"):
+            frames.append(pd.read_csv(csv_file))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--months", type=int, default=12)
+    args = parser.parse_args()
+
+    months = [(2023 + i // 12, i % 12 + 1, MONTH_NAMES[i % 12]) for i in range(args.months)]
+    sites = [f"S{i:02d}" for i in range(47)]
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'optimised'
+        print(f"Writing {args.months * len(sites) * 3} synthetic CSVs...")
+        write_laqn_tree(source, months=months, sites=sites, species=('NO2', 'O3', 'PM10'))
+
+        start = time.perf_counter()
+        csv_df = load_data(source)
+        csv_time = time.perf_counter() - start
+
+        store = LaqnColumnarStore(Path(tmp) / 'store')
+        start = time.perf_counter()
+        store.write_from_csv(source)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store_df = store.read()
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        one_site = store.read(sites=['S07'], species=['NO2'])
+        filtered_time = time.perf_counter() - start
+
+    print("=" * 80)
+    print(f"{'load_data (read_csv per file)':<40} {csv_time:8.2f} s  {len(csv_df):>10,} rows")
+    print(f"{'store build (one off)':<40} {build_time:8.2f} s")
+    print(f"{'store.read() everything':<40} {read_time:8.2f} s  {len(store_df):>10,} rows  "
+          f"{csv_time / read_time:6.1f}x")
+    print(f"{'store.read(one site, one species)':<40} {filtered_time:8.2f} s  {len(one_site):>10,} rows")
+
+
+if __name__ == "__main__":
+    main()
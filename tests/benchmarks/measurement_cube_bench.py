@@ -0,0 +1,66 @@
+"""Benchmark: the notebooks' wide_format (pivot_table over every long row) vs MeasurementCube.
+Synthetic long frame shaped like the LAQN optimised data (145 site/species series, hourly).
+
+Run from the project root:
+    python -m tests.benchmarks.measurement_cube_bench --years 2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.ml_prep.measurement_cube import MeasurementCube
+from tests.measurement_cube_test import wide_format
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--series", type=int, default=145)
+    args = parser.parse_args()
+
+    times = pd.date_range("2023-01-01", periods=8760 * args.years, freq="h")
+    rng = np.random.default_rng(0)
+    n = len(times) * args.series
+    df = pd.DataFrame({
+        "@MeasurementDateGMT": np.tile(times, args.series),
+        "@Value": rng.uniform(0, 80, n).round(1),
+        "SiteCode": np.repeat([f"S{i // 3:02d}" for i in range(args.series)], len(times)),
+        "SpeciesCode": np.repeat([("NO2", "O3", "PM10")[i % 3] for i in range(args.series)], len(times)),
+    })
+    print(f"{n:,} long rows, {args.series} series")
+
+    start = time.perf_counter()
+    wide_format(df, "@MeasurementDateGMT", "SiteCode", "SpeciesCode", "@Value")
+    pivot_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        MeasurementCube.build(df, Path(tmp) / "cube", "@MeasurementDateGMT", "SiteCode", "SpeciesCode", "@Value")
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cube = MeasurementCube(Path(tmp) / "cube")
+        cube.window()
+        open_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cube.window(start="2023-06-01", end="2023-06-30 23:00", species=["NO2"])
+        window_time = time.perf_counter() - start
+
+    print(f"wide_format pivot_table        {pivot_time:8.3f} s")
+    print(f"cube build (once)              {build_time:8.3f} s")
+    print(f"cube open + full window        {open_time:8.3f} s")
+    print(f"cube one month, NO2 columns    {window_time:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Testing module for cnn_multi_output.py and the per-target results table in evaluation.py."""
+
+import importlib.util
+import os
+import sys
+import unittest
+
+import numpy as np
+from sklearn.metrics import r2_score
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.evaluation import target_results
+
+
+class TestTargetResults(unittest.TestCase):
+    """target_results gives the same rows the per-target notebook loop appended."""
+
+    def test_columns_and_values(self):
+        rng = np.random.default_rng(0)
+        y_true = rng.uniform(0, 1, (50, 3))
+        y_pred = y_true + rng.normal(0, 0.1, (50, 3))
+        results = target_results(y_true, y_pred, ['BG1_NO2', 'KC1_O3', 'TH4_PM25'], epochs=[12, 12, 12])
+
+        self.assertEqual(list(results.columns), ['target', 'pollutant', 'test_r2', 'test_rmse', 'test_mae', 'epochs'])
+        self.assertEqual(list(results['pollutant']), ['NO2', 'O3', 'PM25'])
+        self.assertAlmostEqual(results['test_r2'][1], r2_score(y_true[:, 1], y_pred[:, 1]))
+        self.assertAlmostEqual(results['test_mae'][2], np.abs(y_true[:, 2] - y_pred[:, 2]).mean())
+
+    def test_single_target_and_mismatch(self):
+        y = np.arange(10.0)
+        results = target_results(y, y, ['BG1_NO2'], prefix='val')
+        self.assertEqual(results['val_r2'][0], 1.0)
+        with self.assertRaises(ValueError):
+            target_results(np.zeros((10, 2)), np.zeros((10, 2)), ['BG1_NO2'])
+
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "needs tensorflow")
+class TestMultiOutputCnn(unittest.TestCase):
+    """One shared-trunk model for every target (needs tensorflow)."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.data = rng.uniform(0, 1, (300, 5)).astype(np.float32)
+
+    def test_model_shapes(self):
+        from src.ml_prep.cnn_multi_output import build_multi_output_cnn
+        for heads in ('shared', 'separate'):
+            model = build_multi_output_cnn(12, 5, 4, heads=heads)
+            self.assertEqual(model.output_shape, (None, 4))
+        with self.assertRaises(ValueError):
+            build_multi_output_cnn(12, 5, 4, heads='tree')
+
+    def test_train_arrays_and_datasets(self):
+        from src.ml_prep.cnn_multi_output import train_multi_output_cnn
+        from src.ml_prep.input_pipeline import window_dataset
+        from src.ml_prep.sequences import create_sequences
+
+        targets, names = [0, 2, 3], ['A_NO2', 'B_O3', 'C_PM10']
+        train, val, test = self.data[:200], self.data[200:250], self.data[250:]
+        X_test, y_test = create_sequences(test)
+
+        arrays = tuple((X, y[:, targets]) for X, y in (create_sequences(train), create_sequences(val)))
+        _, history, results = train_multi_output_cnn(arrays[0], arrays[1], (X_test, y_test[:, targets]),
+                                                     y_test[:, targets], names, max_epochs=2)
+        self.assertEqual(list(results['target']), names)
+        self.assertEqual(list(results['epochs']), [2, 2, 2])
+
+        datasets = [window_dataset(split, batch_size=32, target_indices=targets) for split in (train, val, test)]
+        _, _, results = train_multi_output_cnn(*datasets, y_test[:, targets], names, max_epochs=2, heads='separate')
+        self.assertTrue(np.isfinite(results['test_rmse']).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""Testing module for columnar_store.py, the partitioned Parquet stores built from the CSV folder trees.
+Builds small synthetic folder trees in a temp dir, the real data folders are not needed."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_prep.columnar_store import DefraColumnarStore, LaqnColumnarStore
+
+
+def write_laqn_tree(root, months=((2023, 1, 'jan'), (2023, 2, 'feb')), sites=('BG1', 'KC1'),
+                    species=('NO2', 'O3'), with_codes=True):
+    """optimised/ style tree: <yyyy_mon>/<site>_<species>_<start>_<end>.csv, one row per hour."""
+    for year, month, name in months:
+        folder = Path(root) / f"{year}_{name}"
+        folder.mkdir(parents=True, exist_ok=True)
+        times = pd.date_range(f"{year}-{month:02d}-01", periods=72, freq='h')
+        for site in sites:
+            for sp in species:
+                values = np.round(np.random.default_rng(len(site + sp) + month).uniform(0, 80, len(times)), 1)
+                values[::17] = np.nan
+                df = pd.DataFrame({'@MeasurementDateGMT': times.strftime('%Y-%m-%d %H:%M:%S'), '@Value': values})
+                if with_codes:
+                    df['SpeciesCode'], df['SiteCode'], df['SiteName'] = sp, site, f"Site {site}"
+                df.to_csv(folder / f"{site}_{sp}_{times[0]:%Y-%m-%d}_{times[-1]:%Y-%m-%d}.csv", index=False)
+    # non month folders (report/ etc.) are skipped.
+    (Path(root) / 'report').mkdir(exist_ok=True)
+
+
+def write_defra_tree(root, years=(2023, 2024), stations=('Camden_Kerbside', 'London_Bloomsbury'),
+                     pollutants=('NO2', 'PM2.5'), with_metadata=True):
+    """DEFRA stage tree: <year>measurements/<station>/<pollutant>__YYYY_MM.csv, two months per year."""
+    for year in years:
+        for station in stations:
+            folder = Path(root) / f"{year}measurements" / station
+            folder.mkdir(parents=True, exist_ok=True)
+            for month in (1, 2):
+                times = pd.date_range(f"{year}-{month:02d}-01", periods=48, freq='h')
+                for i, pollutant in enumerate(pollutants):
+                    values = np.round(np.random.default_rng(year + month + i).uniform(0, 60, len(times)), 3)
+                    values[::11] = np.nan
+                    df = pd.DataFrame({'timestamp': times.strftime('%Y-%m-%d %H:%M:%S'), 'value': values})
+                    if with_metadata:
+                        df['timeseries_id'] = 1000 + i
+                        df['station_name'] = station.replace('_', ' ')
+                        df['pollutant_name'] = pollutant
+                        df['latitude'], df['longitude'] = 51.5, -0.12
+                    df.to_csv(folder / f"{pollutant}__{year}_{month:02d}.csv", index=False)
+
+
+class TestLaqnColumnarStore(unittest.TestCase):
+    """Unit tests for LaqnColumnarStore."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = Path(self.tmp.name) / 'optimised'
+        write_laqn_tree(self.source)
+        self.store = LaqnColumnarStore(Path(self.tmp.name) / 'store')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def csv_frame(self):
+        """What the notebooks' load_data builds, pd.read_csv over every file."""
+        frames = [pd.read_csv(f) for f in sorted(self.source.glob('*/*.csv'))]
+        df = pd.concat(frames, ignore_index=True)
+        df['@MeasurementDateGMT'] = pd.to_datetime(df['@MeasurementDateGMT'])
+        return df
+
+    def sort(self, df):
+        return df.sort_values(['SiteCode', 'SpeciesCode', '@MeasurementDateGMT']).reset_index(drop=True)
+
+    def test_round_trip_matches_csv(self):
+        written = self.store.write_from_csv(self.source, max_workers=2)
+        self.assertEqual(written, {'2023_feb': 288, '2023_jan': 288})
+        self.assertEqual(sorted(p.name for p in (self.store.store_dir / 'year=2023').iterdir()),
+                         ['month=1', 'month=2'])
+
+        df = self.store.read()
+        expected = self.csv_frame()
+        pd.testing.assert_frame_equal(self.sort(df)[expected.columns], self.sort(expected))
+        self.assertEqual(str(df['@MeasurementDateGMT'].dtype), 'datetime64[ns]')
+        self.assertEqual(self.store.read(categorical=True)['SiteCode'].dtype, 'category')
+
+    def test_predicate_pushdown(self):
+        self.store.write_from_csv(self.source, max_workers=2)
+        df = self.store.read(sites=['KC1'], species=['O3'], start='2023-02-01 06:00', end='2023-02-02 05:00')
+        self.assertEqual(len(df), 24)
+        self.assertEqual(set(df['SiteCode']), {'KC1'})
+        self.assertEqual(set(df['SpeciesCode']), {'O3'})
+        self.assertEqual(df['@MeasurementDateGMT'].min(), pd.Timestamp('2023-02-01 06:00'))
+
+        only_january = self.store.read(end='2023-01-31 23:00', columns=['SiteCode', '@Value'])
+        self.assertEqual(list(only_january.columns), ['SiteCode', '@Value'])
+        self.assertEqual(len(only_january), 288)
+
+    def test_codes_from_file_names(self):
+        """monthly_data/ files only have the time and value columns, site/species come from the file name."""
+        raw = Path(self.tmp.name) / 'monthly_data'
+        write_laqn_tree(raw, months=((2024, 3, 'mar'),), with_codes=False)
+        store = LaqnColumnarStore(Path(self.tmp.name) / 'raw_store')
+        store.write_from_csv(raw)
+        df = store.read(sites=['BG1'])
+        self.assertEqual(sorted(df['SpeciesCode'].unique()), ['NO2', 'O3'])
+        self.assertEqual(len(df), 144)
+
+    def test_missing_store(self):
+        with self.assertRaises(FileNotFoundError):
+            LaqnColumnarStore(Path(self.tmp.name) / 'nowhere').read()
+
+
+class TestDefraColumnarStore(unittest.TestCase):
+    """Unit tests for DefraColumnarStore."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = Path(self.tmp.name) / 'optimised'
+        write_defra_tree(self.source)
+        self.store = DefraColumnarStore(Path(self.tmp.name) / 'store')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_matches_csv(self):
+        written = self.store.write_from_csv(self.source, max_workers=2)
+        self.assertEqual(written['2023measurements/Camden_Kerbside'], 192)
+        self.assertEqual(len(written), 4)
+
+        df = self.store.read()
+        self.assertEqual(df['value'].dtype, np.float32)
+        self.assertEqual(str(df['timestamp'].dtype), 'datetime64[ns]')
+        self.assertEqual(self.store.read(categorical=True)['pollutant_name'].dtype, 'category')
+
+        # every row keeps the file it came from, compare each file against its CSV.
+        for source_file, rows in df.groupby('source_file'):
+            expected = pd.read_csv(self.source / source_file)
+            rows = rows.sort_values('timestamp')
+            self.assertEqual(list(rows['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')), list(expected['timestamp']))
+            np.testing.assert_allclose(rows['value'].to_numpy(), expected['value'].to_numpy(), rtol=1e-6)
+            self.assertEqual(set(rows['station_name']), set(expected['station_name']))
+        self.assertEqual(df['source_file'].nunique(), 16)
+
+    def test_predicate_pushdown(self):
+        self.store.write_from_csv(self.source, max_workers=2)
+        df = self.store.read(sites=['Camden Kerbside'], species=['PM2.5'], start='2024-02-01', end='2024-02-01 23:00')
+        self.assertEqual(len(df), 24)
+        self.assertEqual(set(df['source_file']), {'2024measurements/Camden_Kerbside/PM2.5__2024_02.csv'})
+
+    def test_names_from_folders(self):
+        """Files with only timestamp/value get the station from the folder and the pollutant from the file name."""
+        raw = Path(self.tmp.name) / 'raw_data'
+        write_defra_tree(raw, years=(2025,), with_metadata=False)
+        store = DefraColumnarStore(Path(self.tmp.name) / 'raw_store')
+        store.write_from_csv(raw)
+        df = store.read(sites=['London_Bloomsbury'])
+        self.assertEqual(sorted(df['pollutant_name'].unique()), ['NO2', 'PM2.5'])
+        self.assertEqual(len(df), 192)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Testing module for imputation.py, the gap-only version of the ml_prep imputation steps."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.imputation import (COLUMN_MEDIAN, FILL_VALUE, FILLED, INTERPOLATED, MISSING, OBSERVED,
+                                    ROLLING_MEDIAN, impute_gaps, impute_summary)
+
+
+def notebook_imputation(df, interp_limit=6, fill_limit=4, window_size=336):
+    """Steps 2-5 exactly as written in ml_prep_laqn_all."""
+    df_step2 = df.interpolate(method='linear', limit=interp_limit, limit_direction='both')
+    df_step3 = df_step2.ffill(limit=fill_limit).bfill(limit=fill_limit)
+    rolling_median = df_step3.rolling(window=window_size, center=True, min_periods=1).median()
+    df_step4 = df_step3.fillna(rolling_median)
+    return df_step4.fillna(df_step4.median())
+
+
+def frame_with_gaps(hours, n_cols, seed, max_gap=800):
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(3, 12, (hours, n_cols))
+    for j in range(n_cols):
+        for _ in range(rng.integers(0, 8)):
+            start = rng.integers(0, hours)
+            values[start:start + rng.integers(1, max_gap), j] = np.nan
+    values[rng.random(values.shape) < rng.uniform(0, 0.3)] = np.nan
+    index = pd.date_range('2023-01-01', periods=hours, freq='h')
+    return pd.DataFrame(values, index=index, columns=[f"S{j}_NO2" for j in range(n_cols)])
+
+
+class TestImputeGaps(unittest.TestCase):
+    """impute_gaps gives the notebook's values cell for cell."""
+
+    def test_matches_notebook_chain(self):
+        rng = np.random.default_rng(0)
+        for seed in range(25):
+            df = frame_with_gaps(int(rng.integers(5, 3000)), int(rng.integers(1, 10)), seed)
+            if seed % 5 == 0:
+                df.iloc[:, 0] = np.nan
+            window_size = int(rng.choice([4, 5, 24, 336]))
+            filled = impute_gaps(df, window_size=window_size, max_workers=2, chunk_columns=3)
+            np.testing.assert_array_equal(filled.to_numpy(), notebook_imputation(df, window_size=window_size)
+                                          .to_numpy(), err_msg=f"seed {seed}")
+            self.assertEqual(list(filled.columns), list(df.columns))
+            self.assertTrue(filled.index.equals(df.index))
+
+    def test_mask_records_steps(self):
+        df = pd.DataFrame({'A_NO2': [1.0, np.nan, 3.0] + [np.nan] * 24 + [4.0] * 5,
+                           'B_NO2': np.nan, 'C_NO2': np.arange(32.0)})
+        filled, mask = impute_gaps(df, window_size=4, return_mask=True)
+        codes = mask['A_NO2'].tolist()
+        self.assertEqual(codes[:3], [OBSERVED, INTERPOLATED, OBSERVED])
+        #24 hour gap: 6 interpolated from each side, then 4 ffill and 4 bfill, the middle 4 from the medians.
+        self.assertEqual(codes[3:9] + codes[21:27], [INTERPOLATED] * 12)
+        self.assertEqual(codes[9:13] + codes[17:21], [FILLED] * 8)
+        self.assertEqual(codes[13:17], [ROLLING_MEDIAN, ROLLING_MEDIAN, COLUMN_MEDIAN, ROLLING_MEDIAN])
+        self.assertFalse(filled['A_NO2'].isna().any())
+        self.assertTrue((mask['B_NO2'] == MISSING).all())
+        self.assertTrue((mask['C_NO2'] == OBSERVED).all())
+        self.assertEqual(impute_summary(mask)['missing'], 32)
+
+        filled, mask = impute_gaps(df, return_mask=True, fill_values={'B_NO2': 7.5})
+        self.assertTrue((filled['B_NO2'] == 7.5).all())
+        self.assertTrue((mask['B_NO2'] == FILL_VALUE).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
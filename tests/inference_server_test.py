@@ -0,0 +1,173 @@
+"""Testing module for inference_server.py and features.py, serving registry models over local HTTP.
+Trains a few small forests on synthetic data shaped like the ml_prep outputs."""
+
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.features import TEMPORAL_COLS, FeatureSpec, temporal_features
+from src.ml_prep.inference_server import Forecaster, InferenceServer
+from src.ml_prep.model_registry import ModelRegistry
+from src.ml_prep.sequences import flatten_sequences
+
+
+def build_demo_models(root, n_sites=4, n_past=6, hours=600, n_estimators=10, group=False):
+    """Raw hourly history, the ml_prep scaling and one registry of forests trained on it.
+
+    Returns:
+        tuple: (raw history DataFrame, FeatureSpec, ModelRegistry)
+    """
+    rng = np.random.default_rng(11)
+    index = pd.date_range('2024-01-01', periods=hours, freq='h')
+    cols = [f"S{i:02d}_{'NO2' if i % 2 == 0 else 'O3'}" for i in range(n_sites)]
+    daily = np.sin(2 * np.pi * index.hour.to_numpy() / 24)[:, None]
+    raw = pd.DataFrame(40 + 15 * daily + rng.normal(0, 3, (hours, n_sites)), index=index, columns=cols)
+
+    scaler = MinMaxScaler().fit(raw)
+    features = raw.copy()
+    features[cols] = scaler.transform(raw)
+    features['hour'] = index.hour
+    features['day_of_week'] = index.dayofweek
+    features['month'] = index.month
+    features['is_weekend'] = features['day_of_week'].isin([5, 6]).astype(int)
+    feature_names = list(features.columns)
+
+    X_rf, y = flatten_sequences(features.to_numpy(), n_past=n_past)
+    registry = ModelRegistry(root)
+    registry.set_features(feature_names)
+    if group:
+        model = RandomForestRegressor(n_estimators=n_estimators, max_depth=6, random_state=0).fit(X_rf, y[:, :n_sites])
+        registry.register_group('all', model, cols)
+    else:
+        for i, col in enumerate(cols):
+            model = RandomForestRegressor(n_estimators=n_estimators, max_depth=6, random_state=0).fit(X_rf, y[:, i])
+            registry.register(col, model, compact=i % 2 == 1, save=False)
+        registry.save()
+    return raw, FeatureSpec(feature_names, scaler, n_past), registry
+
+
+def request_body(raw, end, n_past=6, targets=None):
+    window = raw.loc[:end].iloc[-n_past:]
+    body = {'timestamps': window.index.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+            'observations': {col: window[col].tolist() for col in window.columns}}
+    if targets is not None:
+        body['targets'] = targets
+    return body
+
+
+class TestFeatureSpec(unittest.TestCase):
+    """FeatureSpec reproduces the ml_prep scaling and temporal columns."""
+
+    def test_window_matches_training_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            raw, spec, _ = build_demo_models(Path(tmp) / 'registry', n_estimators=2)
+        window = spec.window(raw.iloc[100:106])
+        self.assertEqual(window.shape, (6, len(spec.feature_names)))
+        np.testing.assert_allclose(window[:, :4], spec.scaler.transform(raw.iloc[100:106]))
+        self.assertEqual(list(window[:, spec.feature_names.index('hour')]), list(raw.index[100:106].hour))
+        self.assertEqual(spec.feature_names[-4:], TEMPORAL_COLS)
+        np.testing.assert_allclose(spec.unscale('S01_O3', window[:, 1]), raw['S01_O3'].iloc[100:106])
+
+        # a missing hour and a missing column are filled inside the window.
+        gappy = raw.iloc[100:106].drop(index=raw.index[103]).drop(columns='S02_NO2')
+        filled = spec.window(gappy)
+        self.assertFalse(np.isnan(filled).any())
+        np.testing.assert_allclose(filled[3, :4], filled[2, :4])
+
+    def test_real_ml_prep_dirs(self):
+        """The saved LAQN (pollutant columns scaled) and DEFRA (every column scaled) prep outputs."""
+        root = Path(__file__).resolve().parents[1] / 'data'
+        for ml_prep_dir in (root / 'laqn' / 'ml_prep_all', root / 'defra' / 'ml_prep'):
+            if not (ml_prep_dir / 'scaler.joblib').exists():
+                self.skipTest(f"{ml_prep_dir} not available")
+            spec = FeatureSpec.from_dir(ml_prep_dir)
+            self.assertEqual(spec.n_past, 12)
+            index = pd.date_range('2024-06-01', periods=30, freq='h')
+            raw = pd.DataFrame(np.random.default_rng(2).uniform(0, 80, (30, len(spec.observed_cols))),
+                               index=index, columns=spec.observed_cols)
+
+            matrix = raw.copy()
+            for col, values in temporal_features(index).items():
+                matrix[col] = values
+            matrix = matrix[spec.feature_names]
+            expected = matrix.to_numpy(dtype=np.float64)
+            positions = [spec.feature_names.index(c) for c in spec.scaled_cols]
+            expected[:, positions] = spec.scaler.transform(matrix[spec.scaled_cols].to_numpy())
+            np.testing.assert_allclose(spec.transform(raw), expected, err_msg=str(ml_prep_dir))
+            np.testing.assert_allclose(spec.window(raw), expected[-12:], err_msg=str(ml_prep_dir))
+
+
+class TestInferenceServer(unittest.TestCase):
+    """End to end through HTTP, micro-batched predictions equal direct model predictions."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw, self.spec, self.registry = build_demo_models(Path(self.tmp.name) / 'registry')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def expected(self, end, target):
+        window = self.spec.window(self.raw.loc[:end].iloc[-6:])
+        scaled = self.registry.predict(target, window.reshape(1, -1))
+        return float(self.spec.unscale(target, scaled)[0])
+
+    def test_forecast_endpoint(self):
+        forecaster = Forecaster(self.registry, self.spec)
+        with InferenceServer(forecaster, port=0, max_wait_ms=5) as server:
+            end = self.raw.index[300]
+            response = requests.post(f"{server.url}/forecast", json=request_body(self.raw, end), timeout=10)
+            self.assertEqual(response.status_code, 200)
+            payload = response.json()
+            self.assertEqual(payload['forecast_for'], '2024-01-13 13:00:00')
+            self.assertEqual(sorted(payload['forecasts']), sorted(self.raw.columns))
+            for target, value in payload['forecasts'].items():
+                self.assertAlmostEqual(value, self.expected(end, target), places=6)
+
+            only = requests.post(f"{server.url}/forecast", json=request_body(self.raw, end, targets=['S01_O3']),
+                                 timeout=10).json()
+            self.assertEqual(list(only['forecasts']), ['S01_O3'])
+            bad = requests.post(f"{server.url}/forecast", json=request_body(self.raw, end, targets=['XX_NO2']),
+                                timeout=10)
+            self.assertEqual(bad.status_code, 400)
+
+            metrics = requests.get(f"{server.url}/metrics", timeout=10).json()
+            self.assertEqual(metrics['requests'], 2)
+            self.assertEqual(metrics['errors'], 1)
+            self.assertIn('p99_ms', metrics)
+
+    def test_concurrent_requests_are_batched(self):
+        forecaster = Forecaster(self.registry, self.spec)
+        ends = list(self.raw.index[200:264])
+        with InferenceServer(forecaster, port=0, max_batch=32, max_wait_ms=20) as server:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                responses = list(executor.map(
+                    lambda end: requests.post(f"{server.url}/forecast", json=request_body(self.raw, end),
+                                              timeout=10).json(), ends))
+            metrics = server.tracker.snapshot()
+        self.assertGreater(metrics['mean_batch'], 1)
+        for end, payload in zip(ends[::8], responses[::8]):
+            self.assertAlmostEqual(payload['forecasts']['S02_NO2'], self.expected(end, 'S02_NO2'), places=6)
+
+    def test_group_model_predicted_once(self):
+        raw, spec, registry = build_demo_models(Path(self.tmp.name) / 'group', group=True)
+        forecaster = Forecaster(registry, spec, targets=['S00_NO2', 'S03_O3'])
+        self.assertEqual(len(forecaster.files), 1)
+        windows = np.stack([spec.window(raw.iloc[i:i + 6]) for i in (10, 50)])
+        forecasts = forecaster.predict_windows(windows)
+        scaled = registry.load('S03_O3').predict(windows.reshape(2, -1))[:, 3]
+        np.testing.assert_allclose(forecasts['S03_O3'], spec.unscale('S03_O3', scaled))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Testing module for input_pipeline.py, the tf.data pipeline streaming windows from the scaled splits."""
+
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.sequences import create_sequences
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+if HAS_TENSORFLOW:
+    from src.ml_prep.input_pipeline import load_scaled_split, save_scaled_splits, split_datasets, window_dataset
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "needs tensorflow")
+class TestInputPipeline(unittest.TestCase):
+    """Unit tests for the batched input pipeline."""
+
+    def setUp(self):
+        self.data = np.random.default_rng(5).uniform(0, 1, (150, 6)).astype(np.float32)
+        self.X, self.y = create_sequences(self.data)
+
+    def collect(self, dataset):
+        X, y = zip(*[(X.numpy(), y.numpy()) for X, y in dataset])
+        return np.concatenate(X), np.concatenate(y)
+
+    def test_batches_match_sequences(self):
+        dataset = window_dataset(self.data, batch_size=32)
+        self.assertEqual(int(dataset.cardinality()), 5)
+        X, y = self.collect(dataset)
+        np.testing.assert_array_equal(X, self.X)
+        np.testing.assert_array_equal(y, self.y)
+
+    def test_targets(self):
+        _, y = self.collect(window_dataset(self.data, batch_size=32, target_indices=2))
+        self.assertEqual(y.ndim, 1)
+        np.testing.assert_array_equal(y, self.y[:, 2])
+        _, y = self.collect(window_dataset(self.data, batch_size=32, target_indices=[0, 4]))
+        np.testing.assert_array_equal(y, self.y[:, [0, 4]])
+
+    def test_shuffle_each_epoch(self):
+        dataset = window_dataset(self.data, batch_size=200, shuffle=True, seed=1)
+        first, _ = self.collect(dataset)
+        second, _ = self.collect(dataset)
+        self.assertFalse(np.array_equal(first, second))
+        # same samples, different order.
+        np.testing.assert_array_equal(np.sort(first[:, 0, 0]), np.sort(self.X[:, 0, 0]))
+
+    def test_split_datasets_from_saved_splits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            columns = [f"S{i}_NO2" for i in range(6)]
+            save_scaled_splits(tmp, columns, n_past=4, train=pd.DataFrame(self.data, columns=columns),
+                               val=self.data[:40], test=self.data[:30])
+            self.assertIsInstance(load_scaled_split(tmp, 'train'), np.memmap)
+
+            datasets = split_datasets(tmp, batch_size=16)
+            self.assertEqual(sorted(datasets), ['test', 'train', 'val'])
+            X_val, y_val = self.collect(datasets['val'])
+            expected_X, expected_y = create_sequences(self.data[:40], n_past=4)
+            np.testing.assert_array_equal(X_val, expected_X)
+            np.testing.assert_array_equal(y_val, expected_y)
+
+
+if __name__ == '__main__':
+    unittest.main()
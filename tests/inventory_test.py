@@ -6,9 +6,10 @@ import numpy as np
 import os
 import sys
 import json
+import tempfile
 from pathlib import Path 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.data_prep.data_inventory import DataInventory
+from src.data_prep.data_inventory import DataInventory, csv_metadata
 
 class TestDataInventory(unittest.TestCase):
     """Unit tests for DataInventory class."""
@@ -392,6 +393,157 @@ class TestDataInventory(unittest.TestCase):
         
         print(f"\nAll datasets passed duplicate validation.")
 
+class InventoryTree(unittest.TestCase):
+    """A small temp data tree with LAQN, DEFRA and meteo files."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base_path = Path(self.tmp.name)
+        files = {
+            'data/laqn/monthly_data/2023_jan/BG1_NO2_2023-01-01_2023-01-31.csv':
+                '@MeasurementDateGMT,@Value\n2023-01-01 00:00,31.2\n2023-01-01 01:00,\n2023-01-01 02:00,29.0\n',
+            'data/laqn/monthly_data/2023_jan/KC1_O3_2023-01-01_2023-01-31.csv':
+                '@MeasurementDateGMT,@Value\r\n2023-01-01 00:00,12\r\n\r\n2023-01-01 01:00,14',
+            'data/laqn/monthly_data/2023_feb/BG1_NO2_2023-02-01_2023-02-28.csv': '@MeasurementDateGMT,@Value\n',
+            'data/laqn/monthly_data/2023_feb/TH4_PM10_2023-02-01_2023-02-28.csv': '',
+            'data/defra/2023measurements/London_Bexley/Nitrogen_dioxide__2023_01.csv':
+                'timestamp,value,station_name\n2023-01-01,4.5,"London, Bexley"\n2023-01-02,5.5,"London\nBexley"\n',
+            'data/defra/2023measurements/London_Bexley/PM10__2023_02.csv': 'timestamp,value\n2023-02-01,4\n\n\n',
+            'data/meteo/raw/monthly2023/2023-01.csv':
+                'date,temperature_2m,wind_speed_10m,surface_pressure,precipitation,relative_humidity_2m\n'
+                '2023-01-01,5,3,1010,0,80\n',
+            'data/meteo/raw/monthly2023/2023-02.csv': '\ufeffdate,temperature_2m\n2023-02-01,4\n2023-02-02,6\n',
+        }
+        for name, text in files.items():
+            path = self.base_path / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(text.encode('utf-8'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+class TestMetadataScan(InventoryTree):
+    """The metadata-only scan gives the same inventory as pd.read_csv, the stats scan adds its columns."""
+
+    def scan(self, **kwargs):
+        inventory = DataInventory(**kwargs)
+        inventory.base_path = self.base_path
+        tables = (inventory.laqn_data(), inventory.defra_data(), inventory.meteo_data())
+        return tables, inventory.generate_summary()
+
+    def test_same_as_read_csv(self):
+        (laqn, defra, meteo), summary = self.scan(stats=False, max_workers=4)
+        expected_tables, expected_summary = self.scan(stats=False, metadata_only=False, max_workers=1)
+        for table, expected in zip((laqn, defra, meteo), expected_tables):
+            pd.testing.assert_frame_equal(table, expected)
+        self.assertEqual(summary, expected_summary)
+        #the stats scan keeps the same records and adds its columns, the same with or without pd.read_csv.
+        stats_tables, stats_summary = self.scan(stats=True)
+        for table, expected in zip(stats_tables, expected_tables):
+            pd.testing.assert_frame_equal(table[expected.columns], expected)
+        self.assertEqual(stats_summary, expected_summary)
+        read_csv_tables, _ = self.scan(stats=True, metadata_only=False)
+        for table, expected in zip(read_csv_tables, stats_tables):
+            pd.testing.assert_frame_equal(table, expected)
+
+        #the empty file is reported and skipped, as pd.read_csv fails on it.
+        self.assertEqual(len(laqn), 3)
+        self.assertEqual(sorted(laqn['records']), [0, 2, 3])
+        self.assertEqual(sorted(defra['records']), [1, 2])
+        self.assertEqual(meteo.set_index('period')['complete'].to_dict(), {'2023-01': True, '2023-02': False})
+
+    def test_stats_columns(self):
+        (laqn, defra, meteo), _ = self.scan(stats=True)
+        bg1 = laqn.set_index(['site', 'period']).loc[('BG1', '2023_jan')]
+        self.assertEqual((bg1['min_time'], bg1['max_time']), ('2023-01-01 00:00:00', '2023-01-01 02:00:00'))
+        self.assertEqual((bg1['nan_count'], bg1['negative_count'], bg1['valid_hours']), (1, 0, 2))
+        self.assertAlmostEqual(bg1['coverage'], round(2 / (31 * 24), 4))
+        self.assertTrue(pd.isna(laqn.set_index(['site', 'period']).loc[('BG1', '2023_feb'), 'min_time']))
+        self.assertNotIn('flag_99', meteo.columns)
+        self.assertEqual(meteo.set_index('period').loc['2023-01', 'nan_count'], 0)
+
+        flagged = self.base_path / 'data/defra/2023measurements/London_Bexley/Ozone__2023_03.csv'
+        flagged.write_text('timestamp,value\n2023-03-01 00:00:00,-99\n2023-03-01 01:00:00,-1\n'
+                           '2023-03-01 02:00:00,-0.5\n2023-03-01 02:30:00,3\n2023-03-01 03:00:00,\n')
+        (laqn, defra, _), _ = self.scan(stats=True)
+        ozone = defra.set_index('pollutant').loc['Ozone']
+        self.assertEqual((ozone['flag_99'], ozone['flag_1'], ozone['negative_count']), (1, 1, 3))
+        self.assertEqual((ozone['nan_count'], ozone['valid_hours']), (1, 3))
+
+        inventory = DataInventory()
+        inventory.inventory['laqn'] = laqn
+        issue_rate, checked, high = inventory.high_missing_files('laqn', threshold=20)
+        self.assertEqual((checked, list(high['site'])), (2, ['BG1']))
+        self.assertEqual(high['missing_percentage'].iloc[0], 33.33)
+        self.assertEqual(inventory.high_missing_files('laqn', exclude_files={Path(high['file'].iloc[0]).name})[0], 0)
+
+    def test_csv_metadata(self):
+        records, columns = csv_metadata(self.base_path / 'data/meteo/raw/monthly2023/2023-02.csv')
+        self.assertEqual((records, columns), (2, ['date', 'temperature_2m']))
+        with self.assertRaises(pd.errors.EmptyDataError):
+            csv_metadata(self.base_path / 'data/laqn/monthly_data/2023_feb/TH4_PM10_2023-02-01_2023-02-28.csv')
+
+        #whitespace-only lines are skipped like pd.read_csv does, with and without quoted fields.
+        blank = self.base_path / 'blank.csv'
+        for data in (b'a,b\n1,2\n   \n3,4\n', b'a,b\n1,2\n\t\n', b'  \na,b\n"1",2\n \t\n3,4\n', b'a,b\n,\n1,2\n'):
+            blank.write_bytes(data)
+            df = pd.read_csv(blank)
+            self.assertEqual(csv_metadata(blank), (len(df), list(df.columns)), data)
+
+
+class TestInventoryCache(InventoryTree):
+    """A cached rerun only reads new or changed files and drops deleted ones."""
+
+    def scan(self, **kwargs):
+        kwargs.setdefault('cache_path', self.base_path / 'cache' / 'inventory.sqlite')
+        inventory = DataInventory(**kwargs)
+        inventory.base_path = self.base_path
+        tables = (inventory.laqn_data(), inventory.defra_data(), inventory.meteo_data())
+        summary = inventory.generate_summary()
+        inventory.cache.close()
+        return tables, summary, inventory.scan_counts
+
+    def test_same_as_read_csv(self):
+        tables, summary, counts = self.scan()
+        self.assertEqual(counts['laqn'], {'read': 4, 'cached': 0, 'removed': 0})
+        expected = DataInventory(metadata_only=False)
+        expected.base_path = self.base_path
+        pd.testing.assert_frame_equal(tables[0], expected.laqn_data())
+        self.assertNotIn('nan_count', tables[0].columns)
+
+        again, summary_again, counts = self.scan()
+        self.assertEqual([c['read'] for c in counts.values()], [0, 0, 0])
+        for table, table_again in zip(tables, again):
+            pd.testing.assert_frame_equal(table, table_again)
+        self.assertEqual(summary, summary_again)
+
+    def test_changed_and_deleted_files(self):
+        self.scan()
+        changed = self.base_path / 'data/laqn/monthly_data/2023_jan/BG1_NO2_2023-01-01_2023-01-31.csv'
+        with open(changed, 'a') as f:
+            f.write('2023-01-01 03:00,28.1\n')
+        (self.base_path / 'data/defra/2023measurements/London_Bexley/PM10__2023_02.csv').unlink()
+        new_file = self.base_path / 'data/meteo/raw/monthly2023/2023-03.csv'
+        new_file.write_text('date,temperature_2m\n2023-03-01,9\n')
+
+        (laqn, defra, meteo), summary, counts = self.scan()
+        self.assertEqual(counts['laqn'], {'read': 1, 'cached': 3, 'removed': 0})
+        self.assertEqual(counts['defra'], {'read': 0, 'cached': 1, 'removed': 1})
+        self.assertEqual(counts['meteo'], {'read': 1, 'cached': 2, 'removed': 0})
+        self.assertEqual(laqn.set_index('site').loc['BG1'].set_index('period').loc['2023_jan', 'records'], 4)
+        self.assertEqual(summary['defra']['total_files'], 1)
+        self.assertEqual(summary['meteo']['total_records'], 4)
+
+    def test_checksum_skips_touched_files(self):
+        self.scan(use_checksum=True)
+        touched = self.base_path / 'data/meteo/raw/monthly2023/2023-01.csv'
+        os.utime(touched, ns=(0, touched.stat().st_mtime_ns + 10**9))
+        _, _, counts = self.scan(use_checksum=True)
+        self.assertEqual(counts['meteo'], {'read': 0, 'cached': 2, 'removed': 0})
+        _, _, counts = self.scan(use_checksum=True)
+        self.assertEqual(counts['meteo']['read'], 0)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
 
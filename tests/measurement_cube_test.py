@@ -0,0 +1,105 @@
+"""Testing module for measurement_cube.py, the memory mapped wide_format matrix.
+Builds cubes from synthetic long frames and from a small LAQN columnar store in a temp dir."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_prep.columnar_store import LaqnColumnarStore
+from src.ml_prep.measurement_cube import MeasurementCube
+from tests.columnar_store_test import write_laqn_tree
+
+
+def wide_format(df, datetime_col, site_col, species_col, value_col):
+    """The notebooks' wide_format, without the prints."""
+    df = df.copy()
+    df['site_species'] = df[site_col] + '_' + df[species_col]
+    return df.pivot_table(index=datetime_col, columns='site_species', values=value_col, aggfunc='mean').sort_index()
+
+
+def long_frame():
+    """Two sites x two species over three days, with gaps, NaNs and a duplicated hour."""
+    rng = np.random.default_rng(7)
+    frames = []
+    for site in ('BG1', 'KC1'):
+        for species in ('NO2', 'O3'):
+            times = pd.date_range('2023-01-01', periods=72, freq='h')
+            values = rng.uniform(0, 80, len(times))
+            values[::9] = np.nan
+            frames.append(pd.DataFrame({'@MeasurementDateGMT': times, '@Value': values,
+                                        'SiteCode': site, 'SpeciesCode': species}))
+    df = pd.concat(frames, ignore_index=True)
+    # an hour where nothing was measured and a duplicate row that pivot_table averages.
+    df = df[df['@MeasurementDateGMT'] != pd.Timestamp('2023-01-02 05:00')]
+    duplicate = df.iloc[[3]].assign(**{'@Value': 10.0})
+    return pd.concat([df, duplicate], ignore_index=True)
+
+
+class TestMeasurementCube(unittest.TestCase):
+    """Unit tests for MeasurementCube."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = long_frame()
+        self.cube = MeasurementCube.build(self.df, Path(self.tmp.name) / 'cube', '@MeasurementDateGMT',
+                                          'SiteCode', 'SpeciesCode', '@Value')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_wide_format(self):
+        expected = wide_format(self.df, '@MeasurementDateGMT', 'SiteCode', 'SpeciesCode', '@Value')
+        self.assertEqual(self.cube.shape, (72, 4))
+        self.assertEqual(self.cube.values.dtype, np.float32)
+        self.assertIsInstance(self.cube.values, np.memmap)
+
+        df = self.cube.window(dropna=True)
+        pd.testing.assert_frame_equal(df, expected.astype(np.float32), check_freq=False)
+        # the dense axis keeps the empty hour as a NaN row.
+        self.assertTrue(self.cube.window(start='2023-01-02 05:00', end='2023-01-02 05:00').isna().all(axis=None))
+        np.testing.assert_array_equal(self.cube.mask, ~np.isnan(self.cube.values))
+
+    def test_window_and_columns(self):
+        window = self.cube.window(start='2023-01-02', end='2023-01-02 11:00', species=['O3'])
+        self.assertEqual(list(window.columns), ['BG1_O3', 'KC1_O3'])
+        self.assertEqual(len(window), 12)
+        self.assertEqual(window.index[0], pd.Timestamp('2023-01-02'))
+
+        block = self.cube.array(start='2023-01-02', end='2023-01-02 11:00')
+        self.assertIsInstance(block, np.memmap)
+        self.assertEqual(block.shape, (12, 4))
+        np.testing.assert_array_equal(self.cube.array(columns=['KC1_NO2'])[:, 0], self.cube.values[:, 2])
+        self.assertEqual(len(self.cube.window(start='2024-01-01')), 0)
+        with self.assertRaises(KeyError):
+            self.cube.window(columns=['XX1_NO2'])
+
+    def test_reopen_read_only(self):
+        reopened = MeasurementCube(self.cube.cube_dir)
+        np.testing.assert_array_equal(reopened.values, self.cube.values)
+        self.assertEqual(list(reopened.sites), ['BG1', 'BG1', 'KC1', 'KC1'])
+        with self.assertRaises(ValueError):
+            reopened.values[0, 0] = 1.0
+        with self.assertRaises(FileNotFoundError):
+            MeasurementCube(Path(self.tmp.name) / 'nowhere')
+
+    def test_from_store_matches_build(self):
+        source = Path(self.tmp.name) / 'optimised'
+        write_laqn_tree(source)
+        store = LaqnColumnarStore(Path(self.tmp.name) / 'store')
+        store.write_from_csv(source, max_workers=2)
+
+        cube = MeasurementCube.from_store(store, Path(self.tmp.name) / 'store_cube')
+        expected = MeasurementCube.build(store.read(), Path(self.tmp.name) / 'df_cube', '@MeasurementDateGMT',
+                                         'SiteCode', 'SpeciesCode', '@Value')
+        self.assertEqual(list(cube.columns), list(expected.columns))
+        pd.testing.assert_frame_equal(cube.window(), expected.window())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Testing module for model_registry.py, per-target model artifacts with a manifest."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.model_registry import CompactForest, ModelRegistry, migrate_all_models
+
+
+class TestCompactForest(unittest.TestCase):
+    """CompactForest predicts exactly what the sklearn forest does."""
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.X = rng.uniform(0, 1, (300, 20))
+        self.y = np.column_stack([self.X[:, 0] * 2 + rng.normal(0, 0.1, 300), self.X[:, 3] ** 2])
+        self.X_new = rng.uniform(0, 1, (80, 20))
+
+    def test_same_predictions(self):
+        for y in (self.y[:, 0], self.y):
+            model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=42).fit(self.X, y)
+            compact = CompactForest.from_sklearn(model)
+            self.assertEqual(compact.threshold.dtype, np.float32)
+            np.testing.assert_allclose(compact.predict(self.X_new), model.predict(self.X_new), rtol=1e-12)
+            # training points sit on either side of the thresholds, the float32 rounding must not flip them.
+            np.testing.assert_allclose(compact.predict(self.X), model.predict(self.X), rtol=1e-12)
+
+    def test_float32_values_and_save(self):
+        model = RandomForestRegressor(n_estimators=10, random_state=0).fit(self.X, self.y[:, 0])
+        compact = CompactForest.from_sklearn(model, value_dtype=np.float32)
+        np.testing.assert_allclose(compact.predict(self.X_new), model.predict(self.X_new), rtol=1e-6)
+        with tempfile.TemporaryDirectory() as tmp:
+            compact.save(Path(tmp) / 'forest.npz', compress=True)
+            loaded = CompactForest.load(Path(tmp) / 'forest.npz')
+            np.testing.assert_array_equal(loaded.predict(self.X_new), compact.predict(self.X_new))
+            joblib.dump(model, Path(tmp) / 'forest.joblib')
+            self.assertLess((Path(tmp) / 'forest.npz').stat().st_size, (Path(tmp) / 'forest.joblib').stat().st_size)
+        with self.assertRaises(ValueError):
+            compact.predict(self.X_new[:, :5])
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Unit tests for ModelRegistry."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / 'registry'
+        rng = np.random.default_rng(9)
+        self.X = rng.uniform(0, 1, (200, 6))
+        self.y = self.X[:, :3] + rng.normal(0, 0.05, (200, 3))
+        self.models = {name: RandomForestRegressor(n_estimators=5, random_state=1).fit(self.X, self.y[:, i])
+                       for i, name in enumerate(['BG1_NO2', 'KC1_O3', 'TH4_NO2'])}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_register_and_lazy_load(self):
+        registry = ModelRegistry(self.root)
+        scaler_path = Path(self.tmp.name) / 'scaler.joblib'
+        joblib.dump(MinMaxScaler().fit(self.X), scaler_path)
+        registry.set_features([f"f{i}" for i in range(6)], scaler_path)
+        registry.register('BG1_NO2', self.models['BG1_NO2'], {'target': 'BG1_NO2', 'test_r2': np.float64(0.9)})
+        registry.register('KC1_O3', self.models['KC1_O3'], compact=True)
+
+        reopened = ModelRegistry(self.root)
+        self.assertEqual(reopened.targets(), ['BG1_NO2', 'KC1_O3'])
+        self.assertEqual(reopened.targets(pollutant='O3'), ['KC1_O3'])
+        self.assertEqual(reopened.entry('BG1_NO2')['metrics'], {'test_r2': 0.9})
+        self.assertEqual(reopened.entry('KC1_O3')['kind'], 'compact')
+        self.assertEqual(len(reopened.manifest['scaler']['version']), 12)
+        self.assertIsInstance(reopened.load_scaler(), MinMaxScaler)
+
+        self.assertEqual(reopened._cache, {})
+        np.testing.assert_allclose(reopened.predict('KC1_O3', self.X[:10]), self.models['KC1_O3'].predict(self.X[:10]))
+        self.assertEqual(list(reopened._cache), ['models/KC1_O3.npz'])
+        self.assertIs(reopened.load('KC1_O3'), reopened.load('KC1_O3'))
+
+    def test_group_models(self):
+        group = RandomForestRegressor(n_estimators=5, random_state=1).fit(self.X, self.y[:, [0, 2]])
+        results = pd.DataFrame({'target': ['BG1_NO2', 'TH4_NO2'], 'test_r2': [0.8, 0.7]})
+        registry = ModelRegistry(self.root)
+        registry.register_group('NO2', group, ['BG1_NO2', 'TH4_NO2'], results)
+
+        reopened = ModelRegistry(self.root)
+        self.assertEqual(reopened.entry('TH4_NO2')['output_index'], 1)
+        self.assertEqual(reopened.entry('TH4_NO2')['metrics'], {'test_r2': 0.7})
+        np.testing.assert_allclose(reopened.predict('TH4_NO2', self.X[:5]), group.predict(self.X[:5])[:, 1])
+        self.assertEqual(len(list((self.root / 'models').iterdir())), 1)
+
+    def test_migrate_all_models(self):
+        all_models_path = Path(self.tmp.name) / 'all_rf_models.joblib'
+        joblib.dump(self.models, all_models_path)
+        results_csv = Path(self.tmp.name) / 'rf_results.csv'
+        pd.DataFrame({'target': list(self.models), 'test_r2': [0.1, 0.2, 0.3]}).to_csv(results_csv, index=False)
+
+        registry = migrate_all_models(all_models_path, self.root, results_csv, feature_names=list('abcdef'))
+        self.assertEqual(registry.targets(sites=['TH4']), ['TH4_NO2'])
+        self.assertEqual(registry.entry('KC1_O3')['metrics']['test_r2'], 0.2)
+        np.testing.assert_array_equal(ModelRegistry(self.root).predict('TH4_NO2', self.X[:3]),
+                                      self.models['TH4_NO2'].predict(self.X[:3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
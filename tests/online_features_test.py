@@ -0,0 +1,71 @@
+"""Testing module for OnlineFeatureWindow in features.py and imputation.py, the streaming model input."""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.features import TEMPORAL_COLS, FeatureSpec, OnlineFeatureWindow
+from src.ml_prep.imputation import impute_gaps
+
+
+def raw_with_gaps(hours=400, n_sites=5, seed=3):
+    """Hourly raw readings with short, medium and long gaps."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-03-01', periods=hours, freq='h')
+    cols = [f"S{i}_{'NO2' if i % 2 else 'PM10'}" for i in range(n_sites)]
+    raw = pd.DataFrame(rng.gamma(4, 8, (hours, n_sites)), index=index, columns=cols)
+    raw.iloc[50:53, 0] = np.nan
+    raw.iloc[120:140, 1] = np.nan
+    raw.iloc[200:260, 2] = np.nan
+    raw.iloc[rng.random((hours, n_sites)) < 0.05] = np.nan
+    return raw
+
+
+class TestOnlineFeatureWindow(unittest.TestCase):
+    """The streamed window equals the ml_prep imputation + scaling of the same history."""
+
+    def setUp(self):
+        self.raw = raw_with_gaps()
+        self.spec = FeatureSpec(list(self.raw.columns) + TEMPORAL_COLS, MinMaxScaler().fit(self.raw), n_past=12)
+
+    def expected_window(self, end, history):
+        recent = self.raw.iloc[max(0, end + 1 - history):end + 1]
+        #a column without any reading in the history ends up at 0, the scaled train minimum.
+        return np.nan_to_num(self.spec.transform(impute_gaps(recent))[-self.spec.n_past:], nan=0.0)
+
+    def test_stream_matches_batch_imputation(self):
+        online = OnlineFeatureWindow(self.spec, history=48)
+        for i, (timestamp, row) in enumerate(self.raw.iterrows()):
+            window = online.update(timestamp, row.to_dict())
+            if i >= 11 and i % 7 == 0:
+                np.testing.assert_allclose(window, self.expected_window(i, 48), err_msg=f"hour {i}")
+        self.assertTrue(online.ready)
+
+    def test_window_is_a_view(self):
+        online = OnlineFeatureWindow(self.spec)
+        online.extend(self.raw.iloc[:30])
+        window = online.window
+        self.assertTrue(np.shares_memory(window, online._scaled))
+        self.assertFalse(window.flags.writeable)
+        np.testing.assert_allclose(window, self.expected_window(29, online.history))
+
+    def test_skipped_hours_are_gaps(self):
+        online = OnlineFeatureWindow(self.spec, history=24)
+        online.extend(self.raw.iloc[:20])
+        values = self.raw.iloc[23].to_numpy()
+        window = online.update(self.raw.index[23], values)
+        self.assertEqual(online.count, 24)
+        self.assertTrue(np.isnan(online.raw_history[-3:-1]).all())
+        hours = window[:, self.spec.feature_names.index('hour')]
+        self.assertEqual(list(hours), list(self.raw.index[12:24].hour))
+        with self.assertRaises(ValueError):
+            online.update(self.raw.index[23], values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Testing module for pollutant_mapps.py, pollutant name normalisation and the bulk DEFRA standardisation.
+Builds a small DEFRA tree in a temp dir, the real data folders are not needed."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.data_prep.columnar_store import DefraColumnarStore
+from src.data_prep.pollutant_mapps import PollutantMapper
+from tests.columnar_store_test import write_defra_tree
+
+POLLUTANTS = ('Nitrogen dioxide', 'm,p-Xylene', 'PM2.5 Particulate')
+
+
+class TestStdDefraPollutants(unittest.TestCase):
+    """Unit tests for PollutantMapper.std_defra_pollutants and std_defra_store."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.mapper = PollutantMapper()
+        self.mapper.defra_dir = self.tmp / 'defra'
+        write_defra_tree(self.mapper.defra_dir, years=(2024,), pollutants=POLLUTANTS)
+        self.output_dir = self.tmp / 'processed'
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_same_as_pandas_rewrite(self):
+        self.assertEqual(self.mapper.std_defra_pollutants(self.output_dir, max_workers=3), 12)
+        for csv_file in sorted(self.mapper.defra_dir.glob('*measurements/*/*.csv')):
+            pollutant, date_part = csv_file.stem.split('__')
+            std_name = self.mapper.std_pollutant(pollutant)
+            expected = pd.read_csv(csv_file)
+            expected['pollutant_std'] = std_name
+            output_file = self.output_dir / csv_file.parent.parent.name / csv_file.parent.name / \
+                f"{std_name}__{date_part}.csv"
+            pd.testing.assert_frame_equal(pd.read_csv(output_file), expected)
+        self.assertEqual(list(self.output_dir.rglob('*.tmp')), [])
+
+    def test_skips_unchanged(self):
+        self.mapper.std_defra_pollutants(self.output_dir)
+        self.assertEqual(self.mapper.std_defra_pollutants(self.output_dir), 0)
+
+        #a newer source, and a quoted one that goes through pandas.
+        source = self.mapper.defra_dir / '2024measurements' / 'Camden_Kerbside' / 'Nitrogen dioxide__2024_01.csv'
+        df = pd.read_csv(source)
+        df['station_name'] = 'Camden, Kerbside'
+        df.to_csv(source, index=False)
+        os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.mapper.std_defra_pollutants(self.output_dir), 1)
+        output = pd.read_csv(self.output_dir / '2024measurements' / 'Camden_Kerbside' / 'NO2__2024_01.csv')
+        self.assertEqual(set(output['station_name']), {'Camden, Kerbside'})
+        self.assertEqual(self.mapper.std_defra_pollutants(self.output_dir, skip_unchanged=False), 12)
+
+    def test_store_has_categorical_std(self):
+        store_dir = self.tmp / 'store'
+        written = self.mapper.std_defra_store(store_dir, max_workers=2)
+        self.assertEqual(len(written), 2)
+        self.assertEqual(self.mapper.std_defra_store(store_dir), {})
+
+        df = DefraColumnarStore(store_dir).read(categorical=True)
+        self.assertEqual(set(df['pollutant_std']), {'NO2', 'm,p-Xylene', 'PM2.5'})
+        self.assertIsInstance(df['pollutant_std'].dtype, pd.CategoricalDtype)
+        pairs = df[['pollutant_name', 'pollutant_std']].astype(str).drop_duplicates()
+        self.assertTrue((pairs['pollutant_name'].map(self.mapper.std_pollutant) == pairs['pollutant_std']).all())
+
+        #a deleted source file only writes its station folder again.
+        (self.mapper.defra_dir / '2024measurements' / 'Camden_Kerbside' / 'm,p-Xylene__2024_01.csv').unlink()
+        self.assertEqual(list(self.mapper.std_defra_store(store_dir)), ['2024measurements/Camden_Kerbside'])
+
+    def test_store_updates_changed_stations_only(self):
+        store_dir = self.tmp / 'store'
+        self.mapper.std_defra_store(store_dir)
+        defra_dir = self.mapper.defra_dir
+        #a new month for one station, a new station and a station that is gone.
+        write_defra_tree(defra_dir, years=(2025,), stations=('Camden_Kerbside', 'Ealing_Horn_Lane'),
+                         pollutants=POLLUTANTS)
+        shutil.rmtree(defra_dir / '2024measurements' / 'London_Bloomsbury')
+        before = {path: path.stat().st_mtime_ns for path in store_dir.rglob('*.parquet')}
+
+        written = self.mapper.std_defra_store(store_dir)
+        self.assertEqual(sorted(written), ['2025measurements/Camden_Kerbside', '2025measurements/Ealing_Horn_Lane'])
+        after = {path: path.stat().st_mtime_ns for path in store_dir.rglob('*.parquet')}
+        kept = [path for path in before if 'Camden_Kerbside' in path.name]
+        self.assertTrue(kept and all(after[path] == before[path] for path in kept))
+        self.assertFalse(any('London_Bloomsbury' in path.name for path in after))
+
+        #same rows as a store built from scratch.
+        sort_cols = ['source_file', 'timestamp']
+        rebuilt = self.tmp / 'rebuilt'
+        self.mapper.std_defra_store(rebuilt, skip_unchanged=False)
+        expected = DefraColumnarStore(rebuilt).read().sort_values(sort_cols).reset_index(drop=True)
+        actual = DefraColumnarStore(store_dir).read().sort_values(sort_cols).reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected[actual.columns])
+        self.assertEqual(self.mapper.std_defra_store(store_dir), {})
+
+    def test_store_keeps_std_column_categorical(self):
+        #one station with a single pollutant, its batch stays categorical through the concat.
+        source_dir = self.tmp / 'single'
+        write_defra_tree(source_dir, years=(2024,), stations=('Camden_Kerbside',), pollutants=('Nitrogen dioxide',))
+        write_defra_tree(source_dir, years=(2024,), stations=('London_Bloomsbury',), pollutants=POLLUTANTS)
+        store = DefraColumnarStore(self.tmp / 'single_store')
+        store.write_from_csv(source_dir, max_workers=2, std_names=self.mapper.std_column)
+
+        types = {pq.read_schema(path).field('pollutant_std').type for path in store.store_dir.rglob('*.parquet')}
+        self.assertEqual(types, {pa.dictionary(pa.int32(), pa.string())})
+        df = store.read(categorical=True)
+        self.assertEqual(set(df['pollutant_std']), {'NO2', 'm,p-Xylene', 'PM2.5'})
+        self.assertFalse(df['pollutant_std'].isna().any())
+
+
+class TestPollutantNormaliser(unittest.TestCase):
+    """Unit tests for the canonical key lookup, the EEA vocabulary merge and std_column."""
+
+    def setUp(self):
+        self.vocab = pd.DataFrame({
+            'pollutant_name': ['Nitrogen dioxide (air)', 'Particulate matter < 10 µm (aerosol)', 'Arsenic (aerosol)',
+                               'Arsenic (precip+dry_dep)'],
+            'pollutant_code': ['NO2', 'PM10', 'As', 'As']})
+
+    def test_canonical_names(self):
+        mapper = PollutantMapper()
+        for name in ('Nitrogen dioxide', 'NITROGEN_DIOXIDE', 'nitrogen-dioxide ', 'NO2'):
+            self.assertEqual(mapper.std_pollutant(name), 'NO2')
+        self.assertEqual(mapper.std_pollutant('1.3 Butadiene'), '1,3-Butadiene')
+        self.assertEqual(mapper.std_pollutant('Arsenic'), 'Arsenic')
+        self.assertEqual(mapper.std_pollutant('Nitrogen trioxide'), 'Nitrogen trioxide')
+        self.assertEqual(PollutantMapper(fuzzy_cutoff=0.9).std_pollutant('Nitrogen dioxid'), 'NO2')
+
+    def test_formulas_keep_case(self):
+        mapper = PollutantMapper()
+        for name, std_name in (('CO', 'CO'), ('NOX', 'NOx'), ('PM 2.5', 'PM2.5'), ('Carbon monoxide', 'CO')):
+            self.assertEqual(mapper.std_pollutant(name), std_name)
+        #without a vocabulary cobalt is left alone instead of becoming carbon monoxide.
+        for name in ('Co', 'co'):
+            self.assertEqual(mapper.std_pollutant(name), name)
+
+    def test_vocab(self):
+        mapper = PollutantMapper(vocab=self.vocab)
+        self.assertEqual(mapper.std_pollutant('Nitrogen dioxide (air)'), 'NO2')
+        self.assertEqual(mapper.std_pollutant('Particulate matter < 10 µm (aerosol)'), 'PM10')
+        for name in ('Arsenic (aerosol)', 'arsenic', 'As'):
+            self.assertEqual(mapper.std_pollutant(name), 'Arsenic')
+        #hand written mappings win over the vocabulary.
+        self.assertEqual(mapper.add_vocab(pd.DataFrame({'pollutant_name': ['Ozone'], 'pollutant_code': ['X']})), 1)
+        self.assertEqual(mapper.std_pollutant('Ozone'), 'O3')
+        self.assertEqual(mapper.std_pollutant('X'), 'O3')
+
+    def test_notations_keep_case(self):
+        vocab = pd.DataFrame({'pollutant_name': ['Carbon monoxide (air)', 'Cobalt (aerosol)', 'Cobalt (precip)'],
+                              'pollutant_code': ['CO', 'Co', 'Co']})
+        mapper = PollutantMapper(vocab=vocab)
+        for name in ('Cobalt', 'Cobalt (aerosol)', 'cobalt (precip)', 'Co'):
+            self.assertEqual(mapper.std_pollutant(name), 'Cobalt')
+        for name in ('CO', 'Carbon monoxide', 'Carbon monoxide (air)'):
+            self.assertEqual(mapper.std_pollutant(name), 'CO')
+
+    def test_std_column(self):
+        mapper = PollutantMapper(vocab=self.vocab)
+        names = pd.Series(np.random.default_rng(0).choice(
+            ['Nitrogen dioxide', 'Nitrogen_dioxide', 'Ozone', 'Arsenic (aerosol)', 'Unseen'], 500),
+            index=np.arange(500) * 2, name='pollutant_name')
+        names[::7] = None
+        std = mapper.std_column(names)
+        self.assertIsInstance(std.dtype, pd.CategoricalDtype)
+        self.assertEqual(sorted(std.cat.categories), ['Arsenic', 'NO2', 'O3', 'Unseen'])
+        self.assertTrue(std.index.equals(names.index))
+        expected = names.map(mapper.std_pollutant, na_action='ignore')
+        pd.testing.assert_series_equal(std.astype(object).fillna('-'), expected.fillna('-'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import pandas as pd
 import os
 import sys
 import json
+import shutil
 import requests
 from pathlib import Path
 # Add project root to path for imports.
@@ -15,9 +16,14 @@ sys.path.insert(0, str(proj_root))
 
 
 
-from src.getData.defra_get import DefraGet, euAirPollutantVocab
+from src.getData.defra_get import DefraGet, euAirPollutantVocab, epoch_ms_to_timestamps
 from config import Config
 from io import StringIO # for CSV reading from response text.
+import tempfile
+from src.getData.rate_limiter import AdaptiveRateLimiter
+from src.getData.watermark import WatermarkStore
+from src.getData.fetch_manifest import FetchManifest
+from tests.stub_api import StubApiServer
 
 class TestDefraGet(unittest.TestCase):
     """Class to test DefraGet class functions."""
@@ -371,6 +377,248 @@ class TestDefraGet(unittest.TestCase):
                             f"Expected station directory for {sample_station} to exist in a year folder.")
         
 
+class TestDefraIncrementalFetch(unittest.TestCase):
+    """Offline test for the watermark refresh mode of fetch_all_monthly_measurements, against the local stub API."""
+
+    def setUp(self):
+        self.defra_getter = DefraGet()
+        self.defra_getter.rate_limiter = AdaptiveRateLimiter('defra-test', rate=1000, max_rate=1000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.tmp.name)
+        self.input_csv = self.base_dir / 'stations.csv'
+        pd.DataFrame({'station_name': ['London Bloomsbury'], 'pollutant_available': ['Nitrogen dioxide'],
+                      'timeseries_id': [4565.0]}).to_csv(self.input_csv, index=False)
+        self.watermarks = WatermarkStore(str(self.base_dir / 'defra.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_refresh_appends_after_watermark(self):
+        """A series with a watermark only asks for the hours after it, across the month boundary."""
+        self.watermarks.advance(WatermarkStore.key('4565'), '2025-10-31 20:00:00')
+        month_file = self.base_dir / '2025measurements' / 'London_Bloomsbury' / 'Nitrogen_dioxide__2025_10.csv'
+
+        with StubApiServer() as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, incremental=True, watermarks=self.watermarks,
+                until='2025-11-01 05:00:00', base_dir=self.base_dir)
+            first_requests = list(stub.requests)
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, incremental=True, watermarks=self.watermarks,
+                until='2025-11-01 07:00:00', base_dir=self.base_dir)
+
+        self.assertEqual([r[2] for r in first_requests],
+                         ['2025-10-31T21:00:00Z/2025-10-31T23:59:59Z', '2025-11-01T00:00:00Z/2025-11-01T05:59:59Z'])
+        self.assertEqual(stub.requests[-1][2], '2025-11-01T06:00:00Z/2025-11-01T07:59:59Z')
+        self.assertEqual(len(pd.read_csv(month_file)), 3)
+        november = pd.read_csv(month_file.with_name('Nitrogen_dioxide__2025_11.csv'))
+        self.assertEqual(len(november), 8)
+        self.assertTrue(november['timestamp'].is_unique)
+        self.assertEqual(self.watermarks.get(WatermarkStore.key('4565')), pd.Timestamp('2025-11-01 07:00:00'))
+
+    def test_failed_month_keeps_watermark(self):
+        """A failed month stops the refresh, the next run fetches it instead of leaving a gap."""
+        self.watermarks.advance(WatermarkStore.key('4565'), '2025-10-31 20:00:00')
+        args = dict(input_csv=self.input_csv, incremental=True, watermarks=self.watermarks,
+                    until='2025-11-01 05:00:00', base_dir=self.base_dir)
+
+        with StubApiServer(statuses=[500]) as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(**args)
+            self.assertEqual(stub.requests, [])
+            self.assertEqual(self.watermarks.get(WatermarkStore.key('4565')), pd.Timestamp('2025-10-31 20:00:00'))
+            self.defra_getter.fetch_all_monthly_measurements(**args)
+
+        self.assertEqual([r[2][:10] for r in stub.requests], ['2025-10-31', '2025-11-01'])
+        self.assertEqual(self.watermarks.get(WatermarkStore.key('4565')), pd.Timestamp('2025-11-01 05:00:00'))
+
+    def test_failed_backfill_month_keeps_watermark(self):
+        """Without a manifest a failed backfill month is not taken for an empty one, the watermark stays unset."""
+        station_dir = self.base_dir / '2023measurements' / 'London_Bloomsbury'
+
+        for coalesce in (False, True):
+            with self.subTest(coalesce=coalesce), StubApiServer(statuses=[500, 500, 500, 500]) as stub:
+                watermarks = WatermarkStore(str(self.base_dir / f'defra_{coalesce}.json'))
+                args = dict(input_csv=self.input_csv, years=(2023,), incremental=True, watermarks=watermarks,
+                            base_dir=self.base_dir, coalesce=coalesce)
+                self.defra_getter.rest_base_url = stub.base_url
+                self.defra_getter.fetch_all_monthly_measurements(**args)
+                self.assertIsNone(watermarks.get(WatermarkStore.key('4565')))
+                self.assertFalse((station_dir / 'Nitrogen_dioxide__2023_01.csv').exists())
+
+                #the next run is a backfill again and fills the gap.
+                self.defra_getter.fetch_all_monthly_measurements(**args)
+                self.assertTrue((station_dir / 'Nitrogen_dioxide__2023_01.csv').exists())
+                self.assertEqual(watermarks.get(WatermarkStore.key('4565')), pd.Timestamp('2023-12-31 23:00:00'))
+                shutil.rmtree(station_dir)
+
+
+class TestDefraResumableFetch(unittest.TestCase):
+    """Offline test for the fetch manifest, a rerun only retries failed or missing (timeseries_id, month) units."""
+
+    def setUp(self):
+        self.defra_getter = DefraGet()
+        self.defra_getter.rate_limiter = AdaptiveRateLimiter('defra-test', rate=1000, max_rate=1000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.tmp.name)
+        self.input_csv = self.base_dir / 'stations.csv'
+        pd.DataFrame({'station_name': ['London Bloomsbury'], 'pollutant_available': ['Nitrogen dioxide'],
+                      'timeseries_id': [4565.0]}).to_csv(self.input_csv, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rerun_retries_only_failed_units(self):
+        manifest = FetchManifest(self.base_dir / 'fetch_manifest.sqlite')
+        with StubApiServer(statuses=[500, 500, 503]) as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir, manifest=manifest)
+            self.assertEqual(manifest.summary(), {'done': 9, 'failed': 3})
+            self.assertEqual([u[1] for u in manifest.failed_units()], ['2023_01', '2023_02', '2023_03'])
+
+            #a done unit whose file went missing goes back to the queue too.
+            os.remove(self.base_dir / '2023measurements' / 'London_Bloomsbury' / 'Nitrogen_dioxide__2023_12.csv')
+            first_run_requests = len(stub.requests)
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir, manifest=manifest)
+            retried = [r[2][:7] for r in stub.requests[first_run_requests:]]
+
+        #the stub only logs requests it answered with 200.
+        self.assertEqual(first_run_requests, 9)
+        self.assertEqual(retried, ['2023-01', '2023-02', '2023-03', '2023-12'])
+        self.assertEqual(manifest.summary(), {'done': 12})
+        unit = manifest.get('4565', '2023_02')
+        self.assertEqual(unit['rows'], 28 * 24)
+        self.assertEqual(unit['attempts'], 2)
+        self.assertTrue(manifest.verify('4565', '2023_02'))
+
+    def test_cut_short_month_is_refetched(self):
+        """2025_11 stops at the 9th, it stays partial and is asked for again, no manifest without resume."""
+        with StubApiServer() as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2025,), base_dir=self.base_dir)
+            self.assertFalse((self.base_dir / 'fetch_manifest.sqlite').exists())
+
+            manifest = FetchManifest(self.base_dir / 'fetch_manifest.sqlite')
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2025,), base_dir=self.base_dir, manifest=manifest)
+            first_run_requests = len(stub.requests)
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2025,), base_dir=self.base_dir, manifest=manifest)
+
+        self.assertEqual(manifest.summary(), {'done': 10, 'partial': 1})
+        self.assertEqual([r[2][:7] for r in stub.requests[first_run_requests:]], ['2025-11'])
+
+
+class TestDefraParallelFetch(unittest.TestCase):
+    """Offline test for the concurrent fetch mode, same files as the sequential loop with bounded requests in flight."""
+
+    def setUp(self):
+        self.defra_getter = DefraGet()
+        self.defra_getter.rate_limiter = AdaptiveRateLimiter('defra-test', rate=1000, max_rate=1000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.tmp.name)
+        self.input_csv = self.base_dir / 'stations.csv'
+        pd.DataFrame({'station_name': ['London Bloomsbury', 'London Marylebone Road'],
+                      'pollutant_available': ['Nitrogen dioxide', 'Ozone'],
+                      'timeseries_id': [4565.0, 4570.0]}).to_csv(self.input_csv, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parallel_matches_sequential(self):
+        with StubApiServer(latency=0.05) as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir / 'sequential', resume=False)
+            sequential_peak = stub.max_in_flight
+            stub.max_in_flight = 0
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir / 'parallel', resume=False,
+                max_workers=8, max_per_host=3)
+            parallel_peak = stub.max_in_flight
+
+        self.assertEqual(sequential_peak, 1)
+        self.assertEqual(parallel_peak, 3)
+        sequential_files = sorted(p.relative_to(self.base_dir / 'sequential')
+                                  for p in (self.base_dir / 'sequential').rglob('*.csv'))
+        parallel_files = sorted(p.relative_to(self.base_dir / 'parallel')
+                                for p in (self.base_dir / 'parallel').rglob('*.csv'))
+        self.assertEqual(len(sequential_files), 24)
+        self.assert_same_files('sequential', 'parallel')
+
+    def assert_same_files(self, left, right):
+        left_files = sorted(p.relative_to(self.base_dir / left) for p in (self.base_dir / left).rglob('*.csv'))
+        right_files = sorted(p.relative_to(self.base_dir / right) for p in (self.base_dir / right).rglob('*.csv'))
+        self.assertEqual(left_files, right_files)
+        for rel in left_files:
+            pd.testing.assert_frame_equal(pd.read_csv(self.base_dir / left / rel),
+                                          pd.read_csv(self.base_dir / right / rel))
+
+    def test_coalesced_spans_split_into_monthly_files(self):
+        """A year per request when the API takes it, same monthly files as one request per month."""
+        with StubApiServer() as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023, 2025), base_dir=self.base_dir / 'monthly', resume=False)
+            monthly_requests = len(stub.requests)
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023, 2025), base_dir=self.base_dir / 'coalesced', coalesce=True)
+
+        self.assertEqual(monthly_requests, 2 * (12 + 11))
+        self.assertEqual(len(stub.requests) - monthly_requests, 4)
+        self.assert_same_files('monthly', 'coalesced')
+
+    def test_coalesced_falls_back_to_smaller_spans(self):
+        """The API refuses spans over 100 days: year -> quarters, and the next series starts at quarters."""
+        with StubApiServer(max_defra_days=100) as stub:
+            self.defra_getter.rest_base_url = stub.base_url
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir / 'monthly', resume=False)
+            monthly_requests = len(stub.requests)
+            self.defra_getter.fetch_all_monthly_measurements(
+                input_csv=self.input_csv, years=(2023,), base_dir=self.base_dir / 'coalesced', coalesce=True)
+
+        #the stub logs the refused year span too: 1 refused year + 4 quarters, then 4 quarters.
+        self.assertEqual(len(stub.requests) - monthly_requests, 9)
+        self.assertEqual(self.defra_getter.span_months, 3)
+        self.assert_same_files('monthly', 'coalesced')
+
+
+class TestDefraTimestampConversion(unittest.TestCase):
+    """Offline tests for the vectorized epoch-ms conversion used by get_timeseries_data."""
+
+    def test_matches_per_row_conversion(self):
+        """Same strings as the old datetime.fromtimestamp/strftime per row, bad values become None."""
+        from datetime import datetime, timezone
+        raw = pd.Series([1672531200000, 1672534800000, "1672538400000", 1700000000123, "n/a", None], name="timestamp")
+        expected = [datetime.fromtimestamp(int(v) / 1000.0, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                    for v in raw[:4]] + [None, None]
+        self.assertEqual(epoch_ms_to_timestamps(raw).tolist(), expected)
+
+    def test_datetime_dtype(self):
+        converted = epoch_ms_to_timestamps(pd.Series([1672531200000, "n/a"]), dtype="datetime")
+        self.assertEqual(str(converted.dtype), "datetime64[ns, UTC]")
+        self.assertEqual(converted[0], pd.Timestamp("2023-01-01", tz="UTC"))
+        self.assertTrue(pd.isna(converted[1]))
+
+    def test_get_timeseries_data_typed_timestamps(self):
+        defra_getter = DefraGet()
+        defra_getter.rate_limiter = AdaptiveRateLimiter('defra-test', rate=1000, max_rate=1000)
+        timespan = "2023-01-01T00:00:00Z/2023-01-31T23:59:59Z"
+        with StubApiServer() as stub:
+            defra_getter.rest_base_url = stub.base_url
+            as_text = defra_getter.get_timeseries_data("4565", timespan=timespan)
+            typed = defra_getter.get_timeseries_data("4565", timespan=timespan, timestamp_dtype="datetime")
+
+        self.assertEqual(as_text["timestamp"].iloc[-1], "2023-01-31 23:00:00")
+        self.assertEqual(str(typed["timestamp"].dtype), "datetime64[ns, UTC]")
+        self.assertTrue((typed["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S") == as_text["timestamp"]).all())
+
+
 class TestEUAirPollutantVocab(unittest.TestCase):
     """Class to test fetching and parsing EU pollutant vocabulary CSV."""
 
@@ -0,0 +1,104 @@
+"""Testing file for laqn_stream.py, the streaming RawAQData decoder used by laqnGet(stream=True).
+Runs offline on payloads from the local stub API.
+"""
+
+import json
+import os
+import sys
+import tracemalloc
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.getData.laqn_get import laqnGet
+from src.getData.laqn_stream import parse_raw_aq_stream
+from src.getData.rate_limiter import AdaptiveRateLimiter
+from tests.stub_api import StubApiServer
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestRawAQStreamParser(unittest.TestCase):
+    """Class to test RawAQStreamParser against the response.json() + DataFrame path."""
+
+    def setUp(self):
+        self.payload = StubApiServer().laqn_payload('BG1', 'NO2', '2023-01-01', '2023-01-31')
+        self.body = json.dumps(self.payload).encode('utf-8')
+
+    def test_same_records_as_json_path(self):
+        """Typed columns hold the same data as DataFrame(raw_data), whatever the chunk boundaries."""
+        expected = pd.DataFrame(self.payload['RawAQData']['Data'])
+        for size in (1, 13, 1024, len(self.body)):
+            df = parse_raw_aq_stream(chunked(self.body, size))
+            self.assertEqual(len(df), 744)
+            self.assertEqual(str(df['@MeasurementDateGMT'].dtype), 'datetime64[ns]')
+            self.assertEqual(df['@Value'].dtype, np.float64)
+            self.assertEqual(df['@SiteCode'].dtype, 'category')
+            self.assertEqual(list(df['@SiteCode'].cat.categories), ['BG1'])
+            self.assertEqual(list(df['@MeasurementDateGMT'].dt.strftime('%Y-%m-%d %H:%M:%S')),
+                             list(expected['@MeasurementDateGMT']))
+            expected_values = pd.to_numeric(expected['@Value'].replace('', np.nan))
+            np.testing.assert_array_equal(df['@Value'].to_numpy(), expected_values.to_numpy())
+
+    def test_single_record_dict(self):
+        body = b'{"RawAQData": {"@SiteCode": "KC1", "@SpeciesCode": "O3", ' \
+               b'"Data": {"@MeasurementDateGMT": "2023-01-01 00:00:00", "@Value": "41.2"}}}'
+        df = parse_raw_aq_stream(chunked(body, 7))
+        self.assertEqual(len(df), 1)
+        self.assertEqual(df['@SpeciesCode'][0], 'O3')
+        self.assertAlmostEqual(df['@Value'][0], 41.2)
+
+    def test_no_data_and_truncated_bodies(self):
+        self.assertTrue(parse_raw_aq_stream([b'{"RawAQData": {"@SiteCode": "KC1", "Data": []}}']).empty)
+        self.assertTrue(parse_raw_aq_stream([b'{"error": "no such site"}']).empty)
+        with self.assertRaises(ValueError):
+            parse_raw_aq_stream([self.body[:len(self.body) // 2]])
+
+    def test_lower_peak_memory(self):
+        """A year of one pair: streaming in 16 KB chunks peaks well below json() + DataFrame."""
+        payload = StubApiServer().laqn_payload('BG1', 'NO2', '2023-01-01', '2023-12-31')
+        body = json.dumps(payload).encode('utf-8')
+
+        def peak(fn):
+            tracemalloc.start()
+            fn()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak_bytes
+
+        json_peak = peak(lambda: pd.DataFrame(json.loads(body)['RawAQData']['Data']))
+        stream_peak = peak(lambda: parse_raw_aq_stream(body[i:i + 16384] for i in range(0, len(body), 16384)))
+        print(f"Peak memory, json: {json_peak / 1e6:.1f} MB, stream: {stream_peak / 1e6:.1f} MB")
+        self.assertLess(stream_peak, json_peak / 2)
+
+
+class TestLaqnStreamFetch(unittest.TestCase):
+    """parallel_fetch_hourly_data(stream=True) against the local stub API."""
+
+    def test_stream_fetch_matches_json_fetch(self):
+        laqn_getter = laqnGet()
+        laqn_getter.rate_limiter = AdaptiveRateLimiter('laqn-test', rate=1000, max_rate=1000)
+        pairs_csv = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'laqn', 'actv_sites_species.csv')
+
+        with StubApiServer() as stub:
+            laqn_getter.config.get_hourly_data = stub.laqn_url
+            plain = laqn_getter.parallel_fetch_hourly_data("2023-01-01T00:00:00", "2023-01-02T23:59:59",
+                                                           sites_species_csv=pairs_csv)
+            streamed = laqn_getter.parallel_fetch_hourly_data("2023-01-01T00:00:00", "2023-01-02T23:59:59",
+                                                              sites_species_csv=pairs_csv, stream=True)
+
+        self.assertEqual(set(plain), set(streamed))
+        for (site, species), df in streamed.items():
+            self.assertEqual(df['@SiteCode'].unique().tolist(), [site])
+            self.assertEqual(df['@SpeciesCode'].unique().tolist(), [species])
+            expected = pd.to_numeric(plain[(site, species)]['@Value'].replace('', np.nan))
+            np.testing.assert_array_equal(df['@Value'].to_numpy(), expected.to_numpy())
+
+
+if __name__ == '__main__':
+    unittest.main()
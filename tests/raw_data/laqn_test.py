@@ -12,12 +12,16 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Df returns jaSON response from laqn API, so i need to parse JSON response as csv DataFrame.
 import json
+import tempfile
 #date formatting imports below for ISO format date parsing.
 from dateutil.parser import isoparse
 
 # Importing the laqnGet class from laqn_get.py file.
 from src.getData.laqn_get import laqnGet
+from src.getData.rate_limiter import AdaptiveRateLimiter
+from src.getData.watermark import WatermarkStore
 from config import Config
+from tests.stub_api import StubApiServer
 
 
 # creating a class to test laqnGet class function below.
@@ -181,6 +185,132 @@ class TestLaqnGet(unittest.TestCase):
         self.assertIsInstance(all_results, dict)
         self.assertGreater(len(all_results), 0, "No months fetched successfully")
 
+class TestLaqnAsyncFetch(unittest.TestCase):
+    """Offline tests for the async fetch mode, run against the local stub API instead of api.erg.ic.ac.uk."""
+
+    def setUp(self):
+        self.laqn_getter = laqnGet()
+        #the stub never throttles, don't let the shared limiter's slow start stretch the test.
+        self.laqn_getter.rate_limiter = AdaptiveRateLimiter('laqn-test', rate=1000, max_rate=1000)
+        self.start_date = "2023-01-01T00:00:00"
+        self.end_date = "2023-01-02T23:59:59"
+        self.pairs_csv = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'laqn', 'actv_sites_species.csv')
+
+    def test_async_matches_threaded_results(self):
+        """Async fetch returns the same {(site, species): DataFrame} as parallel_fetch_hourly_data."""
+        with StubApiServer(latency=0.02) as stub:
+            self.laqn_getter.config.get_hourly_data = stub.laqn_url
+
+            threaded = self.laqn_getter.parallel_fetch_hourly_data(
+                self.start_date, self.end_date, max_workers=8, sleep_sec=0,
+                sites_species_csv=self.pairs_csv)
+            async_results = self.laqn_getter.async_fetch_hourly_data(
+                self.start_date, self.end_date, max_concurrency=64, requests_per_sec=None,
+                sites_species_csv=self.pairs_csv)
+
+        self.assertEqual(set(threaded), set(async_results))
+        self.assertGreater(len(async_results), 0)
+        for key, df in threaded.items():
+            pd.testing.assert_frame_equal(df, async_results[key])
+
+    def test_async_holds_many_requests_in_flight(self):
+        """With slow responses the concurrency cap, not a thread count, decides requests in flight."""
+        with StubApiServer(latency=0.3) as stub:
+            self.laqn_getter.config.get_hourly_data = stub.laqn_url
+            results = self.laqn_getter.async_fetch_hourly_data(
+                self.start_date, self.end_date, max_concurrency=100, requests_per_sec=None,
+                sites_species_csv=self.pairs_csv)
+            max_in_flight = stub.max_in_flight
+
+        print(f"Max requests in flight: {max_in_flight}")
+        self.assertGreater(max_in_flight, 8)
+        self.assertLessEqual(max_in_flight, 100)
+        self.assertGreater(len(results), 0)
+
+    def test_async_rate_budget(self):
+        """The shared rate budget holds the whole run under requests_per_sec."""
+        with StubApiServer() as stub:
+            self.laqn_getter.config.get_hourly_data = stub.laqn_url
+            start = time.time()
+            results = self.laqn_getter.async_fetch_hourly_data(
+                self.start_date, self.end_date, max_concurrency=64, requests_per_sec=200,
+                sites_species_csv=self.pairs_csv)
+            elapsed = time.time() - start
+
+        # burst of 200 then 200 req/s, so ~250 pairs can't finish in much under a quarter second.
+        self.assertGreater(elapsed, (len(stub.requests) - 200) / 200 * 0.8)
+        self.assertEqual(len(results), len(stub.requests))
+
+
+class TestLaqnIncrementalFetch(unittest.TestCase):
+    """Offline tests for the watermark refresh mode of helper_fetch_hourly_data / parallel_fetch_hourly_data."""
+
+    def setUp(self):
+        self.laqn_getter = laqnGet()
+        self.laqn_getter.rate_limiter = AdaptiveRateLimiter('laqn-test', rate=1000, max_rate=1000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.save_dir = self.tmp.name
+        self.watermarks = WatermarkStore(os.path.join(self.tmp.name, 'laqn.json'))
+        #two pairs are enough, the refresh logic is per pair.
+        pairs = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'laqn', 'actv_sites_species.csv'))
+        self.pairs_csv = os.path.join(self.tmp.name, 'pairs.csv')
+        pairs.head(2).to_csv(self.pairs_csv, index=False)
+        self.keys = [tuple(k) for k in pairs.head(2)[['SiteCode', 'SpeciesCode']].values]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_refresh_only_requests_new_hours(self):
+        """Second run starts at the watermark day, appends only new hours and moves the watermark."""
+        with StubApiServer() as stub:
+            self.laqn_getter.config.get_hourly_data = stub.laqn_url
+            first = self.laqn_getter.helper_fetch_hourly_data(
+                "2023-01-01T00:00:00", "2023-01-02T23:59:59", save_dir=self.save_dir, incremental=True,
+                watermarks=self.watermarks, sites_species_csv=self.pairs_csv)
+            second = self.laqn_getter.parallel_fetch_hourly_data(
+                "2023-01-01T00:00:00", "2023-01-04T23:59:59", save_dir=self.save_dir, incremental=True,
+                watermarks=self.watermarks, sites_species_csv=self.pairs_csv, max_workers=2)
+            requested_starts = [r[3] for r in stub.requests]
+
+        self.assertEqual(requested_starts, ['2023-01-01'] * 2 + ['2023-01-03'] * 2)
+        for site, species in self.keys:
+            self.assertEqual(len(first[(site, species)]), 48)
+            self.assertEqual(len(second[(site, species)]), 48)
+            stored = pd.read_csv(os.path.join(self.save_dir, f"{site}_{species}.csv"))
+            self.assertEqual(len(stored), 96)
+            self.assertTrue(stored['@MeasurementDateGMT'].is_unique)
+            self.assertEqual(self.watermarks.get(WatermarkStore.key(site, species)),
+                             pd.Timestamp("2023-01-04 23:00:00"))
+
+    def test_up_to_date_pairs_are_skipped(self):
+        """Pairs whose watermark already covers end_date don't hit the API."""
+        for site, species in self.keys:
+            self.watermarks.advance(WatermarkStore.key(site, species), "2023-01-02 23:00:00")
+        with StubApiServer() as stub:
+            self.laqn_getter.config.get_hourly_data = stub.laqn_url
+            results = self.laqn_getter.helper_fetch_hourly_data(
+                "2023-01-01T00:00:00", "2023-01-02T23:59:59", save_dir=self.save_dir, incremental=True,
+                watermarks=self.watermarks, sites_species_csv=self.pairs_csv)
+        self.assertEqual(stub.requests, [])
+        self.assertEqual(results, {})
+
+    def test_trailing_empty_hours_are_fetched_again(self):
+        """Hours the API lists without a value yet don't move the watermark."""
+        from src.getData.watermark import rows_after_watermark
+        df = pd.DataFrame({'@MeasurementDateGMT': ['2023-01-01 00:00:00', '2023-01-01 01:00:00',
+                                                   '2023-01-01 02:00:00', '2023-01-01 03:00:00'],
+                           '@Value': ['1.0', '', '2.0', '']})
+        rows, watermark = rows_after_watermark(df, '@MeasurementDateGMT', pd.Timestamp('2023-01-01 00:00:00'), '@Value')
+        self.assertEqual(list(rows['@Value']), ['', '2.0'])
+        self.assertEqual(watermark, pd.Timestamp('2023-01-01 02:00:00'))
+
+    def test_incremental_needs_save_dir(self):
+        with self.assertRaises(ValueError):
+            self.laqn_getter.helper_fetch_hourly_data("2023-01-01T00:00:00", "2023-01-02T23:59:59",
+                                                      incremental=True, watermarks=self.watermarks,
+                                                      sites_species_csv=self.pairs_csv)
+
+
 if __name__ == '__main__':
     unittest.main()
     print("Testing for get_sites_species function is completed.") 
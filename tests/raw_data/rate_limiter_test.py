@@ -0,0 +1,117 @@
+"""Testing file for rate_limiter.py, the adaptive token bucket shared by the LAQN, DEFRA and Open-Meteo clients.
+Runs offline, the DEFRA case goes through the local stub API.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.getData.rate_limiter import AdaptiveRateLimiter, get_rate_limiter
+from src.getData.defra_get import DefraGet
+from src.getData.laqn_get import laqnGet
+from tests.stub_api import StubApiServer
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    """Class to test AdaptiveRateLimiter and the shared registry."""
+
+    def test_fixed_rate_is_enforced(self):
+        """After the burst, acquire paces requests at `rate` per second."""
+        limiter = AdaptiveRateLimiter('test', rate=50, burst=1, adaptive=False)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        elapsed = time.monotonic() - start
+        # 1 from the burst, 10 more at 50/s -> ~0.2 s
+        self.assertGreater(elapsed, 0.15)
+        self.assertLess(elapsed, 1.0)
+
+    def test_async_acquire_shares_the_bucket(self):
+        """Coroutines draw from the same bucket as threads."""
+        limiter = AdaptiveRateLimiter('test', rate=100, burst=1, adaptive=False)
+
+        async def run():
+            await asyncio.gather(*[limiter.acquire_async() for _ in range(21)])
+
+        start = time.monotonic()
+        asyncio.run(run())
+        self.assertGreater(time.monotonic() - start, 0.15)
+
+    def test_healthy_responses_speed_up(self):
+        """Fast 200s push the rate up, capped at max_rate."""
+        limiter = AdaptiveRateLimiter('test', rate=5, max_rate=8, increase=1.0)
+        for _ in range(200):
+            limiter.record(200, 0.05)
+        self.assertAlmostEqual(limiter.rate, 8)
+
+    def test_throttling_backs_off(self):
+        """429 and 5xx halve the rate, but only once per cooldown."""
+        limiter = AdaptiveRateLimiter('test', rate=10, min_rate=1, cooldown=60)
+        limiter.record(429, 0.1)
+        self.assertAlmostEqual(limiter.rate, 5)
+        limiter.record(503, 0.1)
+        self.assertAlmostEqual(limiter.rate, 5, msg="second failure inside the cooldown should not cut again")
+        self.assertEqual(limiter.stats()['throttled'], 1)
+        self.assertEqual(limiter.stats()['errors'], 1)
+
+        limiter.last_decrease -= 61
+        limiter.record(None, 30.0)
+        self.assertAlmostEqual(limiter.rate, 2.5)
+
+    def test_client_errors_keep_the_rate(self):
+        """400/404/413 are errors but neither speed up nor slow down the limiter."""
+        limiter = AdaptiveRateLimiter('test', rate=10, cooldown=0)
+        for status in (400, 404, 413):
+            limiter.record(status, 0.05)
+        self.assertAlmostEqual(limiter.rate, 10)
+        self.assertEqual(limiter.stats()['errors'], 3)
+        self.assertEqual(limiter.stats()['ok'], 0)
+
+    def test_rising_latency_slows_down(self):
+        """Latency well above the best seen slows the limiter down before the API throttles."""
+        limiter = AdaptiveRateLimiter('test', rate=10, cooldown=0)
+        for _ in range(20):
+            limiter.record(200, 0.05)
+        peak = limiter.rate
+        for _ in range(20):
+            limiter.record(200, 1.0)
+        self.assertLess(limiter.rate, peak)
+
+    def test_retry_after_blocks(self):
+        """Retry-After holds every caller back for that long."""
+        limiter = AdaptiveRateLimiter('test', rate=1000)
+        limiter.record(429, 0.01, retry_after='0.3')
+        start = time.monotonic()
+        limiter.acquire()
+        self.assertGreater(time.monotonic() - start, 0.25)
+
+    def test_registry_is_shared(self):
+        """All clients of one API share one limiter, different APIs get their own."""
+        self.assertIs(get_rate_limiter('defra'), DefraGet().rate_limiter)
+        self.assertIs(laqnGet().rate_limiter, laqnGet().rate_limiter)
+        self.assertIsNot(get_rate_limiter('laqn'), get_rate_limiter('defra'))
+
+    def test_defra_client_reports_throttling(self):
+        """DefraGet requests go through the limiter, a 429 from the API lowers its rate."""
+        defra_getter = DefraGet()
+        defra_getter.rate_limiter = AdaptiveRateLimiter('defra-test', rate=20, cooldown=0)
+
+        with StubApiServer(statuses=[429]) as stub:
+            defra_getter.rest_base_url = stub.base_url
+            timespan = "2023-01-01T00:00:00Z/2023-01-01T23:59:59Z"
+            first = defra_getter.get_timeseries_data("4565", timespan=timespan)
+            throttled_rate = defra_getter.rate_limiter.rate
+            second = defra_getter.get_timeseries_data("4565", timespan=timespan)
+
+        self.assertTrue(first.empty)
+        self.assertEqual(len(second), 24)
+        self.assertLess(throttled_rate, 20)
+        self.assertEqual(defra_getter.rate_limiter.stats()['throttled'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
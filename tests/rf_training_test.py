@@ -0,0 +1,116 @@
+"""Testing module for rf_training.py, the process-parallel per-target Random Forest driver."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.rf_training import share_array, train_rf_pollutant_groups, train_rf_targets
+from src.ml_prep.sequences import flatten_sequences
+
+PARAMS = {
+    'NO2': {'n_estimators': 10, 'max_depth': 5, 'min_samples_leaf': 2, 'min_samples_split': 5},
+    'O3': {'n_estimators': 8, 'max_depth': 4, 'min_samples_leaf': 1, 'min_samples_split': 2},
+}
+
+
+def splits(n_features=4, n_past=3):
+    """Flattened train/val/test splits of a small random scaled matrix."""
+    data = np.random.default_rng(2).uniform(0, 1, (260, n_features))
+    out = []
+    for part in (data[:160], data[160:210], data[210:]):
+        out.extend(flatten_sequences(part, n_past=n_past))
+    return out
+
+
+class TestRfTraining(unittest.TestCase):
+    """Unit tests for train_rf_targets."""
+
+    def setUp(self):
+        self.arrays = splits()
+        self.target_names = ['BG1_NO2', 'KC1_O3', 'TH4_NO2']
+        self.target_mapping = {'BG1_NO2': 0, 'KC1_O3': 1, 'TH4_NO2': 3}
+
+    def test_matches_sequential_loop(self):
+        X_train, y_train, X_val, y_val, X_test, y_test = self.arrays
+        results, models = train_rf_targets(*self.arrays, self.target_names, self.target_mapping, PARAMS,
+                                           max_workers=2)
+        self.assertEqual(list(results['target']), self.target_names)
+        self.assertEqual(list(results['site']), ['BG1', 'KC1', 'TH4'])
+        for column in ('train_r2', 'val_rmse', 'test_mae', 'n_estimators', 'max_depth', 'train_time'):
+            self.assertIn(column, results.columns)
+
+        # the notebooks' loop, one forest at a time on the in-memory arrays.
+        for target_name in self.target_names:
+            idx = self.target_mapping[target_name]
+            params = dict(PARAMS[target_name.rsplit('_', 1)[1]], n_jobs=1, random_state=42)
+            rf = RandomForestRegressor(**params).fit(X_train, y_train[:, idx])
+            row = results.set_index('target').loc[target_name]
+            self.assertAlmostEqual(row['test_r2'], r2_score(y_test[:, idx], rf.predict(X_test)))
+            np.testing.assert_allclose(models[target_name].predict(X_val.astype(np.float32)), rf.predict(X_val))
+
+    def test_models_saved_per_target(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            results, models = train_rf_targets(*self.arrays, self.target_names[:2], self.target_mapping, PARAMS,
+                                               max_workers=2, model_dir=Path(tmp) / 'models')
+            self.assertEqual(models['KC1_O3'], str(Path(tmp) / 'models' / 'KC1_O3.joblib'))
+            model = joblib.load(models['KC1_O3'])
+            self.assertEqual(model.n_estimators, 8)
+            self.assertEqual(len(results), 2)
+
+    def test_share_array(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / 'X.npy'
+            np.save(source, self.arrays[0])
+            shared = share_array(source, Path(tmp) / 'X32.npy', chunk_rows=7)
+            mapped = np.load(shared, mmap_mode='r')
+            self.assertEqual(mapped.dtype, np.float32)
+            np.testing.assert_array_equal(mapped, self.arrays[0].astype(np.float32))
+            # already float32, reused without a copy.
+            self.assertEqual(share_array(shared, Path(tmp) / 'again.npy'), shared)
+
+
+class TestRfPollutantGroups(unittest.TestCase):
+    """Unit tests for the multi-output mode, one forest per pollutant."""
+
+    def setUp(self):
+        self.arrays = splits()
+        self.target_names = ['BG1_NO2', 'KC1_O3', 'TH4_NO2']
+        self.target_mapping = {'BG1_NO2': 0, 'KC1_O3': 1, 'TH4_NO2': 3}
+
+    def test_groups_match_multi_output_forest(self):
+        X_train, y_train, X_val, y_val, X_test, y_test = self.arrays
+        feature_names = [f"f{i}" for i in range(X_train.shape[1])]
+        results, models, groups, importances = train_rf_pollutant_groups(
+            *self.arrays, self.target_names, self.target_mapping, PARAMS, max_workers=2,
+            feature_names=feature_names)
+
+        self.assertEqual(groups, {'NO2': ['BG1_NO2', 'TH4_NO2'], 'O3': ['KC1_O3']})
+        self.assertEqual(sorted(models), ['NO2', 'O3'])
+        self.assertEqual(list(results['target']), self.target_names)
+        self.assertEqual(list(results['model_group']), ['NO2', 'O3', 'NO2'])
+        self.assertEqual(list(importances.columns), feature_names)
+        np.testing.assert_allclose(importances.sum(axis=1), 1.0)
+
+        rf = RandomForestRegressor(**PARAMS['NO2'], random_state=42).fit(X_train, y_train[:, [0, 3]])
+        y_pred = rf.predict(X_test)
+        row = results.set_index('target').loc['TH4_NO2']
+        self.assertAlmostEqual(row['test_r2'], r2_score(y_test[:, 3], y_pred[:, 1]))
+        np.testing.assert_allclose(models['NO2'].predict(X_test.astype(np.float32)), y_pred)
+        # single site group, a plain 1D forest.
+        self.assertEqual(models['O3'].n_outputs_, 1)
+
+    def test_no_targets(self):
+        with self.assertRaises(ValueError):
+            train_rf_pollutant_groups(*self.arrays, [], {}, PARAMS)
+
+
+if __name__ == '__main__':
+    unittest.main()
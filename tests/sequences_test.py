@@ -0,0 +1,93 @@
+"""Testing module for sequences.py, checked against the notebooks' create_sequences and flatten_rf."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ml_prep.sequences import batch_sequences, create_sequences, flatten_sequences, n_sequences
+
+
+def notebook_create_sequences(data, n_past=12, n_future=1):
+    """create_sequences from the ml_prep notebooks, without the prints."""
+    X, y = [], []
+    for i in range(n_past, len(data) - n_future + 1):
+        X.append(data[i - n_past:i])
+        y.append(data[i + n_future - 1])
+    return np.array(X), np.array(y)
+
+
+def flatten_rf(X):
+    return X.reshape(X.shape[0], -1)
+
+
+class TestSequences(unittest.TestCase):
+    """Unit tests for the sequence builders."""
+
+    def setUp(self):
+        self.data = np.random.default_rng(3).uniform(0, 1, (200, 7)).astype(np.float32)
+
+    def test_views_match_notebook(self):
+        for n_past, n_future in ((12, 1), (5, 3), (1, 1)):
+            X, y = create_sequences(self.data, n_past, n_future)
+            X_expected, y_expected = notebook_create_sequences(self.data, n_past, n_future)
+            np.testing.assert_array_equal(X, X_expected)
+            np.testing.assert_array_equal(y, y_expected)
+            self.assertEqual(len(X), n_sequences(len(self.data), n_past, n_future))
+
+        X, y = create_sequences(self.data)
+        self.assertTrue(np.shares_memory(X, self.data))
+        self.assertTrue(np.shares_memory(y, self.data))
+        with self.assertRaises(ValueError):
+            X[0, 0, 0] = 1.0
+        with self.assertRaises(ValueError):
+            y[0, 0] = 1.0
+
+    def test_dataframe_and_short_input(self):
+        X, y = create_sequences(pd.DataFrame(self.data))
+        self.assertEqual(X.shape, (188, 12, 7))
+        X, y = create_sequences(self.data[:10])
+        self.assertEqual(X.shape, (0, 12, 7))
+        self.assertEqual(y.shape, (0, 7))
+        with self.assertRaises(ValueError):
+            create_sequences(self.data[:, 0])
+
+    def test_batches(self):
+        X_expected, y_expected = notebook_create_sequences(self.data)
+        batches = list(batch_sequences(self.data, batch_size=50))
+        self.assertEqual([len(X) for X, _ in batches], [50, 50, 50, 38])
+        np.testing.assert_array_equal(np.concatenate([X for X, _ in batches]), X_expected)
+        np.testing.assert_array_equal(np.concatenate([y for _, y in batches]), y_expected)
+
+        shuffled = list(batch_sequences(self.data, batch_size=64, shuffle=True, seed=1))
+        X_shuffled = np.concatenate([X for X, _ in shuffled])
+        y_shuffled = np.concatenate([y for _, y in shuffled])
+        order = np.random.default_rng(1).permutation(len(X_expected))
+        np.testing.assert_array_equal(X_shuffled, X_expected[order])
+        np.testing.assert_array_equal(y_shuffled, y_expected[order])
+
+        subset = list(batch_sequences(self.data, batch_size=8, indices=[0, 5, 187]))
+        np.testing.assert_array_equal(subset[0][0], X_expected[[0, 5, 187]])
+
+    def test_flatten_matches_flatten_rf(self):
+        X_expected, y_expected = notebook_create_sequences(self.data)
+        X_rf, y = flatten_sequences(self.data)
+        np.testing.assert_array_equal(X_rf, flatten_rf(X_expected))
+        np.testing.assert_array_equal(y, y_expected)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'rf' / 'X_train_rf.npy'
+            X_mm, _ = flatten_sequences(self.data.astype(np.float64), path=path, dtype=np.float32)
+            self.assertIsInstance(X_mm, np.memmap)
+            self.assertEqual(X_mm.dtype, np.float32)
+            np.testing.assert_array_equal(np.load(path, mmap_mode='r'), flatten_rf(X_expected))
+            del X_mm
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Local stub of the LAQN and DEFRA REST endpoints for offline tests and benchmarks.
+The real APIs are slow and rate limited, so the fetch engines are exercised against this instead.
+
+LAQN:  /AirQuality/Data/SiteSpecies/SiteCode={SITECODE}/SpeciesCode={SPECIESCODE}/StartDate={STARTDATE}/EndDate={ENDDATE}/Json
+DEFRA: /timeseries/{id}/getData?timespan=YYYY-MM-DDTHH:MM:SSZ/YYYY-MM-DDTHH:MM:SSZ
+"""
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+LAQN_PATH = re.compile(
+    r"/AirQuality/Data/SiteSpecies/SiteCode=(?P<site>[^/]+)/SpeciesCode=(?P<species>[^/]+)"
+    r"/StartDate=(?P<start>[^/]+)/EndDate=(?P<end>[^/]+)/Json"
+)
+DEFRA_PATH = re.compile(r"/timeseries/(?P<ts_id>[^/]+)/getData")
+
+
+def stub_value(key, hour_index):
+    """Deterministic fake measurement keyed on the absolute epoch hour, so tests can check exactly what was stored."""
+    return round((sum(map(ord, key)) % 50) + (hour_index % 24) * 0.5, 1)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Request handler, keeps the connection alive so pooled clients can reuse it."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        #silence the default stderr access log.
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        stub._enter()
+        try:
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            status = stub._next_status()
+            if status != 200:
+                self._send(status, {"error": f"stub status {status}"})
+                return
+
+            parsed = urlparse(self.path)
+            laqn = LAQN_PATH.match(parsed.path)
+            defra = DEFRA_PATH.match(parsed.path)
+
+            if laqn:
+                stub.requests.append(("laqn", laqn.group("site"), laqn.group("species"),
+                                      laqn.group("start"), laqn.group("end")))
+                self._send(200, stub.laqn_payload(**laqn.groupdict()))
+            elif defra:
+                timespan = parse_qs(parsed.query).get("timespan", [""])[0]
+                stub.requests.append(("defra", defra.group("ts_id"), timespan))
+                payload = stub.defra_payload(defra.group("ts_id"), timespan)
+                if payload is None:
+                    self._send(400, {"error": "timespan too large"})
+                else:
+                    self._send(200, payload)
+            else:
+                self._send(404, {"error": "unknown path"})
+        finally:
+            stub._exit()
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    """Large listen backlog, otherwise hundreds of simultaneous connects get refused and retried."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubApiServer:
+    """Threaded HTTP server on localhost, use as a context manager.
+
+    Args:
+        latency (float): seconds each request waits before answering, stands in for network/API time.
+        statuses (list): optional status codes returned for the first requests (e.g. [429, 503]), then 200.
+        max_defra_days (int): DEFRA getData answers 400 when the requested timespan is longer than this.
+    """
+
+    def __init__(self, latency=0.0, statuses=None, max_defra_days=None):
+        self.latency = latency
+        self.statuses = list(statuses or [])
+        self.max_defra_days = max_defra_days
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self._server = _StubHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def laqn_url(self):
+        """Drop-in replacement for Config.get_hourly_data."""
+        return (self.base_url + "/AirQuality/Data/SiteSpecies/SiteCode={SITECODE}/SpeciesCode={SPECIESCODE}"
+                "/StartDate={STARTDATE}/EndDate={ENDDATE}/Json")
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _next_status(self):
+        with self._lock:
+            return self.statuses.pop(0) if self.statuses else 200
+
+    def laqn_payload(self, site, species, start, end):
+        """Hourly records from start 00:00 up to end 23:00, same shape as RawAQData."""
+        first = datetime.strptime(start, "%Y-%m-%d")
+        last = datetime.strptime(end, "%Y-%m-%d") + timedelta(hours=23)
+        hours = int((last - first).total_seconds() // 3600) + 1
+        key = f"{site}_{species}"
+        epoch_hour = int(first.replace(tzinfo=timezone.utc).timestamp() // 3600)
+        data = [
+            {
+                "@MeasurementDateGMT": (first + timedelta(hours=h)).strftime("%Y-%m-%d %H:%M:%S"),
+                "@Value": "" if (epoch_hour + h) % 97 == 13 else str(stub_value(key, epoch_hour + h)),
+            }
+            for h in range(hours)
+        ]
+        return {"RawAQData": {"@SiteCode": site, "@SpeciesCode": species,
+                              "Data": data[0] if len(data) == 1 else data}}
+
+    def defra_payload(self, ts_id, timespan):
+        """Hourly epoch-ms values inside the timespan, None when the span is over max_defra_days."""
+        start_s, end_s = timespan.split("/")
+        first = datetime.strptime(start_s, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        last = datetime.strptime(end_s, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        if self.max_defra_days is not None and (last - first).days > self.max_defra_days:
+            return None
+
+        start_ms = int(first.timestamp()) * 1000
+        hours = int((last - first).total_seconds() // 3600) + 1
+        values = [
+            {"timestamp": start_ms + h * 3_600_000, "value": stub_value(str(ts_id), start_ms // 3_600_000 + h)}
+            for h in range(hours)
+        ]
+        return {"values": values}